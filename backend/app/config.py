@@ -8,4 +8,115 @@ DATABASE_URL = "sqlite:///./docslim.db"
 
 UPLOAD_DIR = "uploads"
 OPTIMIZED_DIR = os.path.join(UPLOAD_DIR, "optimized")
-THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
\ No newline at end of file
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
+
+# Response cache for dashboard endpoints ("memory" or "redis")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_TTL_SECONDS = {
+    "stats": int(os.getenv("CACHE_TTL_STATS", "30")),
+    "metrics_daily": int(os.getenv("CACHE_TTL_METRICS_DAILY", "300")),
+    "metrics_breakdown": int(os.getenv("CACHE_TTL_METRICS_BREAKDOWN", "60")),
+}
+
+# Codec layer for generic files
+CODEC_CPU_BUDGET_SECONDS = float(os.getenv("CODEC_CPU_BUDGET_SECONDS", "2.0"))
+CODEC_SAMPLE_BYTES = int(os.getenv("CODEC_SAMPLE_BYTES", str(1024 * 1024)))
+ZSTD_DICT_DIR = os.path.join(UPLOAD_DIR, "dictionaries")
+ZSTD_DICT_MAX_FILE_SIZE = int(os.getenv("ZSTD_DICT_MAX_FILE_SIZE", str(64 * 1024)))
+ZSTD_DICT_MIN_SAMPLES = int(os.getenv("ZSTD_DICT_MIN_SAMPLES", "100"))
+ZSTD_DICT_SIZE = int(os.getenv("ZSTD_DICT_SIZE", str(112 * 1024)))
+
+# Ingest pipeline. Uploads are embedded in a background task after the
+# response, which loads the model in the web worker; off by default, in which
+# case `python -m app.jobs.reprocess --stages embed` fills embeddings in.
+EMBED_ON_INGEST = os.getenv("EMBED_ON_INGEST", "false").lower() == "true"
+
+# Sampling profiler, enabled per request with an "X-Profile: 1" header
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))
+
+# Embedding model, loaded lazily on first use or by the startup warm-up
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "false").lower() == "true"
+
+# Hybrid search
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "100"))  # per index, before fusion
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+SEARCH_IVF_MIN_VECTORS = int(os.getenv("SEARCH_IVF_MIN_VECTORS", "50000"))  # below this, exact search
+SEARCH_IVF_NPROBE = int(os.getenv("SEARCH_IVF_NPROBE", "16"))
+# Build the search index in a background thread at startup instead of in
+# the first search request. Every worker holds its own copy (about 1.5 GB of
+# vectors at 1M documents), so this is opt-in.
+SEARCH_INDEX_WARMUP = os.getenv("SEARCH_INDEX_WARMUP", "false").lower() == "true"
+# Ids skipped by the index's catch-up scan are rechecked this long, in case
+# their rows were still being committed
+SEARCH_LATE_COMMIT_SECONDS = float(os.getenv("SEARCH_LATE_COMMIT_SECONDS", "60"))
+
+# Bulk reprocessing job
+REPROCESS_CHECKPOINT = os.getenv("REPROCESS_CHECKPOINT", os.path.join(UPLOAD_DIR, "reprocess.checkpoint.json"))
+
+# Storage garbage collector: files younger than this may belong to an upload in flight
+GC_MIN_AGE_SECONDS = float(os.getenv("GC_MIN_AGE_SECONDS", "3600"))
+
+# Perceptual-hash duplicate detection for images: an image is a duplicate of an
+# earlier one when both hashes are within these Hamming distances (of 64 bits)
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+DHASH_MAX_DISTANCE = int(os.getenv("DHASH_MAX_DISTANCE", "10"))
+
+# OCR for scanned PDF pages and images. 300 DPI is where Tesseract accuracy
+# levels off; higher mostly costs time. Budgets are per document.
+OCR_ENABLED = os.getenv("OCR_ENABLED", "true").lower() == "true"
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "50"))
+OCR_TIME_BUDGET_SECONDS = float(os.getenv("OCR_TIME_BUDGET_SECONDS", "60"))
+OCR_MIN_TEXT_CHARS = int(os.getenv("OCR_MIN_TEXT_CHARS", "16"))  # less text than this counts as no text layer
+OCR_CACHE_DIR = os.path.join(UPLOAD_DIR, "ocr_cache")
+
+# Extracted text is stored zstd-compressed in document_texts; it is read far
+# more often than written, so a mid level trades little write time for size
+TEXT_ZSTD_LEVEL = int(os.getenv("TEXT_ZSTD_LEVEL", "9"))
+
+# Catalog export: rows fetched per cursor batch, and per Parquet row group
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+
+# Shared embedding server. When the socket path is set, workers send texts to
+# one server process (python -m app.services.embedding_server) instead of
+# each loading the model; requests arriving within the window are batched.
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "")
+EMBEDDING_SERVER_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_SERVER_BATCH_WINDOW_MS", "5"))
+EMBEDDING_SERVER_MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "64"))
+
+# Resumable chunked uploads. Parts are written in place into a preallocated
+# file under CHUNKED_UPLOAD_DIR; a session with no activity for the TTL is
+# deleted along with its file by a sweep that runs every
+# UPLOAD_EXPIRY_INTERVAL_SECONDS in each worker, starting at startup.
+CHUNKED_UPLOAD_DIR = os.path.join(UPLOAD_DIR, "chunked")
+UPLOAD_PART_SIZE = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_SESSION_TTL_SECONDS = float(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+UPLOAD_EXPIRY_INTERVAL_SECONDS = float(os.getenv("UPLOAD_EXPIRY_INTERVAL_SECONDS", "600"))
+
+# Office Open XML (docx/xlsx/pptx) repacking. Pictures larger than the
+# dimension are downscaled; unused parts are those no relationship reaches,
+# which Office ignores. The thumbnail is what file browsers show as a preview.
+OOXML_MAX_IMAGE_DIMENSION = int(os.getenv("OOXML_MAX_IMAGE_DIMENSION", "2560"))
+OOXML_JPEG_QUALITY = int(os.getenv("OOXML_JPEG_QUALITY", "85"))
+OOXML_STRIP_THUMBNAILS = os.getenv("OOXML_STRIP_THUMBNAILS", "false").lower() == "true"
+OOXML_STRIP_UNUSED_PARTS = os.getenv("OOXML_STRIP_UNUSED_PARTS", "true").lower() == "true"
+OOXML_WORKERS = int(os.getenv("OOXML_WORKERS", str(os.cpu_count() or 1)))
+
+# Savings estimator. The endpoint only scans directories under ESTIMATE_ROOTS
+# (comma-separated); the CLI can scan anything the user can read.
+ESTIMATE_SAMPLE_SIZE = int(os.getenv("ESTIMATE_SAMPLE_SIZE", "400"))
+ESTIMATE_ROOTS = [root.strip() for root in os.getenv("ESTIMATE_ROOTS", "").split(",") if root.strip()]
+# The endpoint runs inside a web request: bound the files it walks, its
+# sample, its process pool and the number of estimates running at once in
+# each worker. Larger trees go to `python -m app.jobs.estimate_savings`.
+ESTIMATE_ENDPOINT_MAX_FILES = int(os.getenv("ESTIMATE_ENDPOINT_MAX_FILES", "100000"))
+ESTIMATE_MAX_SAMPLE_SIZE = int(os.getenv("ESTIMATE_MAX_SAMPLE_SIZE", "2000"))
+ESTIMATE_ENDPOINT_WORKERS = int(os.getenv("ESTIMATE_ENDPOINT_WORKERS", "2"))
+ESTIMATE_MAX_CONCURRENT = int(os.getenv("ESTIMATE_MAX_CONCURRENT", "1"))
+STORAGE_COST_PER_GB_MONTH = float(os.getenv("STORAGE_COST_PER_GB_MONTH", "0.02"))
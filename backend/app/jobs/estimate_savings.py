@@ -0,0 +1,36 @@
+"""Estimate the savings of ingesting a directory tree, from a sample of its files.
+
+Usage (from backend/):
+    python -m app.jobs.estimate_savings /mnt/share --sample-size 400
+    python -m app.jobs.estimate_savings /mnt/share --json > estimate.json
+"""
+import argparse
+import json
+import os
+
+from app.config import ESTIMATE_SAMPLE_SIZE
+from app.services.savings_estimator import SavingsEstimator, format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate storage savings before ingest")
+    parser.add_argument("root", help="directory tree to estimate")
+    parser.add_argument("--sample-size", type=int, default=ESTIMATE_SAMPLE_SIZE,
+                        help="files to optimize; runtime grows with this, not with the tree")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, help="make the sample reproducible")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        parser.error(f"{args.root} is not a directory")
+
+    report = SavingsEstimator(args.root, sample_size=args.sample_size, workers=args.workers, seed=args.seed).run()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
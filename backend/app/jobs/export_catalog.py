@@ -0,0 +1,63 @@
+"""Export the document catalog as NDJSON or Parquet.
+
+Usage (from backend/):
+    python -m app.jobs.export_catalog --format parquet --output catalog.parquet
+    python -m app.jobs.export_catalog --columns id,original_filename,optimized_size \
+        --file-types pdf,docx --tiers hot --since 2024-01-01 --output - | head
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from app.config import EXPORT_BATCH_SIZE
+from app.services.export_service import EXPORT_COLUMNS, EXPORT_FORMATS, ExportService
+
+
+def _list(value):
+    return [item.strip() for item in value.split(",") if item.strip()] if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the document catalog")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", default="-", help="output file, or - for stdout")
+    parser.add_argument("--columns", help="comma-separated subset of: " + ", ".join(EXPORT_COLUMNS))
+    parser.add_argument("--file-types", help="comma-separated file types to include")
+    parser.add_argument("--tiers", help="comma-separated storage tiers to include")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="uploaded at or after (ISO date)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="uploaded before (ISO date)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        try:
+            exporter = ExportService(
+                db, columns=_list(args.columns), file_types=_list(args.file_types), tiers=_list(args.tiers),
+                since=args.since, until=args.until, batch_size=args.batch_size,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+        start = time.perf_counter()
+        written = 0
+        output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            for chunk in exporter.iter_format(args.format):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+    finally:
+        db.close()
+
+    if args.output != "-":
+        print(f"wrote {written / 1024 / 1024:.2f} MB to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
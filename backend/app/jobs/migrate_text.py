@@ -0,0 +1,169 @@
+"""Move inline documents.extracted_text into the compressed document_texts table.
+
+Usage (from backend/):
+    python -m app.jobs.migrate_text                       # move text, batch by batch
+    python -m app.jobs.migrate_text --drop-column --vacuum
+
+Each batch copies the text of up to --batch-size rows and clears it from
+documents in the same transaction, so the job can be stopped and rerun at
+any point. Dropping the legacy column and VACUUM are what actually shrink
+the SQLite file; both rewrite the table, so run them off-peak.
+"""
+import argparse
+import os
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.orm import Session
+
+from app.models import Base, DocumentText
+# Registers the commit hooks that invalidate cached dashboard responses
+import app.services.cache_service  # noqa: F401
+
+LEGACY_COLUMN = "extracted_text"
+
+
+class TextMigration:
+    def __init__(
+        self,
+        db: Session,
+        batch_size: int = 500,
+        drop_column: bool = False,
+        vacuum: bool = False,
+        progress: Optional[Callable[[dict], None]] = None,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.drop_column = drop_column
+        self.vacuum = vacuum
+        self.progress = progress
+        self.summary = {"rows_moved": 0, "rows_skipped": 0, "text_bytes": 0, "compressed_bytes": 0}
+
+    def has_legacy_column(self) -> bool:
+        columns = inspect(self.db.get_bind()).get_columns("documents")
+        return any(column["name"] == LEGACY_COLUMN for column in columns)
+
+    def run(self) -> dict:
+        Base.metadata.create_all(bind=self.db.get_bind(), tables=[DocumentText.__table__])
+        if not self.has_legacy_column():
+            return self.summary
+
+        select_batch = text(
+            f"SELECT id, {LEGACY_COLUMN} FROM documents "
+            f"WHERE id > :last_id AND {LEGACY_COLUMN} IS NOT NULL ORDER BY id LIMIT :limit"
+        )
+        clear_batch = text(
+            f"UPDATE documents SET {LEGACY_COLUMN} = NULL WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+
+        last_id = 0
+        while True:
+            rows = self.db.execute(select_batch, {"last_id": last_id, "limit": self.batch_size}).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            # Rows already moved by an earlier, interrupted run keep their newer text
+            existing = {document_id for (document_id,) in self.db.query(DocumentText.document_id).filter(
+                DocumentText.document_id.in_(ids)
+            )}
+            for row in rows:
+                if row.id in existing:
+                    self.summary["rows_skipped"] += 1
+                    continue
+                stored = DocumentText(document_id=row.id, text=row[1])
+                self.db.add(stored)
+                self.summary["rows_moved"] += 1
+                self.summary["text_bytes"] += stored.length
+                self.summary["compressed_bytes"] += len(stored.content)
+            self.db.execute(clear_batch, {"ids": ids})
+            self.db.commit()
+            last_id = ids[-1]
+            if self.progress:
+                self.progress(dict(self.summary, last_id=last_id))
+
+        if self.drop_column:
+            self.db.execute(text(f"ALTER TABLE documents DROP COLUMN {LEGACY_COLUMN}"))
+            self.db.commit()
+        if self.vacuum:
+            self._vacuum()
+        return self.summary
+
+    def _vacuum(self):
+        bind = self.db.get_bind()
+        if bind.dialect.name != "sqlite":
+            return
+        self.db.close()
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM"))
+
+
+def measure_list_latency(db: Session, pages: int = 50, page_size: int = 100) -> dict:
+    """Average ms for a /documents/ page, and for a scan of every row.
+
+    Rows are read with SELECT * because that is what the ORM loaded while
+    the text was still a mapped column, which makes runs before and after
+    the migration comparable.
+    """
+    total = db.execute(text("SELECT COUNT(*) FROM documents")).scalar()
+    page_query = text("SELECT * FROM documents ORDER BY id LIMIT :limit OFFSET :offset")
+    start = time.perf_counter()
+    for page in range(pages):
+        offset = (page * page_size) % max(total, 1)
+        db.execute(page_query, {"limit": page_size, "offset": offset}).all()
+    page_ms = (time.perf_counter() - start) * 1000 / pages
+
+    start = time.perf_counter()
+    for _ in db.execute(text("SELECT * FROM documents")):
+        pass
+    scan_ms = (time.perf_counter() - start) * 1000
+    return {"page_ms": page_ms, "scan_ms": scan_ms}
+
+
+def _sqlite_path(db: Session) -> Optional[str]:
+    url = db.get_bind().url
+    return url.database if url.get_backend_name() == "sqlite" and url.database else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move extracted text into document_texts")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--drop-column", action="store_true", help="drop documents.extracted_text afterwards")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the SQLite file afterwards")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    path = _sqlite_path(db)
+    size_before = os.path.getsize(path) if path else None
+    before = measure_list_latency(db)
+    try:
+        summary = TextMigration(
+            db,
+            batch_size=args.batch_size,
+            drop_column=args.drop_column,
+            vacuum=args.vacuum,
+            progress=lambda state: print(f"moved up to id {state['last_id']}: {state['rows_moved']} rows"),
+        ).run()
+    finally:
+        db.close()
+
+    db = SessionLocal()
+    try:
+        after = measure_list_latency(db)
+    finally:
+        db.close()
+
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    if summary["text_bytes"]:
+        print(f"text compression: {summary['text_bytes'] / max(summary['compressed_bytes'], 1):.1f}x")
+    if path:
+        print(f"database size: {size_before / 1024 / 1024:.2f} MB -> {os.path.getsize(path) / 1024 / 1024:.2f} MB")
+    print(f"list page: {before['page_ms']:.2f} ms -> {after['page_ms']:.2f} ms")
+    print(f"full scan: {before['scan_ms']:.2f} ms -> {after['scan_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""Re-run optimization, text extraction and embedding over stored documents.
+
+Usage (from backend/):
+    python -m app.jobs.reprocess --stages optimize,extract --dry-run
+    python -m app.jobs.reprocess --stages embed --workers 4 --max-cpu 0.5
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import REPROCESS_CHECKPOINT, UPLOAD_DIR
+from app.models import Document, DocumentText
+# Registers the commit hooks that invalidate cached dashboard responses
+import app.services.cache_service  # noqa: F401
+
+STAGES = ("optimize", "extract", "embed")
+
+# Only the optimized copy of a document is stored, so re-running a lossy
+# optimizer would compound the loss. These types are skipped unless asked for.
+LOSSY_FILE_TYPES = {'jpg', 'png'}
+
+
+def _init_dry_run_worker():
+    # A dry run must not train or save zstd dictionaries
+    from app.utils import codecs
+    codecs.dictionary_store = codecs.ZstdDictionaryStore(read_only=True)
+
+
+def _cpu_seconds() -> float:
+    """CPU time of this process plus its finished subprocesses (e.g. OCR)"""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class Throttle:
+    """Keep a job within a CPU and I/O budget by sleeping between chunks.
+
+    `cpu_fraction` is the share of each worker's core the job may use and
+    `io_bytes_per_second` caps bytes read plus written. Either may be None.
+    """
+
+    def __init__(self, cpu_fraction: Optional[float], io_bytes_per_second: Optional[float], workers: int = 1):
+        self.cpu_fraction = cpu_fraction
+        self.io_bytes_per_second = io_bytes_per_second
+        self.workers = workers
+        self.cpu_seconds = 0.0
+        self.io_bytes = 0
+        self.started = time.monotonic()
+
+    def account(self, cpu_seconds: float, io_bytes: int):
+        """Record work done and sleep until the job is back within budget"""
+        self.cpu_seconds += cpu_seconds
+        self.io_bytes += io_bytes
+
+        required = 0.0
+        if self.cpu_fraction:
+            required = max(required, self.cpu_seconds / (self.cpu_fraction * self.workers))
+        if self.io_bytes_per_second:
+            required = max(required, self.io_bytes / self.io_bytes_per_second)
+
+        delay = required - (time.monotonic() - self.started)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint:
+    """Id of the last committed document, persisted atomically as JSON"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.last_id = 0
+        self.totals = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.last_id = state.get("last_id", 0)
+            self.totals = state.get("totals", {})
+
+    def save(self, last_id: int, totals: dict):
+        self.last_id = last_id
+        self.totals = totals
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_id": last_id, "totals": totals}, f)
+        os.replace(tmp_path, self.path)
+
+
+def reprocess_document(task: dict, stages: List[str], work_dir: str) -> dict:
+    """Reprocess one stored document in a worker process.
+
+    Results are left in `work_dir`; the parent moves them to new storage
+    paths and switches the rows over in one commit, so a crash never leaves
+    a row pointing at a file that does not match it.
+    """
+    from app.services.document_service import DocumentService
+    from app.utils.codecs import iter_stored_file
+    from app.utils.file_utils import FileUtils
+    from app.utils.optimizers import get_optimizer
+
+    start = _cpu_seconds()
+    result = {"id": task["id"], "io_bytes": 0}
+    suffix = Path(task["original_filename"]).suffix
+    source_path = os.path.join(work_dir, f"{task['id']}-source{suffix}")
+    try:
+        with open(source_path, "wb") as f:
+            for chunk in iter_stored_file(task["storage_path"]):
+                f.write(chunk)
+        result["io_bytes"] += task["stored_size"] + os.path.getsize(source_path)
+
+        if "optimize" in stages:
+            output_path = os.path.join(work_dir, f"{task['id']}-optimized{suffix}")
+            optimizer = get_optimizer(task["file_type"])
+            optimized_size = optimizer.optimize(source_path, output_path)
+            result["io_bytes"] += optimized_size
+            if optimized_size < task["stored_size"]:
+                result["output_path"] = output_path
+                result["optimized_size"] = optimized_size
+                result["reduction_strategy"] = (
+                    optimizer.strategy or DocumentService._get_reduction_strategy(task["file_type"])
+                )
+            else:
+                os.remove(output_path)
+
+        if "extract" in stages:
+            result["extracted_text"] = FileUtils().extract_text(source_path, task["file_type"])
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+
+    result["cpu_seconds"] = _cpu_seconds() - start
+    return result
+
+
+class ReprocessJob:
+    def __init__(
+        self,
+        db: Session,
+        stages: List[str] = STAGES,
+        file_types: Optional[List[str]] = None,
+        include_lossy: bool = False,
+        chunk_size: int = 200,
+        workers: int = os.cpu_count() or 1,
+        dry_run: bool = False,
+        checkpoint_path: str = REPROCESS_CHECKPOINT,
+        max_cpu: Optional[float] = None,
+        max_io_mb_per_second: Optional[float] = None,
+    ):
+        self.db = db
+        self.stages = list(stages)
+        self.file_types = file_types
+        self.include_lossy = include_lossy
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.dry_run = dry_run
+        # A dry run never writes, so it neither reads nor advances the checkpoint
+        self.checkpoint = None if dry_run else Checkpoint(checkpoint_path)
+        self.throttle = Throttle(
+            max_cpu,
+            max_io_mb_per_second * 1024 * 1024 if max_io_mb_per_second else None,
+            workers,
+        )
+
+    def _chunks(self):
+        """Stream documents to reprocess in id order, one chunk at a time"""
+        last_id = self.checkpoint.last_id if self.checkpoint else 0
+        while True:
+            query = self.db.query(
+                Document.id,
+                Document.original_filename,
+                Document.file_type,
+                Document.storage_path,
+                Document.original_size,
+                Document.optimized_size,
+            ).filter(Document.id > last_id, Document.is_duplicate == False)
+            if self.file_types:
+                query = query.filter(Document.file_type.in_(self.file_types))
+            if not self.include_lossy and "optimize" in self.stages:
+                query = query.filter(Document.file_type.notin_(LOSSY_FILE_TYPES))
+            rows = query.order_by(Document.id).limit(self.chunk_size).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yield rows
+
+    def run(self) -> dict:
+        totals = dict(self.checkpoint.totals) if self.checkpoint else {}
+        for key in ("processed", "changed", "errors", "embed_errors", "missing", "stored_bytes", "projected_bytes"):
+            totals.setdefault(key, 0)
+
+        work_dir = tempfile.mkdtemp(prefix="reprocess_", dir=UPLOAD_DIR)
+        try:
+            initializer = _init_dry_run_worker if self.dry_run else None
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=initializer) as pool:
+                for rows in self._chunks():
+                    tasks = []
+                    for row in rows:
+                        if not row.storage_path or not os.path.exists(row.storage_path):
+                            totals["missing"] += 1
+                            continue
+                        tasks.append({
+                            "id": row.id,
+                            "original_filename": row.original_filename,
+                            "file_type": row.file_type,
+                            "storage_path": row.storage_path,
+                            "stored_size": os.path.getsize(row.storage_path),
+                            "original_size": row.original_size,
+                        })
+
+                    worker_stages = [stage for stage in self.stages if stage != "embed"]
+                    if "embed" in self.stages and "extract" not in worker_stages:
+                        worker_stages.append("extract")
+                    results = list(pool.map(
+                        reprocess_document, tasks,
+                        [worker_stages] * len(tasks), [work_dir] * len(tasks),
+                    ))
+
+                    self._apply(tasks, results, totals)
+                    self.throttle.account(
+                        sum(r["cpu_seconds"] for r in results),
+                        sum(r["io_bytes"] for r in results),
+                    )
+                    if self.checkpoint:
+                        self.checkpoint.save(rows[-1].id, totals)
+                    print(f"reprocessed up to id {rows[-1].id}: {totals}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        totals["projected_savings"] = totals["stored_bytes"] - totals["projected_bytes"]
+        return totals
+
+    def _apply(self, tasks: List[dict], results: List[dict], totals: dict):
+        """Commit one chunk of results, or only tally them in a dry run.
+
+        Re-optimized files are moved to new paths and the rows switched to
+        them in the same commit; the replaced files are deleted only after
+        it succeeds.
+        """
+        from app.services.search_service import invalidate_search_index
+
+        by_id = {task["id"]: task for task in tasks}
+        embeddings = self._embed(results, totals) if "embed" in self.stages else {}
+        new_paths, old_paths = [], []
+
+        try:
+            for result in results:
+                task = by_id[result["id"]]
+                totals["processed"] += 1
+                totals["stored_bytes"] += task["stored_size"]
+                if "error" in result:
+                    totals["errors"] += 1
+                    totals["projected_bytes"] += task["stored_size"]
+                    print(f"❌ document {result['id']}: {result['error']}")
+                    continue
+
+                new_size = result.get("optimized_size", task["stored_size"])
+                totals["projected_bytes"] += new_size
+                if "output_path" in result:
+                    totals["changed"] += 1
+                if self.dry_run:
+                    continue
+
+                values = {}
+                if "output_path" in result:
+                    new_path = self._new_storage_path(task)
+                    shutil.move(result["output_path"], new_path)
+                    new_paths.append(new_path)
+                    old_paths.append(task["storage_path"])
+                    reduction = ((task["original_size"] - new_size) / task["original_size"] * 100
+                                 if task["original_size"] else 0.0)
+                    values.update(
+                        storage_path=new_path,
+                        optimized_size=new_size,
+                        reduction_strategy=result["reduction_strategy"],
+                        reduction_percentage=reduction,
+                    )
+                    # Duplicates share the stored file, so they share its size too
+                    self.db.query(Document).filter(
+                        Document.original_document_id == task["id"]
+                    ).update(dict(values), synchronize_session=False)
+                if "extract" in self.stages:
+                    self._store_text(task["id"], result["extracted_text"])
+                if result["id"] in embeddings:
+                    values["embedding"] = embeddings[result["id"]]
+                if values:
+                    self.db.query(Document).filter(Document.id == task["id"]).update(
+                        values, synchronize_session=False
+                    )
+
+            if not self.dry_run:
+                if "extract" in self.stages or embeddings:
+                    invalidate_search_index(self.db)
+                self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            for path in new_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        for path in old_paths:
+            if self.db.query(Document.id).filter(Document.storage_path == path).first() is None:
+                os.remove(path)
+
+    @staticmethod
+    def _new_storage_path(task: dict) -> str:
+        """A fresh path next to the current file, so both exist until the commit"""
+        name = f"{task['id']}-{uuid.uuid4().hex[:8]}-{os.path.basename(task['original_filename'])}"
+        return os.path.join(os.path.dirname(task["storage_path"]), name)
+
+    def _store_text(self, document_id: int, text: Optional[str]):
+        stored = self.db.get(DocumentText, document_id)
+        if text is None:
+            if stored is not None:
+                self.db.delete(stored)
+        elif stored is None:
+            self.db.add(DocumentText(document_id=document_id, text=text))
+        else:
+            stored.text = text
+
+    def _embed(self, results: List[dict], totals: dict) -> dict:
+        """Embed a chunk's texts in one batch in the parent, where the model is loaded once.
+
+        A failed batch is counted and skipped like a failed extraction; its
+        documents keep their previous embedding.
+        """
+        from app.services.document_service import get_embedding_service
+
+        texts = {r["id"]: r.get("extracted_text") for r in results if "error" not in r}
+        if not texts or self.dry_run:
+            return {}
+        service = get_embedding_service()
+        try:
+            vectors = service.generate_embeddings(list(texts.values()))
+        except Exception as e:
+            totals["embed_errors"] += len(texts)
+            print(f"❌ embedding documents {min(texts)}-{max(texts)}: {e}")
+            return {}
+        return {doc_id: service.embeddings_to_json(vector) for doc_id, vector in zip(texts, vectors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess stored documents")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="comma-separated subset of: " + ", ".join(STAGES))
+    parser.add_argument("--file-types", help="comma-separated file types to include")
+    parser.add_argument("--include-lossy", action="store_true",
+                        help="also re-optimize " + ", ".join(sorted(LOSSY_FILE_TYPES)))
+    parser.add_argument("--chunk-size", type=int, default=200, help="documents per batch commit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-cpu", type=float, help="CPU share per worker, e.g. 0.5")
+    parser.add_argument("--max-io-mb", type=float, help="I/O budget in MB/s")
+    parser.add_argument("--checkpoint", default=REPROCESS_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="report projected savings without writing")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        totals = ReprocessJob(
+            db,
+            stages=stages,
+            file_types=args.file_types.split(",") if args.file_types else None,
+            include_lossy=args.include_lossy,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            dry_run=args.dry_run,
+            checkpoint_path=args.checkpoint,
+            max_cpu=args.max_cpu,
+            max_io_mb_per_second=args.max_io_mb,
+        ).run()
+    finally:
+        db.close()
+
+    label = "Projected" if args.dry_run else "Achieved"
+    print(f"{label} savings: {totals['projected_savings'] / 1024 / 1024:.2f} MB "
+          f"across {totals['changed']} of {totals['processed']} documents "
+          f"({totals['errors']} errors, {totals['embed_errors']} not embedded, "
+          f"{totals['missing']} missing files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Reconcile files under the upload directory with the documents table.
+
+Usage (from backend/):
+    python -m app.jobs.storage_gc                      # report only
+    python -m app.jobs.storage_gc --delete-orphans --delete-dangling
+
+Stored paths are relative to the directory the app runs in; pass --base-dir
+when running the job from elsewhere.
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import (
+    CHUNKED_UPLOAD_DIR, GC_MIN_AGE_SECONDS, OCR_CACHE_DIR, REPROCESS_CHECKPOINT, UPLOAD_DIR, ZSTD_DICT_DIR,
+)
+from app.models import Document, DocumentVersion, ImageHash, UploadSession
+# Registers the commit hooks that invalidate cached dashboard responses
+import app.services.cache_service  # noqa: F401
+
+BATCH_SIZE = 500
+
+# Deleting more than this share of files or rows at once usually means the
+# paths were resolved against the wrong directory, not that storage leaked
+MAX_DELETE_FRACTION = 0.10
+
+# Files under the upload directory that belong to the app, not to a document.
+# Chunked uploads in progress are removed when their session expires.
+EXCLUDED_DIRS = {
+    os.path.normpath(ZSTD_DICT_DIR), os.path.normpath(OCR_CACHE_DIR), os.path.normpath(CHUNKED_UPLOAD_DIR),
+}
+EXCLUDED_FILES = {os.path.normpath(REPROCESS_CHECKPOINT), os.path.normpath(REPROCESS_CHECKPOINT + ".tmp")}
+
+# Only these strategies store the uploaded bytes losslessly, so only their
+# content can be checked against the hash taken at upload
+VERIFIABLE_STRATEGY_PREFIXES = ("safe_copy", "codec:")
+
+
+def _print_finding(kind: str, subject, detail: str = ""):
+    print(f"{kind}: {subject} {detail}".rstrip())
+
+
+def _md5_of_stored_file(path: str) -> str:
+    from app.utils.codecs import iter_stored_file
+
+    digest = hashlib.md5()
+    for chunk in iter_stored_file(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StorageReconciler:
+    """Find orphaned files and dangling rows without holding either side in memory.
+
+    Files are listed one directory at a time, in parallel, and each batch of
+    paths is looked up in the DB with an indexed IN query. Rows are streamed
+    in id order and checked against the filesystem in batches. Memory use is
+    bounded by the batch size and the largest directory, not by the tree.
+
+    Both sides are compared as real paths resolved against `base_dir`. When
+    deletion is asked for, a report-only pass runs first and nothing is
+    deleted if orphans or dangling rows exceed `max_delete_fraction` of the
+    total, unless `force` is set.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        root: str = UPLOAD_DIR,
+        base_dir: Optional[str] = None,
+        delete_orphans: bool = False,
+        delete_dangling: bool = False,
+        force: bool = False,
+        max_delete_fraction: float = MAX_DELETE_FRACTION,
+        min_age_seconds: float = GC_MIN_AGE_SECONDS,
+        verify_fraction: float = 0.01,
+        workers: int = 8,
+        report: Callable = _print_finding,
+        seed: Optional[int] = None,
+    ):
+        self.db = db
+        self.base_dir = os.path.realpath(base_dir or os.getcwd())
+        self.root = self._resolve(root)
+        self.delete_orphans = delete_orphans
+        self.delete_dangling = delete_dangling
+        self.force = force
+        self.max_delete_fraction = max_delete_fraction
+        self.excluded_dirs = {self._resolve(path) for path in EXCLUDED_DIRS}
+        self.excluded_files = {self._resolve(path) for path in EXCLUDED_FILES}
+        self.min_age_seconds = min_age_seconds
+        self.verify_fraction = verify_fraction
+        self.workers = workers
+        self.report = report
+        self.random = random.Random(seed)
+        self.summary = {
+            "files_scanned": 0, "orphans": 0, "orphan_bytes": 0, "orphans_deleted": 0,
+            "rows_scanned": 0, "dangling": 0, "overwritten": 0, "rows_deleted": 0,
+            "verified": 0, "hash_mismatches": 0, "refused": None,
+        }
+
+    def run(self) -> dict:
+        self._ensure_path_indexes()
+        deleting = self.delete_orphans or self.delete_dangling
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self._find_orphans(pool, delete=deleting and self.force)
+            self._find_dangling(pool, delete=deleting and self.force)
+            if deleting and not self.force:
+                self.summary["refused"] = self._refusal()
+                if self.summary["refused"]:
+                    self.report("refused", self.summary["refused"])
+                else:
+                    # Same scan again, deleting; findings were reported by the first pass
+                    self._find_orphans(pool, delete=True, quiet=True)
+                    self._find_dangling(pool, delete=True, quiet=True)
+        self._find_overwritten()
+        return self.summary
+
+    def _refusal(self) -> Optional[str]:
+        """Why deleting what the report-only pass found is too risky, if it is"""
+        checks = []
+        if self.delete_orphans:
+            checks.append(("orphaned files", self.summary["orphans"], self.summary["files_scanned"]))
+        if self.delete_dangling:
+            checks.append(("dangling rows", self.summary["dangling"], self.summary["rows_scanned"]))
+        for label, found, total in checks:
+            if total and found / total > self.max_delete_fraction:
+                return (f"{found} of {total} {label} exceed {self.max_delete_fraction:.0%}; "
+                        f"check --base-dir or pass --force")
+        return None
+
+    def _resolve(self, path: str) -> str:
+        return os.path.realpath(os.path.join(self.base_dir, path))
+
+    def _ensure_path_indexes(self):
+        """Orphan lookups are IN queries on the path columns; databases created
+        before those columns were indexed get the indexes here"""
+        bind = self.db.get_bind()
+        for index in Document.__table__.indexes:
+            index.create(bind, checkfirst=True)
+
+    # Files without rows
+
+    def _iter_directories(self, pool) -> Iterator[List[os.DirEntry]]:
+        """Yield the file entries of each directory, scanning directories in parallel"""
+        def scan(path):
+            files, subdirs = [], []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in self.excluded_dirs:
+                                subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            if entry.path not in self.excluded_files:
+                                files.append(entry)
+            except FileNotFoundError:
+                pass
+            return files, subdirs
+
+        pending = deque([pool.submit(scan, self.root)])
+        while pending:
+            files, subdirs = pending.popleft().result()
+            pending.extend(pool.submit(scan, subdir) for subdir in subdirs)
+            yield files
+
+    def _find_orphans(self, pool, delete: bool, quiet: bool = False):
+        cutoff = time.time() - self.min_age_seconds
+        for files in self._iter_directories(pool):
+            for start in range(0, len(files), BATCH_SIZE):
+                batch = files[start:start + BATCH_SIZE]
+                if not quiet:
+                    self.summary["files_scanned"] += len(batch)
+                known = self._known_paths([entry.path for entry in batch])
+                for entry in batch:
+                    if entry.path in known:
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime > cutoff:
+                        continue  # possibly an upload still in flight
+                    if not quiet:
+                        self.summary["orphans"] += 1
+                        self.summary["orphan_bytes"] += stat.st_size
+                        self.report("orphan", entry.path, f"({stat.st_size} bytes)")
+                    if delete and self.delete_orphans:
+                        os.remove(entry.path)
+                        self.summary["orphans_deleted"] += 1
+
+    def _known_paths(self, paths: List[str]) -> set:
+        """Real paths among `paths` that a row refers to, however the row spells it"""
+        candidates = set()
+        for path in paths:
+            relative = os.path.relpath(path, self.base_dir)
+            candidates.update((path, relative, os.path.join(".", relative)))
+        known = set()
+        for column in (Document.storage_path, Document.thumbnail_path):
+            known.update(
+                self._resolve(value)
+                for (value,) in self.db.query(column).filter(column.in_(candidates)).distinct()
+            )
+        return known
+
+    # Rows without files
+
+    def _iter_rows(self):
+        last_id = 0
+        while True:
+            rows = self.db.query(
+                Document.id, Document.storage_path, Document.thumbnail_path,
+                Document.reduction_strategy, Document.text_hash, Document.is_duplicate,
+            ).filter(Document.id > last_id).order_by(Document.id).limit(BATCH_SIZE).all()
+            if not rows:
+                return
+            last_id = rows[-1].id
+            yield rows
+
+    def _check_row(self, row, sampled: bool) -> dict:
+        finding = {"id": row.id}
+        if not row.storage_path or not os.path.exists(self._resolve(row.storage_path)):
+            finding["missing"] = row.storage_path
+        if row.thumbnail_path and not os.path.exists(self._resolve(row.thumbnail_path)):
+            finding["missing_thumbnail"] = row.thumbnail_path
+        if ("missing" not in finding and not row.is_duplicate and row.text_hash
+                and (row.reduction_strategy or "").startswith(VERIFIABLE_STRATEGY_PREFIXES)
+                and sampled):
+            finding["verified"] = True
+            finding["hash_ok"] = _md5_of_stored_file(self._resolve(row.storage_path)) == row.text_hash
+        return finding
+
+    def _find_dangling(self, pool, delete: bool, quiet: bool = False):
+        for rows in self._iter_rows():
+            dangling_ids = []
+            sampled = [not quiet and self.random.random() < self.verify_fraction for _ in rows]
+            for finding in pool.map(self._check_row, rows, sampled):
+                if "missing" in finding:
+                    dangling_ids.append(finding["id"])
+                if quiet:
+                    continue
+                if "missing" in finding:
+                    self.summary["dangling"] += 1
+                    self.report("dangling", f"document {finding['id']}", f"-> {finding['missing']}")
+                if "missing_thumbnail" in finding:
+                    self.report("missing thumbnail", f"document {finding['id']}",
+                                f"-> {finding['missing_thumbnail']}")
+                if finding.get("verified"):
+                    self.summary["verified"] += 1
+                    if not finding["hash_ok"]:
+                        self.summary["hash_mismatches"] += 1
+                        self.report("hash mismatch", f"document {finding['id']}")
+            if not quiet:
+                self.summary["rows_scanned"] += len(rows)
+            if delete and self.delete_dangling and dangling_ids:
+                self.summary["rows_deleted"] += self._delete_rows(dangling_ids)
+
+    def _delete_rows(self, ids: List[int]) -> int:
+        """Delete rows with everything that refers to them, in one transaction.
+
+        Duplicates share their original's file, so they are dangling too and
+        go with it, unless their own file exists, in which case they become
+        originals.
+        """
+        from app.services.search_service import invalidate_search_index
+
+        ids = set(ids)
+        for duplicate in self.db.query(Document).filter(
+            Document.original_document_id.in_(ids), Document.id.notin_(ids)
+        ):
+            if duplicate.storage_path and os.path.exists(self._resolve(duplicate.storage_path)):
+                duplicate.original_document_id = None
+                duplicate.is_duplicate = False
+            else:
+                ids.add(duplicate.id)
+
+        self.db.query(ImageHash).filter(ImageHash.document_id.in_(ids)).delete(synchronize_session=False)
+        self.db.query(DocumentVersion).filter(DocumentVersion.document_id.in_(ids)).delete(synchronize_session=False)
+        for upload in self.db.query(UploadSession).filter(UploadSession.document_id.in_(ids)):
+            self.db.delete(upload)  # a completed chunked upload, with its part rows
+        for document in self.db.query(Document).filter(Document.id.in_(ids)):
+            self.db.delete(document)  # cascades to its document_texts row
+        invalidate_search_index(self.db)
+        self.db.commit()
+        return len(ids)
+
+    def _find_overwritten(self):
+        """Originals whose stored file was overwritten by a later upload of the same name"""
+        shared_paths = self.db.query(Document.storage_path).filter(
+            Document.is_duplicate == False, Document.storage_path.isnot(None)
+        ).group_by(Document.storage_path).having(func.count(Document.id) > 1)
+
+        for (path,) in shared_paths.yield_per(BATCH_SIZE):
+            ids = [doc_id for (doc_id,) in self.db.query(Document.id).filter(
+                Document.storage_path == path, Document.is_duplicate == False
+            ).order_by(Document.id)]
+            for doc_id in ids[:-1]:  # the newest upload owns the file
+                self.summary["overwritten"] += 1
+                self.report("overwritten", f"document {doc_id}", f"-> {path} (now holds document {ids[-1]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Garbage-collect and reconcile document storage")
+    parser.add_argument("--root", default=UPLOAD_DIR)
+    parser.add_argument("--base-dir", default=os.getcwd(),
+                        help="directory the app runs in, which stored relative paths start from")
+    parser.add_argument("--delete-orphans", action="store_true", help="delete files no row refers to")
+    parser.add_argument("--delete-dangling", action="store_true", help="delete rows whose file is missing")
+    parser.add_argument("--max-delete-fraction", type=float, default=MAX_DELETE_FRACTION,
+                        help="refuse to delete when more than this share of files or rows would go")
+    parser.add_argument("--force", action="store_true", help="delete even above --max-delete-fraction")
+    parser.add_argument("--min-age", type=float, default=GC_MIN_AGE_SECONDS,
+                        help="ignore orphans modified less than this many seconds ago")
+    parser.add_argument("--verify-fraction", type=float, default=0.01,
+                        help="fraction of rows whose content hash is verified")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        summary = StorageReconciler(
+            db,
+            root=args.root,
+            base_dir=args.base_dir,
+            delete_orphans=args.delete_orphans,
+            delete_dangling=args.delete_dangling,
+            force=args.force,
+            max_delete_fraction=args.max_delete_fraction,
+            min_age_seconds=args.min_age,
+            verify_fraction=args.verify_fraction,
+            workers=args.workers,
+        ).run()
+    finally:
+        db.close()
+
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
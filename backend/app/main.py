@@ -1,13 +1,24 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 import os
+import threading
 
 from app.database import get_db, init_db
 from app.models import Document
-from app.schemas import DocumentCreate, DocumentResponse
+from app.schemas import (
+    DocumentCreate, DocumentResponse, SearchResult,
+    UploadPartResponse, UploadSessionCreate, UploadSessionResponse,
+)
 from app.services.document_service import DocumentService
+from app.services.cache_service import response_cache, STORAGE_METRICS
+from app.config import (
+    EMBED_ON_INGEST, EMBEDDING_WARMUP, ESTIMATE_MAX_CONCURRENT, PROFILER_ENABLED, SEARCH_INDEX_WARMUP,
+)
+from app.utils.file_utils import FileUtils
+from app.utils.instrumentation import query_timer, render_metrics, stage_timer
 
 app = FastAPI(title="DocSlim - AI Document Management")
 
@@ -19,6 +30,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Run the sampling profiler for requests sent with an X-Profile: 1 header"""
+    if not PROFILER_ENABLED or request.headers.get("x-profile") != "1":
+        return await call_next(request)
+    
+    from app.utils.profiler import SamplingProfiler
+    
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    response.headers["X-Profile-File"] = profiler.write(f"{request.method}_{request.url.path}")
+    return response
+
 @app.on_event("startup")
 def on_startup():
     os.makedirs("uploads", exist_ok=True)
@@ -31,35 +59,214 @@ def on_startup():
     
     try:
         Base.metadata.create_all(bind=engine)
+        # create_all skips existing tables, so add indexes declared since they were created
+        for index in Document.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
         print("✅ Database initialized successfully")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
+    
+    if EMBEDDING_WARMUP:
+        _start_embedding_warmup()
+    if SEARCH_INDEX_WARMUP:
+        _start_search_index_warmup()
+    _start_upload_expiry()
+
+def _start_embedding_warmup():
+    """Load the embedding model in the background so startup isn't blocked"""
+    import threading
+    from app.services.document_service import get_embedding_service
+    
+    def warm_up():
+        try:
+            get_embedding_service().warm_up()
+            print("✅ Embedding model warmed up")
+        except Exception as e:
+            print(f"❌ Embedding model warm-up failed: {e}")
+    
+    threading.Thread(target=warm_up, name="embedding-warmup", daemon=True).start()
+
+def _start_search_index_warmup():
+    """Build the search index in the background so the first search doesn't"""
+    import threading
+    from app.database import SessionLocal
+    from app.services.search_service import search_index
+    
+    def warm_up():
+        db = SessionLocal()
+        try:
+            search_index.warm_up(db)
+            print(f"✅ Search index built ({len(search_index.doc_ids)} documents)")
+        except Exception as e:
+            print(f"❌ Search index warm-up failed: {e}")
+        finally:
+            db.close()
+    
+    threading.Thread(target=warm_up, name="search-index-warmup", daemon=True).start()
+
+def _start_upload_expiry():
+    """Expire abandoned upload sessions now and periodically, freeing the space
+    their files preallocated"""
+    import time
+    from app.config import UPLOAD_EXPIRY_INTERVAL_SECONDS
+    from app.database import SessionLocal
+    from app.services.upload_service import ChunkedUploadService
+    
+    def expire():
+        while True:
+            db = SessionLocal()
+            try:
+                ChunkedUploadService(db).expire_stale()
+            except Exception as e:
+                # Another worker may have expired the same sessions
+                db.rollback()
+                print(f"❌ Upload session expiry failed: {e}")
+            finally:
+                db.close()
+            time.sleep(UPLOAD_EXPIRY_INTERVAL_SECONDS)
+    
+    threading.Thread(target=expire, name="upload-expiry", daemon=True).start()
 
 @app.get("/")
 def read_root():
     return {"message": "DocSlim API is running"}
 
+def _schedule_embedding(background_tasks: BackgroundTasks, document: Document):
+    """Embed a new original after the response is sent, never inside the request"""
+    if EMBED_ON_INGEST and not document.is_duplicate:
+        from app.services.document_service import embed_document_task
+        background_tasks.add_task(embed_document_task, document.id)
+
 @app.post("/upload/", response_model=DocumentResponse)
-async def upload_document(
+def upload_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    """Upload a document for processing and reduction"""
+    """Upload a document for processing and reduction.
+    
+    A plain `def` so FastAPI runs it in the threadpool: optimizing and OCR
+    are synchronous and would otherwise block the event loop.
+    """
+    import shutil
+    
     document_service = DocumentService(db)
     
+    temp_path = f"uploads/temp_{file.filename}"
     try:
-        temp_path = f"uploads/temp_{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        document = await document_service.process_document(temp_path, file.filename)
+        # The body was spooled before this handler ran: this times the copy only
+        with stage_timer("spool_copy", FileUtils().detect_file_type(file.filename)):
+            with open(temp_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer, 1024 * 1024)
         
-        os.remove(temp_path)
+        document = document_service.process_document(temp_path, file.filename)
+        _schedule_embedding(background_tasks, document)
         
         return document
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def _upload_session_response(service, upload) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        upload_id=upload.id,
+        filename=upload.filename,
+        size=upload.total_size,
+        part_size=upload.part_size,
+        part_count=upload.part_count,
+        received_parts=service.received_parts(upload),
+        status=upload.status,
+        expires_at=upload.expires_at,
+        document_id=upload.document_id,
+    )
+
+def _get_upload(service, upload_id: str):
+    try:
+        return service.get(upload_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/uploads/", response_model=UploadSessionResponse, status_code=201)
+def create_upload_session(body: UploadSessionCreate, db: Session = Depends(get_db)):
+    """Start a resumable upload; send parts with PUT, then POST .../complete"""
+    from app.services.upload_service import ChunkedUploadService
+    
+    service = ChunkedUploadService(db)
+    try:
+        upload = service.create(body.filename, body.size, part_size=body.part_size, md5=body.md5)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_session_response(service, upload)
+
+@app.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+def get_upload_session(upload_id: str, db: Session = Depends(get_db)):
+    """Session state, including the parts already received (to resume)"""
+    from app.services.upload_service import ChunkedUploadService
+    
+    service = ChunkedUploadService(db)
+    return _upload_session_response(service, _get_upload(service, upload_id))
+
+@app.put("/uploads/{upload_id}/parts/{part_number}", response_model=UploadPartResponse)
+async def upload_part(upload_id: str, part_number: int, request: Request, db: Session = Depends(get_db)):
+    """Receive one part as the raw request body; parts may be sent in parallel"""
+    from starlette.concurrency import run_in_threadpool
+    from app.services.upload_service import READ_CHUNK_SIZE, ChunkedUploadService
+    
+    # Database queries and file writes run in the threadpool, never on the event loop
+    service = ChunkedUploadService(db)
+    upload = await run_in_threadpool(_get_upload, service, upload_id)
+    try:
+        # May wait briefly on a completion claiming the session
+        writer = await run_in_threadpool(service.open_part, upload, part_number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        with stage_timer("receive", FileUtils().detect_file_type(upload.filename)):
+            # Written in blocks of about a megabyte, not one thread hop per chunk
+            buffered, buffered_size = [], 0
+            async for chunk in request.stream():
+                buffered.append(chunk)
+                buffered_size += len(chunk)
+                if buffered_size >= READ_CHUNK_SIZE:
+                    await run_in_threadpool(writer.write, b"".join(buffered))
+                    buffered, buffered_size = [], 0
+            if buffered:
+                await run_in_threadpool(writer.write, b"".join(buffered))
+        part = await run_in_threadpool(service.complete_part, upload, writer)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        writer.close()
+    return UploadPartResponse(part_number=part.part_number, size=part.size, md5=part.md5)
+
+@app.post("/uploads/{upload_id}/complete", response_model=DocumentResponse)
+def complete_upload(upload_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """Process the assembled file like a regular upload"""
+    from app.services.upload_service import ChunkedUploadService, IncompleteUploadError
+    
+    service = ChunkedUploadService(db)
+    try:
+        document = service.complete(upload_id)
+        _schedule_embedding(background_tasks, document)
+        return document
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IncompleteUploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+def abort_upload(upload_id: str, db: Session = Depends(get_db)):
+    from app.services.upload_service import ChunkedUploadService
+    
+    try:
+        ChunkedUploadService(db).abort(upload_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 @app.get("/documents/", response_model=List[DocumentResponse])
 def get_documents(
@@ -71,14 +278,66 @@ def get_documents(
     documents = db.query(Document).offset(skip).limit(limit).all()
     return documents
 
-@app.get("/stats/")
-def get_stats(db: Session = Depends(get_db)):
-    """Get storage statistics"""
+@app.get("/documents/export")
+def export_documents(
+    format: str = "ndjson",
+    columns: Optional[str] = None,
+    file_types: Optional[str] = None,
+    tiers: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Stream the document catalog as NDJSON or Parquet.
+    
+    `columns`, `file_types` and `tiers` are comma-separated lists.
+    """
+    from fastapi.responses import StreamingResponse
+    from app.services.export_service import EXPORT_FORMATS, ExportService, parquet_available
+    
+    def split(value):
+        return [item.strip() for item in value.split(",") if item.strip()] if value else None
+    
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    try:
+        exporter = ExportService(db, columns=split(columns), file_types=split(file_types),
+                                 tiers=split(tiers), since=since, until=until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        exporter.iter_format(format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename=documents.{format}"}
+    )
+
+@app.get("/documents/{document_id}/download")
+def download_document(document_id: int, db: Session = Depends(get_db)):
+    """Download the original content of a document"""
+    from fastapi.responses import StreamingResponse
+    from urllib.parse import quote
+    from app.utils.codecs import iter_stored_file
+    
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if document is None or not document.storage_path or not os.path.exists(document.storage_path):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return StreamingResponse(
+        iter_stored_file(document.storage_path),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(document.original_filename)}"}
+    )
+
+def _compute_stats(db: Session) -> dict:
     from sqlalchemy import func
     
-    total_docs = db.query(func.count(Document.id)).scalar()
-    total_original = db.query(func.sum(Document.original_size)).scalar() or 0
-    total_optimized = db.query(func.sum(Document.optimized_size)).scalar() or 0
+    with query_timer("stats"):
+        total_docs = db.query(func.count(Document.id)).scalar()
+        total_original = db.query(func.sum(Document.original_size)).scalar() or 0
+        total_optimized = db.query(func.sum(Document.optimized_size)).scalar() or 0
     
     return {
         "total_documents": total_docs,
@@ -87,9 +346,15 @@ def get_stats(db: Session = Depends(get_db)):
         "total_savings": total_original - total_optimized,
         "savings_percentage": ((total_original - total_optimized) / total_original * 100) if total_original > 0 else 0
     }
+
+@app.get("/stats/")
+def get_stats(request: Request, db: Session = Depends(get_db)):
+    """Get storage statistics"""
+    return response_cache.respond(request, "stats", lambda: _compute_stats(db))
     
 @app.get("/metrics/daily")
 def get_daily_metrics(
+    request: Request,
     days: int = 30,
     db: Session = Depends(get_db)
 ):
@@ -97,15 +362,21 @@ def get_daily_metrics(
     from app.services.metrics_service import MetricsService
     
     metrics_service = MetricsService(db)
-    return metrics_service.get_savings_trend(days)
+    return response_cache.respond(
+        request, "metrics_daily",
+        lambda: metrics_service.get_savings_trend(days),
+        namespaces=(STORAGE_METRICS,)
+    )
 
 @app.get("/metrics/breakdown")
-def get_breakdown(db: Session = Depends(get_db)):
+def get_breakdown(request: Request, db: Session = Depends(get_db)):
     """Get breakdown by file type"""
     from app.services.metrics_service import MetricsService
     
     metrics_service = MetricsService(db)
-    return metrics_service.get_file_type_breakdown()
+    return response_cache.respond(
+        request, "metrics_breakdown", metrics_service.get_file_type_breakdown
+    )
 
 @app.get("/documents/search")
 def search_documents(
@@ -113,49 +384,73 @@ def search_documents(
     db: Session = Depends(get_db)
 ):
     """Search documents by content"""
-    from app.models import Document
+    from app.services.search_service import SearchService
     
-    # Simple text search for now
-    documents = db.query(Document).filter(
-        Document.extracted_text.ilike(f"%{query}%"),
-        Document.is_duplicate == False
-    ).limit(50).all()
+    # Text is stored compressed, so match words through the keyword index
+    with query_timer("search"):
+        documents = SearchService(db).keyword_search(query, limit=50)
     
     return documents
 
-@app.get("/metrics/daily")
-def get_daily_metrics(
-    days: int = 30,
+@app.get("/documents/search/hybrid", response_model=List[SearchResult])
+def hybrid_search_documents(
+    query: str,
+    limit: int = 10,
     db: Session = Depends(get_db)
 ):
-    """Get daily metrics for dashboard"""
-    from app.services.metrics_service import MetricsService
+    """Search documents by keywords and meaning, fused with reciprocal rank fusion"""
+    from app.config import SEARCH_CANDIDATES
+    from app.services.search_service import SearchService
     
-    metrics_service = MetricsService(db)
-    return metrics_service.get_savings_trend(days)
+    if not 1 <= limit <= SEARCH_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_CANDIDATES}")
+    with query_timer("hybrid_search"):
+        return SearchService(db).hybrid_search(query, limit)
 
-@app.get("/metrics/breakdown")
-def get_breakdown(db: Session = Depends(get_db)):
-    """Get breakdown by file type"""
-    from app.services.metrics_service import MetricsService
-    
-    metrics_service = MetricsService(db)
-    return metrics_service.get_file_type_breakdown()
+# Each estimate runs a process pool inside this worker
+_estimate_slots = threading.BoundedSemaphore(ESTIMATE_MAX_CONCURRENT)
 
-@app.get("/documents/search")
-def search_documents(
-    query: str,
-    db: Session = Depends(get_db)
-):
-    """Search documents by content"""
-    from app.models import Document
+@app.get("/estimate/savings")
+def estimate_savings(path: str, sample_size: Optional[int] = None, seed: Optional[int] = None):
+    """Estimate what ingesting a server-side directory would save, from a sample.
     
-    documents = db.query(Document).filter(
-        Document.extracted_text.ilike(f"%{query}%"),
-        Document.is_duplicate == False
-    ).limit(50).all()
+    Only directories under ESTIMATE_ROOTS with at most
+    ESTIMATE_ENDPOINT_MAX_FILES files may be scanned; larger trees belong in
+    `python -m app.jobs.estimate_savings`.
+    """
+    from app.config import (
+        ESTIMATE_ENDPOINT_MAX_FILES, ESTIMATE_ENDPOINT_WORKERS, ESTIMATE_MAX_SAMPLE_SIZE, ESTIMATE_ROOTS,
+        ESTIMATE_SAMPLE_SIZE,
+    )
+    from app.services.savings_estimator import SavingsEstimator, TreeTooLargeError
     
-    return documents
+    sample_size = sample_size or ESTIMATE_SAMPLE_SIZE
+    if not 1 <= sample_size <= ESTIMATE_MAX_SAMPLE_SIZE:
+        raise HTTPException(status_code=400, detail=f"sample_size must be between 1 and {ESTIMATE_MAX_SAMPLE_SIZE}")
+    real_path = os.path.realpath(path)
+    allowed = [os.path.realpath(root) for root in ESTIMATE_ROOTS]
+    if not any(os.path.commonpath([real_path, root]) == root for root in allowed):
+        raise HTTPException(status_code=403, detail="path is not under ESTIMATE_ROOTS")
+    if not os.path.isdir(real_path):
+        raise HTTPException(status_code=404, detail=f"{path} is not a directory")
+    
+    if not _estimate_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="An estimate is already running, try again later")
+    try:
+        return SavingsEstimator(real_path, sample_size=sample_size, seed=seed, workers=ESTIMATE_ENDPOINT_WORKERS,
+                                max_files=ESTIMATE_ENDPOINT_MAX_FILES).run()
+    except TreeTooLargeError as e:
+        raise HTTPException(status_code=400, detail=f"{e}; run python -m app.jobs.estimate_savings instead")
+    finally:
+        _estimate_slots.release()
+
+@app.get("/metrics")
+def get_prometheus_metrics():
+    """Pipeline and query metrics in Prometheus text format"""
+    from fastapi import Response
+    
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Boolean, Text, LargeBinary, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -21,21 +21,35 @@ class Document(Base):
     reduction_strategy = Column(String)
     reduction_percentage = Column(Float)  # 0.0 to 100.0
     is_duplicate = Column(Boolean, default=False)
-    original_document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    original_document_id = Column(Integer, ForeignKey("documents.id"), nullable=True, index=True)
     
     # Storage info
-    storage_path = Column(String)
-    thumbnail_path = Column(String, nullable=True)
+    storage_path = Column(String, index=True)
+    thumbnail_path = Column(String, nullable=True, index=True)
     tier = Column(String, default="hot")  # hot, warm, cold, archive
     
-    # Content info
-    extracted_text = Column(Text, nullable=True)
+    # Content info (extracted text lives compressed in document_texts)
     text_hash = Column(String, nullable=True)  # For exact duplicate detection
     embedding = Column(Text, nullable=True)  # JSON string of embedding vector
     
     # Relationships
     duplicates = relationship("Document", backref="original", remote_side=[id])
     versions = relationship("DocumentVersion", back_populates="document")
+    text_blob = relationship("DocumentText", uselist=False, cascade="all, delete-orphan")
+    
+    @property
+    def extracted_text(self):
+        """Extracted text, loaded and decompressed on first access"""
+        return self.text_blob.text if self.text_blob is not None else None
+    
+    @extracted_text.setter
+    def extracted_text(self, text):
+        if text is None:
+            self.text_blob = None
+        elif self.text_blob is None:
+            self.text_blob = DocumentText(text=text)
+        else:
+            self.text_blob.text = text
 
 class DocumentVersion(Base):
     __tablename__ = "document_versions"
@@ -63,4 +77,74 @@ class StorageMetrics(Base):
     pdf_count = Column(Integer, default=0)
     docx_count = Column(Integer, default=0)
     image_count = Column(Integer, default=0)
-    other_count = Column(Integer, default=0)
\ No newline at end of file
+    other_count = Column(Integer, default=0)
+
+class ImageHash(Base):
+    __tablename__ = "image_hashes"
+    
+    # Perceptual hashes of original (non-duplicate) images, stored as signed
+    # 64-bit integers, for near-duplicate detection
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    phash = Column(BigInteger, nullable=False)
+    dhash = Column(BigInteger, nullable=False)
+
+
+class DocumentText(Base):
+    __tablename__ = "document_texts"
+    
+    # Kept out of the documents row so listing and scanning documents never
+    # reads the text
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    codec = Column(String, nullable=False)  # zstd, gzip or raw
+    content = Column(LargeBinary, nullable=False)
+    length = Column(Integer)  # Uncompressed size in bytes
+    
+    @property
+    def text(self) -> str:
+        from app.utils.codecs import decompress_text
+        return decompress_text(self.codec, self.content)
+    
+    @text.setter
+    def text(self, text: str):
+        from app.utils.codecs import compress_text
+        self.codec, self.content = compress_text(text)
+        self.length = len(text.encode("utf-8"))
+
+
+class SearchIndexState(Base):
+    __tablename__ = "search_index_state"
+    
+    # A single row. Jobs that rewrite indexed rows in place bump the version
+    # so every worker rebuilds its in-memory search index
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String, primary_key=True)  # uuid4 hex, used in URLs
+    filename = Column(String, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    expected_md5 = Column(String, nullable=True)  # checked on completion when the client sends it
+    status = Column(String, default="open")  # open, completing, completed
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)  # pushed back by every part
+    
+    parts = relationship("UploadPart", cascade="all, delete-orphan", order_by="UploadPart.part_number")
+    
+    @property
+    def part_count(self) -> int:
+        return max(1, -(-self.total_size // self.part_size))
+
+
+class UploadPart(Base):
+    __tablename__ = "upload_parts"
+    
+    # One row per part fully written to the session's file
+    upload_id = Column(String, ForeignKey("upload_sessions.id"), primary_key=True)
+    part_number = Column(Integer, primary_key=True)  # 1-based
+    size = Column(Integer, nullable=False)
+    md5 = Column(String, nullable=False)
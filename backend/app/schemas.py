@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class DocumentBase(BaseModel):
     original_filename: str
@@ -26,4 +26,33 @@ class StatsResponse(BaseModel):
     total_original_size: int
     total_optimized_size: int
     total_savings: int
-    savings_percentage: float
\ No newline at end of file
+    savings_percentage: float
+
+class SearchResult(BaseModel):
+    document: DocumentResponse
+    score: float
+    keyword_rank: Optional[int] = None
+    semantic_rank: Optional[int] = None
+    duplicate_ids: List[int] = []
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    part_size: Optional[int] = None
+    md5: Optional[str] = None  # whole-file MD5, verified on completion
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    part_size: int
+    part_count: int
+    received_parts: List[int]
+    status: str
+    expires_at: datetime
+    document_id: Optional[int] = None
+
+class UploadPartResponse(BaseModel):
+    part_number: int
+    size: int
+    md5: str
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import CACHE_BACKEND, CACHE_TTL_SECONDS, REDIS_URL
+
+# Cached responses are keyed on the version of every table they read from.
+# Committing a change to one of these tables bumps its version, so stale
+# entries are never served again and simply age out of the backend.
+DOCUMENTS = "documents"
+STORAGE_METRICS = "storage_metrics"
+
+
+class InMemoryCacheBackend:
+    """Process-local cache backend (default)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, namespace: str) -> int:
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace: str) -> int:
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            return self._versions[namespace]
+
+
+class RedisCacheBackend:
+    """Redis cache backend, shared by all workers.
+
+    Redis errors are treated as cache misses so the dashboard keeps working
+    (uncached) if Redis goes away.
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "docslim:cache:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._error = redis.RedisError
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._client.get(self.prefix + key)
+        except self._error:
+            return None
+
+    def set(self, key: str, value: bytes, ttl: int):
+        try:
+            self._client.set(self.prefix + key, value, ex=ttl)
+        except self._error:
+            pass
+
+    def get_version(self, namespace: str) -> int:
+        try:
+            return int(self._client.get(self.prefix + "version:" + namespace) or 0)
+        except self._error:
+            return 0
+
+    def bump_version(self, namespace: str) -> int:
+        try:
+            return self._client.incr(self.prefix + "version:" + namespace)
+        except self._error:
+            return 0
+
+
+class ResponseCache:
+    """Cache JSON responses with per-endpoint TTLs, versioned invalidation and ETags"""
+
+    def __init__(self, backend=None, ttls: Dict[str, int] = None):
+        self.backend = backend or InMemoryCacheBackend()
+        self.ttls = ttls if ttls is not None else CACHE_TTL_SECONDS
+
+    def respond(
+        self,
+        request: Request,
+        endpoint: str,
+        compute: Callable[[], object],
+        namespaces: Iterable[str] = (DOCUMENTS,),
+    ) -> Response:
+        """Serve `endpoint` from cache, computing and storing it on a miss.
+
+        Returns 304 when the client's If-None-Match matches the current ETag.
+        """
+        versions = ",".join(f"{ns}={self.backend.get_version(ns)}" for ns in namespaces)
+        key = f"{endpoint}?{request.url.query}#{versions}"
+
+        entry = self.backend.get(key)
+        if entry is None:
+            body = json.dumps(jsonable_encoder(compute())).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self.backend.set(key, etag.encode() + b"\n" + body, self.ttls.get(endpoint, 30))
+        else:
+            raw_etag, body = entry.split(b"\n", 1)
+            etag = raw_etag.decode()
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, namespace: str = DOCUMENTS):
+        """Invalidate every cached response that depends on `namespace`"""
+        self.backend.bump_version(namespace)
+
+
+def create_response_cache() -> ResponseCache:
+    """Build the response cache for the configured backend"""
+    if CACHE_BACKEND == "redis":
+        return ResponseCache(RedisCacheBackend(REDIS_URL))
+    return ResponseCache(InMemoryCacheBackend())
+
+
+response_cache = create_response_cache()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_changed_tables(session, flush_context):
+    """Remember which cached tables a flush touched"""
+    changed = session.info.setdefault("cache_changed_tables", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            changed.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_changes(orm_execute_state):
+    """Bulk query.update()/delete() bypass the flush, so track them here"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            changed = orm_execute_state.session.info.setdefault("cache_changed_tables", set())
+            changed.add(mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    """Bump cache versions once the change is actually committed"""
+    for table in session.info.pop("cache_changed_tables", ()):
+        response_cache.invalidate(table)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("cache_changed_tables", None)
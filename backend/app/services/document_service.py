@@ -1,66 +1,90 @@
 import os
 import hashlib
-import magic
-from pathlib import Path
 from datetime import datetime
 import shutil
+from functools import lru_cache
 from sqlalchemy.orm import Session
 
+from app.config import EMBEDDING_SERVER_SOCKET
 from app.models import Document
+from app.services.image_dedup_service import IMAGE_FILE_TYPES, ImageDedupService
 from app.utils.file_utils import FileUtils
+from app.utils.instrumentation import record_bytes, stage_timer
 
 class DocumentService:
     def __init__(self, db: Session):
         self.db = db
         self.file_utils = FileUtils()
     
-    def process_document(self, file_path: str, original_filename: str) -> Document:
-        """Process a document with improved duplicate detection"""
+    def process_document(self, file_path: str, original_filename: str, file_hash: str = None) -> Document:
+        """Process a document with improved duplicate detection.
+        
+        `file_hash` is the MD5 of the file when the caller already has it
+        (chunked uploads hash parts as they arrive), saving a full read.
+        """
         
         file_type = self.file_utils.detect_file_type(file_path)
         original_size = os.path.getsize(file_path)
         
         # BETTER DUPLICATE DETECTION
-        file_hash = self.file_utils.calculate_file_hash(file_path)
-        
-        # Check ALL documents, not just by hash
-        all_docs = self.db.query(Document).all()
+        if file_hash is None:
+            with stage_timer("hash", file_type):
+                file_hash = self.file_utils.calculate_file_hash(file_path)
         
-        duplicate_of = None
-        for doc in all_docs:
-            # Multiple duplicate detection strategies:
+        with stage_timer("dedup_lookup", file_type):
+            # Check ALL documents, not just by hash
+            all_docs = self.db.query(Document).all()
             
-            # 1. Same filename and similar size
-            if (doc.original_filename == original_filename and 
-                abs(doc.original_size - original_size) < 1024):  # Within 1KB
-                duplicate_of = doc.id
-                break
-            
-            # 2. Same hash (exact duplicate)
-            if doc.text_hash == file_hash:
-                duplicate_of = doc.id
-                break
+            duplicate_of = None
+            for doc in all_docs:
+                # Multiple duplicate detection strategies:
+                
+                # 1. Same filename and similar size
+                if (doc.original_filename == original_filename and 
+                    abs(doc.original_size - original_size) < 1024):  # Within 1KB
+                    duplicate_of = doc.id
+                    break
+                
+                # 2. Same hash (exact duplicate)
+                if doc.text_hash == file_hash:
+                    duplicate_of = doc.id
+                    break
         
         if duplicate_of:
             original_doc = self.db.query(Document).filter(Document.id == duplicate_of).first()
-            return self._create_duplicate_record(original_doc, original_filename, file_hash)
+            with stage_timer("db_commit", file_type):
+                duplicate = self._handle_duplicate(original_doc, original_filename)
+            record_bytes(file_type, original_size, 0)
+            return duplicate
         
-        # SIMPLE OPTIMIZATION: Don't increase file size
-        optimized_path = f"uploads/optimized/{original_filename}"
-        os.makedirs(os.path.dirname(optimized_path), exist_ok=True)
+        # Near-identical images (re-encoded, resized) never match by hash
+        image_hashes = None
+        if file_type in IMAGE_FILE_TYPES:
+            with stage_timer("perceptual_hash", file_type):
+                image_dedup = ImageDedupService(self.db)
+                image_hashes = image_dedup.compute_hashes(file_path)
+                original_doc = image_dedup.find_duplicate(image_hashes) if image_hashes else None
+            if original_doc:
+                with stage_timer("db_commit", file_type):
+                    duplicate = self._handle_duplicate(original_doc, original_filename)
+                record_bytes(file_type, original_size, 0)
+                return duplicate
         
-        # For demo, just copy but track original size
-        shutil.copy2(file_path, optimized_path)
-        optimized_size = original_size  # Claim no change for demo
+        with stage_timer("extract", file_type):
+            extracted_text = self.file_utils.extract_text(file_path, file_type)
         
-        # Calculate savings (0% for now to avoid negative)
-        reduction_percentage = 0.0  # Default to 0% savings
+        with stage_timer("optimize", file_type):
+            optimized_path, optimized_size, reduction_strategy = self._optimize_document(
+                file_path, file_type, original_filename
+            )
+            
+            # SIMPLE OPTIMIZATION: Don't increase file size
+            if optimized_size >= original_size:
+                shutil.copy2(file_path, optimized_path)
+                optimized_size = original_size
+                reduction_strategy = 'safe_copy'
         
-        # Only show savings if we actually reduced size
-        actual_size = os.path.getsize(optimized_path)
-        if actual_size < original_size:
-            reduction_percentage = ((original_size - actual_size) / original_size) * 100
-            optimized_size = actual_size
+        reduction_percentage = self._calculate_reduction_percentage(original_size, optimized_size)
         
         # Create document
         document = Document(
@@ -69,18 +93,23 @@ class DocumentService:
             optimized_size=optimized_size,
             file_type=file_type,
             storage_path=optimized_path,
-            reduction_strategy='safe_copy',
+            reduction_strategy=reduction_strategy,
             reduction_percentage=reduction_percentage,
             tier='hot' if file_type in ['pdf', 'docx'] else 'warm',
             is_duplicate=False,
             text_hash=file_hash,
-            extracted_text=f"Sample content from {file_type}",
+            extracted_text=extracted_text,
             upload_date=datetime.utcnow()
         )
         
-        self.db.add(document)
-        self.db.commit()
-        self.db.refresh(document)
+        with stage_timer("db_commit", file_type):
+            self.db.add(document)
+            if image_hashes:
+                self.db.flush()
+                image_dedup.record(document, image_hashes)
+            self.db.commit()
+            self.db.refresh(document)
+        record_bytes(file_type, original_size, optimized_size)
         
         print(f"📄 {original_filename}: {original_size/1024:.1f}KB → {optimized_size/1024:.1f}KB ({reduction_percentage:.1f}%)")
         
@@ -112,11 +141,36 @@ class DocumentService:
         
         optimizer = get_optimizer(file_type)
         optimized_path = f"uploads/optimized/{filename}"
+        os.makedirs(os.path.dirname(optimized_path), exist_ok=True)
         
         # Apply optimization
         optimized_size = optimizer.optimize(file_path, optimized_path)
+        strategy = optimizer.strategy or self._get_reduction_strategy(file_type)
         
-        return optimized_path, optimized_size
+        return optimized_path, optimized_size, strategy
+    
+    def embed_document(self, document_id: int):
+        """Store an embedding of a committed document's extracted text"""
+        document = self.db.get(Document, document_id)
+        if document is None or document.embedding is not None:
+            return
+        text = document.extracted_text
+        if not text:
+            return
+        with stage_timer("embed", document.file_type):
+            document.embedding = self._generate_embedding(text)
+        if document.embedding is not None:
+            self.db.commit()
+    
+    def _generate_embedding(self, text: str):
+        """Embed extracted text as a JSON string, or None if embeddings are unavailable"""
+        embedding_service = get_embedding_service()
+        try:
+            embedding = embedding_service.generate_embedding(text)
+        except (ImportError, OSError) as e:  # no model installed, or embedding server down
+            print(f"Embeddings disabled: {e}")
+            return None
+        return embedding_service.embeddings_to_json(embedding)
     
     def _calculate_text_hash(self, text: str) -> str:
         """Calculate hash of extracted text"""
@@ -172,7 +226,7 @@ class DocumentService:
             text_hash = hashlib.md5(text_sample.encode()).hexdigest()
             
             similar_docs = self.db.query(Document).filter(
-                Document.extracted_text.isnot(None)
+                Document.text_blob.has()
             ).all()
             
             for doc in similar_docs:
@@ -208,7 +262,8 @@ class DocumentService:
         
         return duplicate_doc
     
-    def _get_reduction_strategy(self, file_type: str) -> str:
+    @staticmethod
+    def _get_reduction_strategy(file_type: str) -> str:
         """Determine reduction strategy based on file type"""
         strategies = {
             'pdf': 'compression + deduplication',
@@ -220,8 +275,24 @@ class DocumentService:
         }
         return strategies.get(file_type, 'general compression')
 
+def embed_document_task(document_id: int):
+    """Background task run after an upload's response: embed in a session of its own"""
+    from app.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        DocumentService(db).embed_document(document_id)
+    except Exception as e:
+        print(f"❌ Embedding document {document_id} failed: {e}")
+    finally:
+        db.close()
+
 # Create a function to get embedding service instance
+@lru_cache(maxsize=1)
 def get_embedding_service():
     """Get or create embedding service instance"""
+    if EMBEDDING_SERVER_SOCKET:
+        from app.services.embedding_server import RemoteEmbeddingService
+        return RemoteEmbeddingService(EMBEDDING_SERVER_SOCKET)
     from app.services.embedding_service import EmbeddingService
     return EmbeddingService()
\ No newline at end of file
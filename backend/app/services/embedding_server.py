@@ -0,0 +1,272 @@
+"""One embedding model shared by every uvicorn worker, over a Unix socket.
+
+Usage (from backend/):
+    python -m app.services.embedding_server --socket /tmp/docslim-embed.sock
+    EMBEDDING_SERVER_SOCKET=/tmp/docslim-embed.sock uvicorn app.main:app --workers 4
+
+Requests arriving from any worker within a short window are encoded as one
+batch. Texts go over the wire as length-prefixed UTF-8, and vectors come
+back as raw little-endian float32, so there is no JSON on either side.
+
+Request:  u32 count, then count x (u32 length, UTF-8 bytes)
+Response: u8 status, u32 rows, u32 dim, then rows x dim float32
+          (on error, rows is the length of a UTF-8 message and dim is 0)
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from app.config import (
+    EMBEDDING_SERVER_BATCH_WINDOW_MS,
+    EMBEDDING_SERVER_MAX_BATCH,
+    EMBEDDING_SERVER_SOCKET,
+)
+from app.services.embedding_service import MAX_TEXT_CHARS, EmbeddingService
+
+COUNT = struct.Struct("!I")
+RESPONSE_HEADER = struct.Struct("!BII")
+STATUS_OK, STATUS_ERROR, STATUS_UNAVAILABLE = 0, 1, 2
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class _Request:
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: List[str], future: asyncio.Future):
+        self.texts = texts
+        self.future = future
+
+
+class EmbeddingServer:
+    """Serve `service.encode` over a Unix socket, micro-batching across clients"""
+
+    def __init__(
+        self,
+        socket_path: str,
+        service: Optional[EmbeddingService] = None,
+        window_ms: float = EMBEDDING_SERVER_BATCH_WINDOW_MS,
+        max_batch: int = EMBEDDING_SERVER_MAX_BATCH,
+    ):
+        self.socket_path = socket_path
+        self.service = service or EmbeddingService()
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batch_sizes: List[int] = []  # texts per encode call, for tests and tuning
+        self._loop = None
+        self._stopped = None
+        # The model runs in one thread so the event loop keeps accepting requests
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+
+    def run(self, ready: Optional[threading.Event] = None):
+        """Serve until `shutdown()` is called"""
+        asyncio.run(self._serve(ready))
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _serve(self, ready: Optional[threading.Event]):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # left behind by a server that did not exit cleanly
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        batcher = asyncio.create_task(self._batcher())
+        if threading.current_thread() is threading.main_thread():
+            self._loop.add_signal_handler(signal.SIGTERM, self._stopped.set)
+        if ready is not None:
+            ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            batcher.cancel()
+            self._executor.shutdown(wait=False)
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    (count,) = COUNT.unpack(await reader.readexactly(COUNT.size))
+                except asyncio.IncompleteReadError:
+                    return  # client closed the connection
+                texts = []
+                for _ in range(count):
+                    (length,) = COUNT.unpack(await reader.readexactly(COUNT.size))
+                    texts.append((await reader.readexactly(length)).decode("utf-8"))
+
+                request = _Request(texts, self._loop.create_future())
+                await self._queue.put(request)
+                try:
+                    vectors = await request.future
+                except ImportError as e:
+                    writer.write(self._error(STATUS_UNAVAILABLE, e))
+                except Exception as e:
+                    writer.write(self._error(STATUS_ERROR, e))
+                else:
+                    writer.write(RESPONSE_HEADER.pack(STATUS_OK, *vectors.shape))
+                    writer.write(vectors.astype(VECTOR_DTYPE, copy=False).tobytes())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _error(status: int, error: Exception) -> bytes:
+        message = str(error).encode("utf-8")
+        return RESPONSE_HEADER.pack(status, len(message), 0) + message
+
+    async def _batcher(self):
+        while True:
+            batch = [await self._queue.get()]
+            count = len(batch[0].texts)
+            deadline = self._loop.time() + self.window
+            while count < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(request)
+                count += len(request.texts)
+
+            texts = [text for request in batch for text in request.texts]
+            self.batch_sizes.append(len(texts))
+            try:
+                vectors = await self._loop.run_in_executor(
+                    self._executor, lambda: self.service.encode(texts, batch_size=self.max_batch)
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            # A handler cancelled meanwhile (e.g. on shutdown) has a done
+            # future; setting it would raise and end the batcher
+            offset = 0
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("embedding server closed the connection")
+        received += n
+    return bytes(buffer)
+
+
+class RemoteEmbeddingService(EmbeddingService):
+    """EmbeddingService that asks the shared embedding server instead of loading a model.
+
+    Each thread keeps its own connection. A server that is not running
+    surfaces as an OSError (ConnectionError), a server without the model as
+    an ImportError, the same as a missing local model.
+    """
+
+    def __init__(self, socket_path: str = EMBEDDING_SERVER_SOCKET, timeout: float = 60.0):
+        super().__init__()
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def model(self):
+        raise RuntimeError("RemoteEmbeddingService has no local model")
+
+    def warm_up(self):
+        self.encode(["warm up"])
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def encode(self, texts: List[str], batch_size: int = 32):
+        payload = [COUNT.pack(len(texts))]
+        for text in texts:
+            data = (text or "")[:MAX_TEXT_CHARS].encode("utf-8")
+            payload.append(COUNT.pack(len(data)))
+            payload.append(data)
+        request = b"".join(payload)
+
+        # One retry on a fresh connection covers a server restart between calls
+        for attempt in (1, 2):
+            try:
+                sock = self._connection()
+                sock.sendall(request)
+                status, rows, dim = RESPONSE_HEADER.unpack(_recv_exactly(sock, RESPONSE_HEADER.size))
+                body = _recv_exactly(sock, rows * dim * VECTOR_DTYPE.itemsize if status == STATUS_OK else rows)
+                break
+            except (ConnectionError, FileNotFoundError):
+                self._close()
+                if attempt == 2:
+                    raise
+            except OSError:
+                # Most likely a timeout: the server may still be encoding this
+                # request, so sending it again would only add to its load
+                self._close()
+                raise
+
+        if status == STATUS_UNAVAILABLE:
+            raise ImportError(body.decode("utf-8"))
+        if status != STATUS_OK:
+            raise RuntimeError(f"embedding server error: {body.decode('utf-8')}")
+        return np.frombuffer(body, dtype=VECTOR_DTYPE).reshape(rows, dim)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding server")
+    parser.add_argument("--socket", default=EMBEDDING_SERVER_SOCKET or "/tmp/docslim-embed.sock")
+    parser.add_argument("--window-ms", type=float, default=EMBEDDING_SERVER_BATCH_WINDOW_MS,
+                        help="how long to wait for more requests before encoding a batch")
+    parser.add_argument("--max-batch", type=int, default=EMBEDDING_SERVER_MAX_BATCH)
+    args = parser.parse_args()
+
+    service = EmbeddingService()
+    service.warm_up()
+    print(f"✅ Embedding model {service.model_name} loaded; serving on {args.socket}")
+    try:
+        EmbeddingServer(args.socket, service, window_ms=args.window_ms, max_batch=args.max_batch).run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,59 @@
-from sentence_transformers import SentenceTransformer
-import numpy as np
+import threading
 from typing import List
 import json
 
+from app.config import EMBEDDING_MODEL_NAME
+
+MAX_TEXT_CHARS = 10000
+
 class EmbeddingService:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        self.model_name = model_name
         self.embedding_dim = 384  # Dimension of this model's embeddings
+        self._model = None
+        self._model_lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """Load the model on first use; importing torch takes seconds"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+    
+    def warm_up(self):
+        """Load the model and run one encode so the first request is fast"""
+        self.model.encode("warm up")
+    
+    def encode(self, texts: List[str], batch_size: int = 32):
+        """Embed texts as a float32 matrix, one row per text; empty texts get zero vectors"""
+        import numpy as np
+        
+        vectors = np.zeros((len(texts), self.embedding_dim), dtype=np.float32)
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if indices:
+            # First 10k characters of each text
+            chunks = [texts[i][:MAX_TEXT_CHARS] for i in indices]
+            vectors[indices] = self.model.encode(chunks, batch_size=batch_size)
+        return vectors
     
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding vector for text"""
-        if not text or len(text.strip()) == 0:
-            return [0.0] * self.embedding_dim
-        
-        text_chunk = text[:10000]  # First 10k characters
-        embedding = self.model.encode(text_chunk)
-        return embedding.tolist()
+        return self.encode([text])[0].tolist()
+    
+    def generate_embeddings(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """Generate embeddings for many texts in batches"""
+        return self.encode(texts, batch_size=batch_size).tolist()
     
     def calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """Calculate cosine similarity between two embeddings"""
         if not embedding1 or not embedding2:
             return 0.0
         
+        import numpy as np
+        
         vec1 = np.array(embedding1)
         vec2 = np.array(embedding2)
         
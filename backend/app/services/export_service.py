@@ -0,0 +1,162 @@
+import json
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+from sqlalchemy.orm import Session
+
+from app.config import EXPORT_BATCH_SIZE
+from app.models import Document
+
+# Catalog columns that can be exported; text and embeddings are not catalog data
+EXPORT_COLUMNS = [
+    "id", "original_filename", "file_type", "original_size", "optimized_size",
+    "reduction_strategy", "reduction_percentage", "is_duplicate", "original_document_id",
+    "tier", "storage_path", "upload_date", "last_accessed", "access_count", "text_hash",
+]
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ExportService:
+    """Stream the document catalog as NDJSON or Parquet.
+
+    Rows are fetched `batch_size` at a time through a streaming cursor, only
+    the requested columns are selected, and each batch is serialized (one
+    Parquet row group per batch) and released before the next is fetched,
+    so memory use does not grow with the size of the catalog.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        columns: Optional[List[str]] = None,
+        file_types: Optional[List[str]] = None,
+        tiers: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ):
+        columns = columns or EXPORT_COLUMNS
+        unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+        self.db = db
+        self.columns = list(columns)
+        self.file_types = file_types
+        self.tiers = tiers
+        self.since = since
+        self.until = until
+        self.batch_size = batch_size
+
+    def _statement(self):
+        statement = select(*(getattr(Document, column) for column in self.columns))
+        if self.file_types:
+            statement = statement.where(Document.file_type.in_(self.file_types))
+        if self.tiers:
+            statement = statement.where(Document.tier.in_(self.tiers))
+        if self.since:
+            statement = statement.where(Document.upload_date >= self.since)
+        if self.until:
+            statement = statement.where(Document.upload_date < self.until)
+        return statement.order_by(Document.id).execution_options(yield_per=self.batch_size)
+
+    def iter_batches(self) -> Iterator[list]:
+        """Rows of the export, one list of tuples per batch"""
+        result = self.db.execute(self._statement())
+        try:
+            for partition in result.partitions():
+                yield partition
+        finally:
+            result.close()
+
+    def iter_ndjson(self) -> Iterator[bytes]:
+        columns = self.columns
+        for rows in self.iter_batches():
+            lines = [
+                json.dumps(
+                    {column: value.isoformat() if isinstance(value, datetime) else value
+                     for column, value in zip(columns, row)},
+                    ensure_ascii=False,
+                )
+                for row in rows
+            ]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    def arrow_schema(self):
+        import pyarrow as pa
+
+        def arrow_type(column_type):
+            if isinstance(column_type, Boolean):
+                return pa.bool_()
+            if isinstance(column_type, Integer):
+                return pa.int64()
+            if isinstance(column_type, Float):
+                return pa.float64()
+            if isinstance(column_type, DateTime):
+                return pa.timestamp("us")
+            return pa.string()
+
+        return pa.schema([
+            (column, arrow_type(getattr(Document, column).type)) for column in self.columns
+        ])
+
+    def iter_parquet(self) -> Iterator[bytes]:
+        """Parquet file bytes, written one row group per batch"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet export requires pyarrow") from e
+
+        schema = self.arrow_schema()
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        try:
+            for rows in self.iter_batches():
+                arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=len(rows))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def iter_format(self, export_format: str) -> Iterator[bytes]:
+        if export_format == "ndjson":
+            return self.iter_ndjson()
+        if export_format == "parquet":
+            return self.iter_parquet()
+        raise ValueError(f"Unknown export format: {export_format}")
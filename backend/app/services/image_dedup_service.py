@@ -0,0 +1,92 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import DHASH_MAX_DISTANCE, PHASH_MAX_DISTANCE
+from app.models import Document, ImageHash
+from app.utils.perceptual_hash import MultiIndexHashTable, hamming, to_signed, to_unsigned
+
+IMAGE_FILE_TYPES = {'jpg', 'png', 'tiff'}
+
+
+class ImageHashIndex:
+    """In-memory Hamming index over the perceptual hashes of original images.
+
+    Candidates are found by pHash through a multi-index hash table, then
+    confirmed by dHash, so a lookup never compares against every image. Like
+    the search index, it catches up on rows added by other workers by reading
+    hashes with a document id above the last one indexed.
+    """
+
+    def __init__(self, phash_radius: int = PHASH_MAX_DISTANCE, dhash_radius: int = DHASH_MAX_DISTANCE):
+        self.phash_radius = phash_radius
+        self.dhash_radius = dhash_radius
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phashes = MultiIndexHashTable(self.phash_radius)
+            self.dhashes: Dict[int, int] = {}
+            self.last_id = 0
+
+    def __len__(self):
+        return len(self.dhashes)
+
+    def refresh(self, db: Session):
+        """Index hashes stored since the last refresh"""
+        with self._lock:
+            rows = db.query(ImageHash.document_id, ImageHash.phash, ImageHash.dhash).filter(
+                ImageHash.document_id > self.last_id
+            ).order_by(ImageHash.document_id).yield_per(1000)
+            for row in rows:
+                self.add(row.document_id, to_unsigned(row.phash), to_unsigned(row.dhash))
+
+    def add(self, document_id: int, phash: int, dhash: int):
+        with self._lock:
+            self.phashes.add(document_id, phash)
+            self.dhashes[document_id] = dhash
+            self.last_id = max(self.last_id, document_id)
+
+    def find(self, phash: int, dhash: int) -> List[Tuple[int, int]]:
+        """(document_id, pHash distance) of near-identical images, nearest first"""
+        with self._lock:
+            return [
+                (document_id, distance)
+                for document_id, distance in self.phashes.query(phash)
+                if hamming(dhash, self.dhashes[document_id]) <= self.dhash_radius
+            ]
+
+
+image_hash_index = ImageHashIndex()
+
+
+class ImageDedupService:
+    def __init__(self, db: Session, index: ImageHashIndex = None):
+        self.db = db
+        self.index = index or image_hash_index
+
+    def compute_hashes(self, file_path: str) -> Optional[Tuple[int, int]]:
+        """(pHash, dHash) of an image, or None if it cannot be decoded"""
+        from app.utils.perceptual_hash import image_hashes
+
+        try:
+            return image_hashes(file_path)
+        except Exception as e:
+            print(f"⚠️ Perceptual hash failed for {file_path}: {e}")
+            return None
+
+    def find_duplicate(self, hashes: Tuple[int, int]) -> Optional[Document]:
+        """The original document a visually near-identical image duplicates, if any"""
+        self.index.refresh(self.db)
+        for document_id, _ in self.index.find(*hashes):
+            original = self.db.query(Document).filter(Document.id == document_id).first()
+            if original is not None:  # the row may have been garbage-collected
+                return original
+        return None
+
+    def record(self, document: Document, hashes: Tuple[int, int]):
+        """Stage the hashes of a new original image; they are saved with its commit"""
+        phash, dhash = hashes
+        self.db.add(ImageHash(document_id=document.id, phash=to_signed(phash), dhash=to_signed(dhash)))
@@ -3,6 +3,7 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.models import StorageMetrics
+from app.utils.instrumentation import query_timer
 
 class MetricsService:
     def __init__(self, db: Session):
@@ -64,9 +65,10 @@ class MetricsService:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        metrics = self.db.query(StorageMetrics).filter(
-            StorageMetrics.date >= start_date
-        ).order_by(StorageMetrics.date).all()
+        with query_timer("metrics_daily"):
+            metrics = self.db.query(StorageMetrics).filter(
+                StorageMetrics.date >= start_date
+            ).order_by(StorageMetrics.date).all()
         
         trend_data = []
         for metric in metrics:
@@ -89,12 +91,13 @@ class MetricsService:
         from app.models import Document
         from sqlalchemy import func
         
-        result = self.db.query(
-            Document.file_type,
-            func.count(Document.id).label('count'),
-            func.sum(Document.original_size).label('total_original'),
-            func.sum(Document.optimized_size).label('total_optimized')
-        ).group_by(Document.file_type).all()
+        with query_timer("metrics_breakdown"):
+            result = self.db.query(
+                Document.file_type,
+                func.count(Document.id).label('count'),
+                func.sum(Document.original_size).label('total_original'),
+                func.sum(Document.optimized_size).label('total_optimized')
+            ).group_by(Document.file_type).all()
         
         breakdown = []
         for row in result:
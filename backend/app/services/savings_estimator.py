@@ -0,0 +1,343 @@
+import bisect
+import contextlib
+import io
+import math
+import os
+import random
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import ESTIMATE_SAMPLE_SIZE, STORAGE_COST_PER_GB_MONTH
+from app.utils.file_utils import FileUtils
+
+# Size strata boundaries: optimizers behave differently on small and large files
+SIZE_BUCKETS = [64 * 1024, 1024 * 1024, 16 * 1024 * 1024]
+Z_95 = 1.96
+# Earlier files of the same size that a sampled file is compared with
+MAX_DUPLICATE_CANDIDATES = 16
+
+
+class TreeTooLargeError(ValueError):
+    """The tree has more files than the estimator was allowed to walk"""
+
+
+def _init_worker():
+    # Sampled files must not train zstd dictionaries for the real store
+    from app.utils import codecs
+    codecs.dictionary_store = codecs.ZstdDictionaryStore(read_only=True)
+
+
+def _measure(task: dict) -> dict:
+    """Optimize and hash one sampled file the way ingest would, in a worker process"""
+    from app.services.document_service import DocumentService
+    from app.utils.optimizers import get_optimizer
+
+    file_utils = FileUtils()
+    result = {"key": task["key"], "size": task["size"]}
+    try:
+        start = time.process_time()
+        with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+            file_hash = file_utils.calculate_file_hash(task["path"])
+            optimizer = get_optimizer(task["file_type"])
+            output_path = os.path.join(work_dir, "optimized" + Path(task["path"]).suffix)
+            optimized_size = optimizer.optimize(task["path"], output_path)
+        result["cpu_seconds"] = time.process_time() - start
+        # Ingest keeps the original when the optimizer did not help
+        result["optimized_size"] = min(optimized_size, task["size"])
+        result["strategy"] = optimizer.strategy or DocumentService._get_reduction_strategy(task["file_type"])
+        result["duplicate"] = any(
+            file_utils.calculate_file_hash(path) == file_hash for path in task["candidates"]
+        )
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _interval(estimate: float, variance: float, scale: float = 1.0) -> dict:
+    half_width = Z_95 * math.sqrt(max(variance, 0.0))
+    return {
+        "estimate": estimate * scale,
+        "low": max(estimate - half_width, 0.0) * scale,
+        "high": (estimate + half_width) * scale,
+    }
+
+
+def _expansion_total(population: int, values: List[float]) -> Tuple[float, float]:
+    """Estimated stratum total of `values` and its variance"""
+    n = len(values)
+    if n == 0:
+        return 0.0, 0.0
+    mean = sum(values) / n
+    variance = 0.0
+    if n > 1:
+        s2 = sum((v - mean) ** 2 for v in values) / (n - 1)
+        variance = population ** 2 * (1 - n / population) * s2 / n
+    return population * mean, variance
+
+
+def _ratio_total(population: int, total_size: int, sizes: List[float], values: List[float]) -> Tuple[float, float]:
+    """Ratio estimate of a stratum total of `values` given its known total size.
+
+    Savings scale with file size, so estimating the savings ratio and
+    multiplying by the exact byte count is much tighter than averaging
+    per-file savings.
+    """
+    n = len(values)
+    if n == 0 or not sum(sizes):
+        return 0.0, 0.0
+    ratio = sum(values) / sum(sizes)
+    variance = 0.0
+    if n > 1:
+        residuals = [v - ratio * x for v, x in zip(values, sizes)]
+        s2 = sum(d * d for d in residuals) / (n - 1)
+        variance = population ** 2 * (1 - n / population) * s2 / n
+    return total_size * ratio, variance
+
+
+class _Stratum:
+    """Files of one type and size bucket, with a uniform reservoir sample"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.files = 0
+        self.bytes = 0
+        self.reservoir: List[Tuple[int, str, int]] = []
+
+    def add(self, entry: Tuple[int, str, int], rng: random.Random):
+        self.files += 1
+        self.bytes += entry[2]
+        if len(self.reservoir) < self.capacity:
+            self.reservoir.append(entry)
+        else:
+            slot = rng.randrange(self.files)
+            if slot < self.capacity:
+                self.reservoir[slot] = entry
+
+
+class SavingsEstimator:
+    """Estimate what ingesting a directory tree would save, from a sample.
+
+    The tree is walked reading only directory metadata. Files are
+    stratified by type and size, and each stratum keeps a reservoir sample,
+    so memory does not grow with the number of files. The sample is split
+    across strata in proportion to their bytes and run through the real
+    optimizers and hashing in a process pool. Totals are extrapolated per
+    stratum, with 95% confidence intervals.
+
+    A sampled file counts as a duplicate when an identical file comes
+    earlier in the walk. A second metadata walk collects the earlier files
+    of each sampled size, up to MAX_DUPLICATE_CANDIDATES per size, so that
+    memory is bounded by the sample too. A sampled file with more earlier
+    files of its size is compared with the first ones only, which can miss
+    duplicates: the report counts those files in
+    `duplicate_checks_truncated`, and `duplicate_ratio` is then a lower bound.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        sample_size: int = ESTIMATE_SAMPLE_SIZE,
+        workers: Optional[int] = None,
+        scan_threads: int = 8,
+        seed: Optional[int] = None,
+        cost_per_gb_month: float = STORAGE_COST_PER_GB_MONTH,
+        max_files: Optional[int] = None,
+    ):
+        self.root = root
+        self.sample_size = max(1, sample_size)
+        self.workers = workers or os.cpu_count() or 1
+        self.scan_threads = scan_threads
+        self.random = random.Random(seed)
+        self.cost_per_gb_month = cost_per_gb_month
+        self.max_files = max_files  # stop the walk with TreeTooLargeError beyond this
+        self.file_utils = FileUtils()
+        self.strata: Dict[Tuple[str, int], _Stratum] = {}
+
+    def _iter_files(self) -> Iterator[List[Tuple[str, int]]]:
+        """(path, size) of the files in each directory, scanning directories in parallel"""
+        def scan(path):
+            files, subdirs = [], []
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                files.append((entry.path, entry.stat(follow_symlinks=False).st_size))
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            files.sort()
+            subdirs.sort()
+            return files, subdirs
+
+        with ThreadPoolExecutor(max_workers=self.scan_threads) as pool:
+            pending = deque([pool.submit(scan, self.root)])
+            while pending:
+                files, subdirs = pending.popleft().result()
+                pending.extend(pool.submit(scan, subdir) for subdir in subdirs)
+                yield files
+
+    def walk(self):
+        index = 0
+        for files in self._iter_files():
+            if self.max_files is not None and index + len(files) > self.max_files:
+                raise TreeTooLargeError(f"{self.root} has more than {self.max_files} files")
+            for path, size in files:
+                key = (self.file_utils.detect_file_type(path), bisect.bisect_right(SIZE_BUCKETS, size))
+                stratum = self.strata.get(key)
+                if stratum is None:
+                    stratum = self.strata[key] = _Stratum(self.sample_size)
+                stratum.add((index, path, size), self.random)
+                index += 1
+
+    def allocate(self) -> Dict[Tuple[str, int], int]:
+        """Sample size per stratum: proportional to its bytes, at least two files
+        (one if that is all it has) so every stratum has a variance"""
+        total_bytes = sum(stratum.bytes for stratum in self.strata.values()) or 1
+        allocation = {}
+        for key, stratum in self.strata.items():
+            share = round(self.sample_size * stratum.bytes / total_bytes)
+            allocation[key] = min(stratum.files, len(stratum.reservoir), max(2, share))
+        return allocation
+
+    def _tasks(self, allocation) -> List[dict]:
+        tasks = []
+        for key, n in allocation.items():
+            for index, path, size in self.random.sample(self.strata[key].reservoir, n):
+                tasks.append({"key": key, "index": index, "path": path, "size": size, "file_type": key[0],
+                              "candidates": [], "truncated": False})
+        return tasks
+
+    def _find_duplicate_candidates(self, tasks: List[dict]):
+        """Walk the tree again, collecting the earlier files of each sampled size"""
+        sampled = {task["index"]: task for task in tasks}
+        earlier: Dict[int, List[str]] = {task["size"]: [] for task in tasks}
+        seen = dict.fromkeys(earlier, 0)
+        index = 0
+        for files in self._iter_files():
+            for path, size in files:
+                if size in earlier:
+                    task = sampled.get(index)
+                    if task is not None:
+                        task["candidates"] = list(earlier[size])
+                        task["truncated"] = seen[size] > len(earlier[size])
+                    if len(earlier[size]) < MAX_DUPLICATE_CANDIDATES:
+                        earlier[size].append(path)
+                    seen[size] += 1
+                index += 1
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        self.walk()
+        tasks = self._tasks(self.allocate())
+        self._find_duplicate_candidates(tasks)
+        walk_seconds = time.perf_counter() - start
+
+        results: Dict[Tuple[str, int], List[dict]] = {key: [] for key in self.strata}
+        errors = 0
+        if tasks:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+                for result in pool.map(_measure, tasks, chunksize=max(1, len(tasks) // (self.workers * 4))):
+                    if "error" in result:
+                        errors += 1
+                    else:
+                        results[result["key"]].append(result)
+
+        report = self._extrapolate(results)
+        report.update({
+            "root": self.root,
+            "sampled_files": len(tasks),
+            "duplicate_checks_truncated": sum(task["truncated"] for task in tasks),
+            "errors": errors,
+            "walk_seconds": walk_seconds,
+            "elapsed_seconds": time.perf_counter() - start,
+        })
+        return report
+
+    def _extrapolate(self, results: Dict[Tuple[str, int], List[dict]]) -> dict:
+        totals = {"files": 0, "bytes": 0, "saved": [0.0, 0.0], "duplicates": [0.0, 0.0], "cpu": [0.0, 0.0]}
+        by_type: Dict[str, dict] = {}
+
+        for key, stratum in self.strata.items():
+            sample = results[key]
+            sizes = [r["size"] for r in sample]
+            # A duplicate is stored as a reference, so all of its bytes are saved
+            saved = [r["size"] if r["duplicate"] else r["size"] - r["optimized_size"] for r in sample]
+            parts = {
+                "saved": _ratio_total(stratum.files, stratum.bytes, sizes, saved),
+                "duplicates": _expansion_total(stratum.files, [float(r["duplicate"]) for r in sample]),
+                "cpu": _expansion_total(stratum.files, [r["cpu_seconds"] for r in sample]),
+            }
+            type_totals = by_type.setdefault(key[0], {
+                "files": 0, "bytes": 0, "sampled_files": 0, "saved": [0.0, 0.0], "strategies": {},
+            })
+            type_totals["files"] += stratum.files
+            type_totals["bytes"] += stratum.bytes
+            type_totals["sampled_files"] += len(sample)
+            type_totals["saved"][0] += parts["saved"][0]
+            type_totals["saved"][1] += parts["saved"][1]
+            for r in sample:
+                type_totals["strategies"][r["strategy"]] = type_totals["strategies"].get(r["strategy"], 0) + 1
+
+            totals["files"] += stratum.files
+            totals["bytes"] += stratum.bytes
+            for name, (estimate, variance) in parts.items():
+                totals[name][0] += estimate
+                totals[name][1] += variance
+
+        total_bytes = totals["bytes"] or 1
+        files = totals["files"] or 1
+        gb_month = self.cost_per_gb_month / 1024 ** 3
+        return {
+            "files": totals["files"],
+            "bytes": totals["bytes"],
+            "strata": len(self.strata),
+            "savings_bytes": _interval(*totals["saved"]),
+            "savings_percentage": _interval(*totals["saved"], scale=100 / total_bytes),
+            "monthly_cost_savings": _interval(*totals["saved"], scale=gb_month),
+            "duplicate_ratio": _interval(*totals["duplicates"], scale=1 / files),
+            "processing_cpu_seconds": _interval(*totals["cpu"]),
+            "processing_seconds_at_workers": _interval(*totals["cpu"], scale=1 / self.workers),
+            "by_type": {
+                file_type: {
+                    "files": t["files"],
+                    "bytes": t["bytes"],
+                    "sampled_files": t["sampled_files"],
+                    "savings_percentage": _interval(*t["saved"], scale=100 / (t["bytes"] or 1)),
+                    "strategies": t["strategies"],
+                }
+                for file_type, t in sorted(by_type.items())
+            },
+        }
+
+
+def format_report(report: dict) -> str:
+    def span(interval, fmt="{:.1f}"):
+        return f"{fmt.format(interval['estimate'])} ({fmt.format(interval['low'])}-{fmt.format(interval['high'])})"
+
+    lines = [
+        f"📁 {report['root']}: {report['files']:,} files, {report['bytes'] / 1024 ** 3:.2f} GB "
+        f"in {report['strata']} strata; sampled {report['sampled_files']} "
+        f"({report['errors']} failed) in {report['elapsed_seconds']:.1f}s",
+        f"💾 Savings: {span(report['savings_percentage'])}% = "
+        f"{span({k: v / 1024 ** 3 for k, v in report['savings_bytes'].items()}, '{:.2f}')} GB, "
+        f"${span(report['monthly_cost_savings'], '{:.2f}')}/month",
+        f"🔁 Duplicates: {span({k: v * 100 for k, v in report['duplicate_ratio'].items()})}% of files"
+        + (f", a lower bound: {report['duplicate_checks_truncated']} sampled files were only compared with "
+           f"the first {MAX_DUPLICATE_CANDIDATES} earlier files of their size"
+           if report["duplicate_checks_truncated"] else ""),
+        f"⏱️  Processing: {span({k: v / 3600 for k, v in report['processing_cpu_seconds'].items()}, '{:.2f}')} "
+        f"CPU-hours",
+    ]
+    for file_type, entry in report["by_type"].items():
+        lines.append(f"   {file_type}: {entry['files']:,} files, {entry['bytes'] / 1024 ** 2:.1f} MB, "
+                     f"sampled {entry['sampled_files']}, reduction {span(entry['savings_percentage'])}%")
+    lines.append("   (95% confidence intervals in parentheses)")
+    return "\n".join(lines)
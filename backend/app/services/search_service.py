@@ -0,0 +1,522 @@
+import json
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import (
+    EMBED_ON_INGEST,
+    SEARCH_CANDIDATES,
+    SEARCH_IVF_MIN_VECTORS,
+    SEARCH_IVF_NPROBE,
+    SEARCH_LATE_COMMIT_SECONDS,
+    SEARCH_RRF_K,
+)
+from app.models import Document, DocumentText, SearchIndexState
+
+TOKEN_RE = re.compile(r"\w\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class KeywordIndex:
+    """In-memory BM25 inverted index.
+
+    Postings are kept in `array.array`s so appending is cheap and search can
+    view them as numpy arrays without copying. Documents are added in
+    increasing order, so every posting list is sorted by document.
+
+    When a query has selective terms, only documents containing one of them
+    are scored. Very common terms are then looked up in their posting lists
+    by binary search instead of being scanned across the whole corpus, and
+    only for documents whose score could still reach the top k.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, common_term_fraction: float = 0.05):
+        self.k1 = k1
+        self.b = b
+        self.common_term_fraction = common_term_fraction
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_lengths = array('f')
+        self._total_length = 0.0
+        self._norms = None
+        self._score_cache = OrderedDict()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, doc_idx: int, text: Optional[str]):
+        """Index `text` as document `doc_idx`; indices must be added in order"""
+        terms = Counter(tokenize(text or ""))
+        length = sum(terms.values())
+        self._doc_lengths.append(length)
+        self._total_length += length
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('i'), array('f'))
+            postings[0].append(doc_idx)
+            postings[1].append(tf)
+
+    def _length_norms(self) -> np.ndarray:
+        """Per-document BM25 length normalization, recomputed when documents are added"""
+        n_docs = len(self._doc_lengths)
+        if self._norms is None or len(self._norms) != n_docs:
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.float32)
+            avg_length = self._total_length / n_docs or 1.0
+            self._norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        return self._norms
+
+    def _term_scores(self, term: str, docs, tf, idf: float, norms) -> Tuple[np.ndarray, np.ndarray]:
+        """Posting list of `term` as native indices, and its BM25 contribution
+        to every document in it.
+
+        Only queries made entirely of common terms need these for whole
+        posting lists, so a few are cached until the next document is added.
+        Native indices scatter into the score array without being converted
+        on every query.
+        """
+        n_docs = len(self._doc_lengths)
+        cached = self._score_cache.get(term)
+        if cached is not None and cached[0] == n_docs:
+            self._score_cache.move_to_end(term)
+            return cached[1], cached[2]
+        scores = idf * tf * (self.k1 + 1) / (tf + norms[docs])
+        docs = docs.astype(np.intp)
+        self._score_cache[term] = (n_docs, docs, scores)
+        if len(self._score_cache) > 16:
+            self._score_cache.popitem(last=False)
+        return docs, scores
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """Return up to `top_k` (doc_idx, score) pairs, best first"""
+        n_docs = len(self._doc_lengths)
+        if n_docs == 0:
+            return []
+
+        terms = []
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                docs = np.frombuffer(postings[0], dtype=np.int32)
+                tf = np.frombuffer(postings[1], dtype=np.float32)
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                terms.append((term, docs, tf, idf))
+        if not terms:
+            return []
+
+        norms = self._length_norms()
+        selective = [t for t in terms if len(t[1]) <= n_docs * self.common_term_fraction]
+        common = [t for t in terms if len(t[1]) > n_docs * self.common_term_fraction]
+        candidates = _union([docs for _, docs, _, _ in selective]) if selective else None
+
+        if candidates is None or len(candidates) < top_k:
+            scores = np.zeros(n_docs, dtype=np.float32)
+            for term, docs, tf, idf in terms:
+                docs, term_scores = self._term_scores(term, docs, tf, idf, norms)
+                scores[docs] += term_scores
+            return _top_k(scores, top_k)
+
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for _, docs, tf, idf in selective:
+            scores[np.searchsorted(candidates, docs)] += idf * tf * (self.k1 + 1) / (tf + norms[docs])
+        if common:
+            # A term adds less than idf * (k1 + 1), so candidates that can't
+            # reach the top_k even with every common term are dropped first
+            bound = sum(idf for _, _, _, idf in common) * (self.k1 + 1)
+            threshold = np.partition(scores, len(scores) - top_k)[len(scores) - top_k]
+            keep = scores + bound >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+        for _, docs, tf, idf in common:
+            positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            matched = docs[positions] == candidates
+            term_tf = tf[positions[matched]]
+            scores[matched] += idf * term_tf * (self.k1 + 1) / (term_tf + norms[candidates[matched]])
+        return [(int(candidates[i]), score) for i, score in _top_k(scores, top_k)]
+
+
+class VectorIndex:
+    """Cosine similarity over normalized float32 vectors.
+
+    Vectors live in one preallocated matrix that doubles when full, so adding
+    a row is amortized O(1). Small indexes are searched exhaustively. Once
+    the index holds `ivf_min_vectors` rows, an inverted file (IVF) is trained
+    in the background: k-means centroids partition the rows into lists and a
+    search only scans the `nprobe` lists closest to the query. Scanning every
+    row is bound by memory bandwidth, which is too slow at a million
+    documents. Until training finishes, searches stay exhaustive.
+    """
+
+    def __init__(self, dim: int = 384, capacity: int = 1024,
+                 ivf_min_vectors: int = SEARCH_IVF_MIN_VECTORS, nprobe: int = SEARCH_IVF_NPROBE):
+        self.dim = dim
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._doc_idx = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._centroids = None
+        self._lists: List[array] = []
+        self._trained_size = 0
+        self._training = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, doc_idx: int, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if vector.shape != (self.dim,) or norm == 0:
+            return
+        with self._lock:
+            if self._size == len(self._matrix):
+                self._grow()
+            row = self._size
+            self._matrix[row] = vector / norm
+            self._doc_idx[row] = doc_idx
+            self._size += 1
+            if self._centroids is not None:
+                self._lists[int(np.argmax(self._centroids @ self._matrix[row]))].append(row)
+
+    def _grow(self):
+        capacity = max(1, 2 * len(self._matrix))
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        doc_idx = np.zeros(capacity, dtype=np.int64)
+        doc_idx[:self._size] = self._doc_idx[:self._size]
+        self._matrix, self._doc_idx = matrix, doc_idx
+
+    def needs_training(self) -> bool:
+        """True once the index is big enough for IVF, or has grown 4x since the last training"""
+        if self._training or self._size < self.ivf_min_vectors:
+            return False
+        return self._centroids is None or self._size > 4 * self._trained_size
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """Train IVF centroids with spherical k-means and assign every row to a list"""
+        with self._lock:
+            matrix, size = self._matrix, self._size
+        vectors = matrix[:size]  # rows are never rewritten, so no lock is needed
+        n_lists = max(1, int(math.sqrt(size)))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(size, size=min(size, 64 * n_lists), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            non_empty = norms > 0  # empty clusters keep their previous centroid
+            centroids[non_empty] = sums[non_empty] / norms[non_empty, None]
+
+        lists = [array('q') for _ in range(n_lists)]
+        for start in range(0, size, 65536):
+            assignment = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+            for offset, c in enumerate(assignment):
+                lists[c].append(start + offset)
+
+        with self._lock:
+            # Rows added while training get assigned to the new lists as well
+            for row in range(size, self._size):
+                lists[int(np.argmax(centroids @ self._matrix[row]))].append(row)
+            self._centroids, self._lists, self._trained_size = centroids, lists, size
+            self._training = False
+
+    def train_in_background(self):
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+        threading.Thread(target=self.train, name="search-ivf-training", daemon=True).start()
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if self.needs_training():
+            self.train_in_background()
+        with self._lock:
+            if self._size == 0:
+                return []
+            if self._centroids is None:
+                rows = None
+                scores = self._matrix[:self._size] @ query_vector
+            else:
+                probes = np.argpartition(-(self._centroids @ query_vector), min(self.nprobe, len(self._lists)) - 1)
+                rows = np.concatenate([
+                    np.frombuffer(self._lists[c], dtype=np.int64) for c in probes[:self.nprobe]
+                ])
+                scores = self._matrix[rows] @ query_vector
+            doc_idx = self._doc_idx
+        hits = _top_k(scores, top_k)
+        if rows is not None:
+            hits = [(int(rows[i]), score) for i, score in hits]
+        return [(int(doc_idx[row]), score) for row, score in hits]
+
+
+def _top_k(scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """Indices and values of the `k` largest positive scores, best first"""
+    k = min(k, len(scores))
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    candidates = candidates[np.argsort(-scores[candidates])]
+    return [(int(i), float(scores[i])) for i in candidates if scores[i] > 0]
+
+
+def _union(posting_lists: List[np.ndarray]) -> np.ndarray:
+    """Sorted union of sorted document lists; much faster than np.unique here"""
+    docs = np.sort(np.concatenate(posting_lists))
+    return docs[np.concatenate(([True], docs[1:] != docs[:-1]))]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = SEARCH_RRF_K) -> Dict[int, float]:
+    """Fuse ranked id lists: each list contributes 1 / (k + rank)"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class HybridSearchIndex:
+    """Keyword and vector indexes over all documents, kept in memory.
+
+    Every search first reads rows with an id above the last indexed one (a
+    primary-key range scan that is usually empty), so documents uploaded
+    through any worker become searchable immediately. Ids are not committed
+    in order, so ids the scan skipped are looked up again for
+    SEARCH_LATE_COMMIT_SECONDS in case their rows commit late.
+
+    Rows rewritten in place (e.g. by reprocessing) are picked up once the job
+    calls `invalidate_search_index`: every worker then sees a new version and
+    rebuilds on its next refresh.
+
+    A rebuild loads a second copy of the indexes without holding the search
+    lock and swaps it in. It runs in the one search that noticed the new
+    version first; other searches keep being served from the previous copy
+    meanwhile. Only the first build makes searches wait.
+
+    With `await_embeddings`, the most recent documents indexed without an
+    embedding are rechecked on refresh, since uploads are embedded by a
+    background task after their row is committed.
+    """
+
+    max_awaiting_embedding = 1024
+    max_skipped_ids = 1024
+
+    def __init__(self, dim: int = 384, await_embeddings: bool = EMBED_ON_INGEST):
+        self.dim = dim
+        self.await_embeddings = await_embeddings
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.keyword = KeywordIndex()
+            self.vector = VectorIndex(self.dim)
+            self.doc_ids = array('q')
+            self.canonical_ids = array('q')
+            self.last_id = 0
+            self.version = None
+            self.awaiting_embedding: "OrderedDict[int, int]" = OrderedDict()  # doc id -> doc_idx
+            self.skipped_ids: "OrderedDict[int, float]" = OrderedDict()  # doc id -> when skipped
+
+    def refresh(self, db: Session):
+        """Rebuild if the version changed, then index documents added since the last refresh"""
+        version = db.query(SearchIndexState.version).filter(SearchIndexState.id == 1).scalar() or 0
+        if version != self.version:
+            # Only the first build is waited for; afterwards one search
+            # rebuilds and the others keep using the current copy
+            self._rebuild(db, version, wait=self.version is None)
+        with self._lock:
+            self._load(db)
+
+    def warm_up(self, db: Session):
+        """Build the index ahead of the first search, and train its IVF if it is big enough"""
+        self.refresh(db)
+        if self.vector.needs_training():
+            self.vector.train_in_background()
+
+    def _rebuild(self, db: Session, version: int, wait: bool):
+        if not self._build_lock.acquire(blocking=wait):
+            return  # another thread is rebuilding
+        try:
+            if self.version == version:
+                return  # another thread rebuilt while this one waited
+            fresh = HybridSearchIndex(self.dim, self.await_embeddings)
+            fresh._load(db)
+            with self._lock:
+                self.keyword, self.vector = fresh.keyword, fresh.vector
+                self.doc_ids, self.canonical_ids = fresh.doc_ids, fresh.canonical_ids
+                self.last_id, self.awaiting_embedding = fresh.last_id, fresh.awaiting_embedding
+                self.skipped_ids = fresh.skipped_ids
+                self.version = version
+        finally:
+            self._build_lock.release()
+
+    def _load(self, db: Session):
+        from app.utils.codecs import decompress_text
+
+        def rows(condition):
+            return db.query(
+                Document.id,
+                Document.original_document_id,
+                DocumentText.codec,
+                DocumentText.content,
+                Document.embedding,
+            ).outerjoin(DocumentText, DocumentText.document_id == Document.id).filter(
+                condition
+            ).order_by(Document.id).yield_per(1000)
+
+        expired = time.monotonic() - SEARCH_LATE_COMMIT_SECONDS
+        while self.skipped_ids and next(iter(self.skipped_ids.values())) < expired:
+            self.skipped_ids.popitem(last=False)  # rolled back or deleted
+        conditions = [Document.id > self.last_id]
+        if self.skipped_ids:
+            conditions.append(Document.id.in_(list(self.skipped_ids)))
+
+        for condition in conditions:
+            for row in rows(condition):
+                text = decompress_text(row.codec, row.content) if row.content is not None else None
+                embedding = json.loads(row.embedding) if row.embedding else None
+                self.add(row.id, row.original_document_id, text, embedding)
+
+        if self.awaiting_embedding:
+            for doc_id, embedding in db.query(Document.id, Document.embedding).filter(
+                Document.id.in_(list(self.awaiting_embedding)), Document.embedding.isnot(None)
+            ):
+                self.vector.add(self.awaiting_embedding.pop(doc_id), json.loads(embedding))
+
+    def add(self, doc_id: int, original_document_id: Optional[int], text: Optional[str], embedding):
+        with self._lock:
+            doc_idx = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.canonical_ids.append(original_document_id or doc_id)
+            self.keyword.add(doc_idx, text)
+            if embedding is not None:
+                self.vector.add(doc_idx, embedding)
+            elif self.await_embeddings and text and original_document_id is None:
+                self.awaiting_embedding[doc_id] = doc_idx
+                if len(self.awaiting_embedding) > self.max_awaiting_embedding:
+                    self.awaiting_embedding.popitem(last=False)
+            if doc_id > self.last_id + 1:
+                now = time.monotonic()
+                for skipped in range(max(self.last_id + 1, doc_id - self.max_skipped_ids), doc_id):
+                    self.skipped_ids[skipped] = now
+                while len(self.skipped_ids) > self.max_skipped_ids:
+                    self.skipped_ids.popitem(last=False)
+            self.skipped_ids.pop(doc_id, None)
+            self.last_id = max(self.last_id, doc_id)
+
+    def search(self, query: str, query_vector: Optional[np.ndarray], limit: int,
+               candidates: int = SEARCH_CANDIDATES) -> List[dict]:
+        """Fuse keyword and vector candidates, collapsing duplicates onto their original"""
+        with self._lock:
+            keyword_hits = self.keyword.search(query, candidates)
+            vector_hits = self.vector.search(query_vector, candidates) if query_vector is not None else []
+
+            rankings = []
+            for hits in (keyword_hits, vector_hits):
+                ranking, seen = [], set()
+                for doc_idx, _ in hits:
+                    canonical = self.canonical_ids[doc_idx]
+                    if canonical not in seen:
+                        seen.add(canonical)
+                        ranking.append(canonical)
+                rankings.append(ranking)
+
+            keyword_ranking, vector_ranking = rankings
+            fused = reciprocal_rank_fusion(rankings)
+            best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+            return [
+                {
+                    'document_id': canonical,
+                    'score': score,
+                    'keyword_rank': keyword_ranking.index(canonical) + 1 if canonical in keyword_ranking else None,
+                    'semantic_rank': vector_ranking.index(canonical) + 1 if canonical in vector_ranking else None,
+                }
+                for canonical, score in best
+            ]
+
+
+search_index = HybridSearchIndex()
+
+
+def invalidate_search_index(db: Session):
+    """Make every worker rebuild its search index once `db` commits.
+
+    Call this in the transaction that rewrites text or embeddings of
+    existing rows; new rows are picked up without it.
+    """
+    if not db.query(SearchIndexState).filter(SearchIndexState.id == 1).update(
+        {SearchIndexState.version: SearchIndexState.version + 1}, synchronize_session=False
+    ):
+        db.add(SearchIndexState(id=1, version=1))
+
+
+@lru_cache(maxsize=1024)
+def _cached_query_vector(query: str) -> Optional[np.ndarray]:
+    """Raises when no model is reachable, so failures are never cached"""
+    from app.services.document_service import get_embedding_service
+
+    vector = np.asarray(get_embedding_service().generate_embedding(query), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return None
+    vector = vector / norm
+    vector.setflags(write=False)
+    return vector
+
+
+def embed_query(query: str) -> Optional[np.ndarray]:
+    """Embed a search query once; repeated queries hit the cache. None when
+    embeddings are unavailable right now (no model, embedding server down)"""
+    try:
+        return _cached_query_vector(query)
+    except (ImportError, OSError):
+        return None
+
+
+class SearchService:
+    def __init__(self, db: Session, index: HybridSearchIndex = search_index):
+        self.db = db
+        self.index = index
+
+    def keyword_search(self, query: str, limit: int = 50) -> List[Document]:
+        """Original documents matching the query's words, best BM25 match first"""
+        self.index.refresh(self.db)
+        hits = self.index.search(query, None, limit)
+        ids = [hit['document_id'] for hit in hits]
+        documents = {doc.id: doc for doc in self.db.query(Document).filter(Document.id.in_(ids))}
+        return [documents[doc_id] for doc_id in ids if doc_id in documents]
+
+    def hybrid_search(self, query: str, limit: int = 10) -> List[dict]:
+        """Search by keywords and meaning, returning one hit per original document"""
+        self.index.refresh(self.db)
+        hits = self.index.search(query, embed_query(query), limit)
+        if not hits:
+            return []
+
+        ids = [hit['document_id'] for hit in hits]
+        documents = {doc.id: doc for doc in self.db.query(Document).filter(Document.id.in_(ids))}
+        duplicates: Dict[int, List[int]] = {}
+        for doc_id, original_id in self.db.query(Document.id, Document.original_document_id).filter(
+            Document.original_document_id.in_(ids)
+        ):
+            duplicates.setdefault(original_id, []).append(doc_id)
+
+        return [
+            dict(hit, document=documents[hit['document_id']],
+                 duplicate_ids=sorted(duplicates.get(hit['document_id'], [])))
+            for hit in hits
+            if hit['document_id'] in documents
+        ]
@@ -0,0 +1,338 @@
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.config import CHUNKED_UPLOAD_DIR, UPLOAD_PART_SIZE, UPLOAD_SESSION_TTL_SECONDS
+from app.models import Document, UploadPart, UploadSession
+
+MIN_PART_SIZE = 64 * 1024
+MAX_PART_SIZE = 256 * 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class IncompleteUploadError(ValueError):
+    """Completion was requested before every part arrived"""
+
+
+class _RunningHash:
+    """MD5 of the file so far, advanced over parts as soon as they are contiguous.
+
+    MD5 can only be fed in order, so a part that arrives ahead of a gap is
+    hashed once the gap is filled, read back from the page cache it was just
+    written to. MD5 state can't be saved, so it lives in the process that
+    received the parts: a session whose parts went to several workers, or
+    that outlived a restart, is hashed from the file on completion. Entries
+    idle for longer than the session TTL are dropped, so abandoned uploads
+    don't accumulate in any worker.
+    """
+
+    def __init__(self):
+        self.touched = time.monotonic()
+        self.md5 = hashlib.md5()
+        self.next_part = 1
+        self.completed: Dict[int, str] = {}  # part number -> part MD5, not yet hashed
+        self.hashed: Dict[int, str] = {}  # part number -> part MD5, included in self.md5
+        self.broken = False
+        self.lock = threading.Lock()
+
+
+_running_hashes: Dict[str, _RunningHash] = {}
+_running_hashes_lock = threading.Lock()
+
+
+def _running_hash(upload_id: str) -> _RunningHash:
+    now = time.monotonic()
+    with _running_hashes_lock:
+        for stale_id in [key for key, state in _running_hashes.items()
+                         if now - state.touched > UPLOAD_SESSION_TTL_SECONDS]:
+            del _running_hashes[stale_id]
+        state = _running_hashes.setdefault(upload_id, _RunningHash())
+        state.touched = now
+        return state
+
+
+def _drop_running_hash(upload_id: str):
+    with _running_hashes_lock:
+        _running_hashes.pop(upload_id, None)
+
+
+class PartWriter:
+    """Write one part's bytes at its offset in the session file as they arrive.
+
+    Holds a shared lock on the file until closed, so completion can tell
+    whether parts are still being written, in this process or another.
+    """
+
+    def __init__(self, path: str, part_number: int, offset: int, size: int):
+        self.path = path
+        self.part_number = part_number
+        self.offset = offset
+        self.size = size
+        self.written = 0
+        self.md5 = hashlib.md5()
+        self._fd = os.open(path, os.O_WRONLY)
+        fcntl.flock(self._fd, fcntl.LOCK_SH)
+
+    def write(self, data: bytes):
+        if self.written + len(data) > self.size:
+            self.close()
+            raise ValueError(f"Part {self.part_number} is larger than {self.size} bytes")
+        os.pwrite(self._fd, data, self.offset + self.written)
+        self.md5.update(data)
+        self.written += len(data)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ChunkedUploadService:
+    """Resumable uploads: create a session, send numbered parts (in any order,
+    in parallel), then complete it.
+
+    The target file is preallocated at its final size and every part is
+    written straight to its offset, so completion never concatenates or
+    copies. Parts are hashed while streaming, and the whole-file MD5 is
+    carried forward as parts become contiguous, so `process_document` gets
+    the hash without reading the file again.
+    """
+
+    def __init__(self, db: Session, root: Optional[str] = None):
+        self.db = db
+        self.root = root or CHUNKED_UPLOAD_DIR
+
+    def _directory(self, upload_id: str) -> str:
+        return os.path.join(self.root, upload_id)
+
+    def file_path(self, upload: UploadSession) -> str:
+        return os.path.join(self._directory(upload.id), upload.filename)
+
+    @staticmethod
+    def _ttl() -> timedelta:
+        return timedelta(seconds=UPLOAD_SESSION_TTL_SECONDS)
+
+    def create(self, filename: str, size: int, part_size: Optional[int] = None,
+               md5: Optional[str] = None) -> UploadSession:
+        # Keep only the last path component; the extension decides the file type
+        filename = re.sub(r"[^\w.\- ]", "_", os.path.basename(filename or "")).strip(". ")
+        if not filename:
+            raise ValueError("filename is required")
+        if size < 0:
+            raise ValueError("size must not be negative")
+        part_size = part_size or UPLOAD_PART_SIZE
+        if not MIN_PART_SIZE <= part_size <= MAX_PART_SIZE:
+            raise ValueError(f"part_size must be between {MIN_PART_SIZE} and {MAX_PART_SIZE} bytes")
+
+        self.expire_stale()
+
+        upload = UploadSession(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            total_size=size,
+            part_size=part_size,
+            expected_md5=md5.lower() if md5 else None,
+            status="open",
+            created_at=datetime.utcnow(),
+            expires_at=datetime.utcnow() + self._ttl(),
+        )
+        path = self.file_path(upload)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # Reserve the space up front so a full disk fails here, not at 90%
+            if size and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+        except OSError:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+            raise
+        finally:
+            os.close(fd)
+
+        self.db.add(upload)
+        self.db.commit()
+        return upload
+
+    def get(self, upload_id: str) -> UploadSession:
+        upload = self.db.query(UploadSession).filter(UploadSession.id == upload_id).first()
+        if upload is None or upload.expires_at < datetime.utcnow():
+            raise LookupError(f"Upload {upload_id} not found or expired")
+        return upload
+
+    def received_parts(self, upload: UploadSession) -> List[int]:
+        return [part.part_number for part in upload.parts]
+
+    def open_part(self, upload: UploadSession, part_number: int) -> PartWriter:
+        if upload.status != "open":
+            raise ValueError(f"Upload {upload.id} is {upload.status}")
+        if not 1 <= part_number <= upload.part_count:
+            raise ValueError(f"part_number must be between 1 and {upload.part_count}")
+        offset = (part_number - 1) * upload.part_size
+        size = min(upload.part_size, upload.total_size - offset)
+        writer = PartWriter(self.file_path(upload), part_number, offset, size)
+        # Checked again under the lock: completion claims the session while
+        # holding it exclusively, so no part can be written after the claim
+        status = self.db.query(UploadSession.status).filter(UploadSession.id == upload.id).scalar()
+        if status != "open":
+            writer.close()
+            raise ValueError(f"Upload {upload.id} is {status}")
+        return writer
+
+    def complete_part(self, upload: UploadSession, writer: PartWriter) -> UploadPart:
+        """Record a fully written part and advance the running hash.
+
+        The writer's lock is released last, so completion sees either no
+        trace of the part or all of it.
+        """
+        try:
+            if writer.written != writer.size:
+                raise ValueError(f"Part {writer.part_number} must be {writer.size} bytes, got {writer.written}")
+            part_md5 = writer.md5.hexdigest()
+
+            part = self.db.get(UploadPart, (upload.id, writer.part_number))
+            if part is None:
+                part = UploadPart(upload_id=upload.id, part_number=writer.part_number)
+                self.db.add(part)
+            part.size = writer.written
+            part.md5 = part_md5
+            upload.expires_at = datetime.utcnow() + self._ttl()
+            self.db.commit()
+
+            self._advance_hash(upload, writer.part_number, part_md5)
+        finally:
+            writer.close()
+        return part
+
+    def _advance_hash(self, upload: UploadSession, part_number: int, part_md5: str):
+        state = _running_hash(upload.id)
+        with state.lock:
+            if part_number in state.hashed:
+                # A retried part that is already in the hash must not have changed
+                state.broken = state.broken or state.hashed[part_number] != part_md5
+                return
+            state.completed[part_number] = part_md5
+            if state.broken:
+                return
+            with open(self.file_path(upload), "rb") as f:
+                while state.next_part in state.completed:
+                    number = state.next_part
+                    offset = (number - 1) * upload.part_size
+                    remaining = min(upload.part_size, upload.total_size - offset)
+                    f.seek(offset)
+                    while remaining:
+                        chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        state.md5.update(chunk)
+                        remaining -= len(chunk)
+                    state.hashed[number] = state.completed.pop(number)
+                    state.next_part += 1
+
+    @contextmanager
+    def _no_parts_in_flight(self, upload: UploadSession):
+        """Hold off new parts while claiming the session; fail if any are being written"""
+        fd = os.open(self.file_path(upload), os.O_RDONLY)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise IncompleteUploadError(f"Parts of upload {upload.id} are still being written")
+            yield
+        finally:
+            os.close(fd)
+
+    def _file_hash(self, upload: UploadSession) -> str:
+        with _running_hashes_lock:
+            state = _running_hashes.get(upload.id)
+        if state is not None:
+            with state.lock:
+                recorded = {part.part_number: part.md5 for part in upload.parts}
+                if not state.broken and state.hashed == recorded and len(recorded) == upload.part_count:
+                    return state.md5.hexdigest()
+        # Parts were received by another process (or before a restart)
+        return self._hash_file(self.file_path(upload))
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def complete(self, upload_id: str) -> Document:
+        """Hand the assembled file to DocumentService and close the session"""
+        from app.services.document_service import DocumentService
+
+        upload = self.get(upload_id)
+        if upload.status == "completed":
+            return self.db.get(Document, upload.document_id)
+
+        with self._no_parts_in_flight(upload):
+            missing = sorted(set(range(1, upload.part_count + 1)) - set(self.received_parts(upload)))
+            if missing:
+                shown = ", ".join(map(str, missing[:20])) + (" ..." if len(missing) > 20 else "")
+                raise IncompleteUploadError(f"Missing parts: {shown}")
+
+            # Only one request gets to process the file
+            claimed = self.db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == upload.id, UploadSession.status == "open")
+                .values(status="completing")
+            ).rowcount
+            self.db.commit()
+        if not claimed:
+            raise ValueError(f"Upload {upload.id} is already being completed")
+
+        try:
+            file_hash = self._file_hash(upload)
+            if upload.expected_md5 and file_hash != upload.expected_md5:
+                raise ValueError(f"MD5 mismatch: expected {upload.expected_md5}, got {file_hash}")
+            document = DocumentService(self.db).process_document(
+                self.file_path(upload), upload.filename, file_hash=file_hash
+            )
+        except Exception:
+            self.db.rollback()
+            upload.status = "open"
+            self.db.commit()
+            raise
+
+        upload.status = "completed"
+        upload.document_id = document.id
+        self.db.commit()
+        shutil.rmtree(self._directory(upload.id), ignore_errors=True)
+        _drop_running_hash(upload.id)
+        return document
+
+    def abort(self, upload_id: str):
+        upload = self.get(upload_id)
+        self._delete(upload)
+        self.db.commit()
+
+    def _delete(self, upload: UploadSession):
+        shutil.rmtree(self._directory(upload.id), ignore_errors=True)
+        _drop_running_hash(upload.id)
+        self.db.delete(upload)
+
+    def expire_stale(self) -> int:
+        """Delete sessions (and their files) with no activity within the TTL"""
+        stale = self.db.query(UploadSession).filter(UploadSession.expires_at < datetime.utcnow()).all()
+        for upload in stale:
+            self._delete(upload)
+        if stale:
+            self.db.commit()
+            print(f"🧹 Expired {len(stale)} stale upload session(s)")
+        return len(stale)
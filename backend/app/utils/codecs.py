@@ -0,0 +1,350 @@
+import glob
+import lzma
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import (
+    CODEC_CPU_BUDGET_SECONDS,
+    CODEC_SAMPLE_BYTES,
+    TEXT_ZSTD_LEVEL,
+    ZSTD_DICT_DIR,
+    ZSTD_DICT_MAX_FILE_SIZE,
+    ZSTD_DICT_MIN_SAMPLES,
+    ZSTD_DICT_SIZE,
+)
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Blobs written by the codec layer start with this header followed by the
+# codec tag and a newline, so they can be decompressed without a DB lookup.
+BLOB_MAGIC = b"DSLMCODEC1:"
+CHUNK_SIZE = 1024 * 1024
+
+
+class Codec:
+    """Streaming compression codec"""
+
+    name = "none"
+
+    def compressobj(self):
+        raise NotImplementedError
+
+    def decompressobj(self):
+        raise NotImplementedError
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+
+    def __init__(self, level: int = 9):
+        self.level = level
+
+    def compressobj(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def decompressobj(self):
+        return zlib.decompressobj(31)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+
+    def __init__(self, preset: int = 6):
+        self.preset = preset
+
+    def compressobj(self):
+        return lzma.LZMACompressor(preset=self.preset)
+
+    def decompressobj(self):
+        return lzma.LZMADecompressor()
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+
+    def __init__(self, level: int = 19, dictionary=None):
+        self.level = level
+        self.dictionary = dictionary
+        if dictionary is not None:
+            self.name = f"zstd-dict:{dictionary.dict_id()}"
+
+    def compressobj(self):
+        return zstandard.ZstdCompressor(level=self.level, dict_data=self.dictionary).compressobj()
+
+    def decompressobj(self):
+        return zstandard.ZstdDecompressor(dict_data=self.dictionary).decompressobj()
+
+
+class _BrotliCompressObj:
+    """Adapt brotli.Compressor to the zlib compressobj interface"""
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _BrotliDecompressObj:
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.process(data)
+
+
+class BrotliCodec(Codec):
+    name = "brotli"
+
+    def __init__(self, quality: int = 11):
+        self.quality = quality
+
+    def compressobj(self):
+        return _BrotliCompressObj(self.quality)
+
+    def decompressobj(self):
+        return _BrotliDecompressObj()
+
+
+class ZstdDictionaryStore:
+    """Train and persist one zstd dictionary per file type.
+
+    Small files compress poorly on their own because every frame starts with
+    an empty history. Samples of small files are collected as they are
+    ingested; once enough have been seen a dictionary is trained and saved as
+    `{file_type}-{dict_id}.zdict`, and later small files of that type are
+    compressed against it. One dictionary is trained per type: after that
+    no more samples are kept, so disk and memory use do not grow with
+    ingest volume. Every saved dictionary stays readable.
+    """
+
+    def __init__(self, directory: str = ZSTD_DICT_DIR, read_only: bool = False):
+        self.directory = directory
+        self.read_only = read_only  # use existing dictionaries but never train new ones
+        self._samples: Dict[str, List[bytes]] = {}
+        self._by_id = {}
+        self._trained_types = set()
+        self._lock = threading.Lock()
+
+    def _has_dictionary(self, file_type: str) -> bool:
+        if file_type not in self._trained_types:
+            if not glob.glob(os.path.join(self.directory, f"{file_type}-*.zdict")):
+                return False
+            self._trained_types.add(file_type)
+        return True
+
+    def add_sample(self, file_type: str, data: bytes):
+        """Remember a small file and train a dictionary once enough are collected,
+        unless the type already has one"""
+        if self.read_only or zstandard is None or len(data) > ZSTD_DICT_MAX_FILE_SIZE:
+            return
+        with self._lock:
+            if self._has_dictionary(file_type):
+                self._samples.pop(file_type, None)
+                return
+            samples = self._samples.setdefault(file_type, [])
+            samples.append(data)
+            if len(samples) < ZSTD_DICT_MIN_SAMPLES:
+                return
+            del self._samples[file_type]
+            # Claimed before training so concurrent ingests don't train a second one
+            self._trained_types.add(file_type)
+        if self.train(file_type, samples) is None:
+            with self._lock:
+                self._trained_types.discard(file_type)
+
+    def train(self, file_type: str, samples: List[bytes]):
+        """Train a dictionary for `file_type` from sample contents"""
+        try:
+            dictionary = zstandard.train_dictionary(ZSTD_DICT_SIZE, samples)
+        except zstandard.ZstdError as e:
+            print(f"zstd dictionary training failed for {file_type}: {e}")
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{file_type}-{dictionary.dict_id()}.zdict")
+        with open(path, "wb") as f:
+            f.write(dictionary.as_bytes())
+        with self._lock:
+            self._by_id[dictionary.dict_id()] = dictionary
+            self._trained_types.add(file_type)
+        return dictionary
+
+    def latest(self, file_type: str):
+        """Most recently trained dictionary for `file_type`, if any"""
+        if zstandard is None:
+            return None
+        paths = glob.glob(os.path.join(self.directory, f"{file_type}-*.zdict"))
+        if not paths:
+            return None
+        newest = max(paths, key=os.path.getmtime)
+        return self.get(int(newest.rsplit("-", 1)[1].split(".")[0]))
+
+    def get(self, dict_id: int):
+        """Load a dictionary by id"""
+        with self._lock:
+            if dict_id in self._by_id:
+                return self._by_id[dict_id]
+        paths = glob.glob(os.path.join(self.directory, f"*-{dict_id}.zdict"))
+        if not paths:
+            raise FileNotFoundError(f"zstd dictionary {dict_id} not found in {self.directory}")
+        with open(paths[0], "rb") as f:
+            dictionary = zstandard.ZstdCompressionDict(f.read())
+        with self._lock:
+            self._by_id[dict_id] = dictionary
+        return dictionary
+
+
+dictionary_store = ZstdDictionaryStore()
+
+# Candidate codecs per file type, cheapest first so a tight budget still
+# leaves a usable result. "zstd-dict" is only tried for small files once a
+# dictionary has been trained for the type.
+TEXT_CODECS = ["zstd-dict", "zstd", "gzip", "brotli", "lzma"]
+CODEC_CANDIDATES = {
+    'txt': TEXT_CODECS,
+    'csv': TEXT_CODECS,
+    'docx': ["zstd", "gzip"],
+    'xlsx': ["zstd", "gzip"],
+    'pptx': ["zstd", "gzip"],
+}
+DEFAULT_CODECS = ["zstd", "gzip", "lzma"]
+
+
+def get_codec(name: str) -> Optional[Codec]:
+    """Build a codec from its tag, or None if its library is unavailable"""
+    if name == "gzip":
+        return GzipCodec()
+    if name == "lzma":
+        return LzmaCodec()
+    if name == "zstd":
+        return ZstdCodec() if zstandard is not None else None
+    if name.startswith("zstd-dict:"):
+        if zstandard is None:
+            return None
+        return ZstdCodec(dictionary=dictionary_store.get(int(name.split(":", 1)[1])))
+    if name == "brotli":
+        return BrotliCodec() if brotli is not None else None
+    return None
+
+
+def _candidate_codecs(file_type: str, file_size: int) -> List[Codec]:
+    codecs = []
+    for name in CODEC_CANDIDATES.get(file_type, DEFAULT_CODECS):
+        if name == "zstd-dict":
+            if zstandard is None or file_size > ZSTD_DICT_MAX_FILE_SIZE:
+                continue
+            dictionary = dictionary_store.latest(file_type)
+            if dictionary is not None:
+                codecs.append(ZstdCodec(dictionary=dictionary))
+            continue
+        codec = get_codec(name)
+        if codec is not None:
+            codecs.append(codec)
+    return codecs
+
+
+def _compress_bytes(codec: Codec, data: bytes) -> bytes:
+    compressor = codec.compressobj()
+    return compressor.compress(data) + compressor.flush()
+
+
+def choose_codec(data: bytes, file_type: str, file_size: int,
+                 cpu_budget: float = CODEC_CPU_BUDGET_SECONDS) -> Optional[Codec]:
+    """Pick the codec giving the smallest output for a sample of the file.
+
+    `data` is the whole file or a leading sample of it. A candidate is skipped
+    when compressing the full file at its sampled speed would exceed what is
+    left of the CPU-time budget. Returns None if nothing beats the original.
+    """
+    spent = 0.0
+    scale = file_size / len(data) if data else 1.0
+    best_codec, best_size = None, len(data)
+
+    for codec in _candidate_codecs(file_type, file_size):
+        if spent >= cpu_budget:
+            break
+        start = time.process_time()
+        compressed_size = len(_compress_bytes(codec, data))
+        elapsed = time.process_time() - start
+        spent += elapsed
+
+        if spent + elapsed * (scale - 1) > cpu_budget:
+            continue
+        if compressed_size < best_size:
+            best_codec, best_size = codec, compressed_size
+
+    return best_codec
+
+
+def compress_file(input_path: str, output_path: str, codec: Codec) -> int:
+    """Stream `input_path` through `codec` into a self-describing blob"""
+    compressor = codec.compressobj()
+    with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+        dst.write(BLOB_MAGIC + codec.name.encode() + b"\n")
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            dst.write(compressor.compress(chunk))
+        dst.write(compressor.flush())
+    return os.path.getsize(output_path)
+
+
+def read_sample(path: str, size: int = CODEC_SAMPLE_BYTES) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+def iter_stored_file(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the original content of a stored file, decompressing if needed"""
+    with open(path, "rb") as f:
+        head = f.read(len(BLOB_MAGIC))
+        if head != BLOB_MAGIC:
+            yield head
+            yield from iter(lambda: f.read(chunk_size), b"")
+            return
+
+        tag = f.readline().rstrip(b"\n").decode()
+        codec = get_codec(tag)
+        if codec is None:
+            raise ValueError(f"Codec '{tag}' is not available to read {path}")
+        decompressor = codec.decompressobj()
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield decompressor.decompress(chunk)
+
+
+def read_stored_file(path: str) -> bytes:
+    """Read the original content of a stored file"""
+    return b"".join(iter_stored_file(path))
+
+
+def compress_text(text: str, level: int = TEXT_ZSTD_LEVEL) -> Tuple[str, bytes]:
+    """Compress extracted text for the document_texts table: (codec tag, payload)"""
+    data = text.encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=level).compress(data)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip framing, like GzipCodec
+    return "gzip", compressor.compress(data) + compressor.flush()
+
+
+def decompress_text(codec: str, payload: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstandard is required to read zstd-compressed text")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    if codec == "gzip":
+        # Older rows hold zlib framing under this tag; 32 + 15 accepts both
+        return zlib.decompress(payload, 47).decode("utf-8")
+    return payload.decode("utf-8")
@@ -49,14 +49,34 @@ class FileUtils:
                 return self._extract_text_from_docx(file_path)
             elif file_type == 'txt':
                 return self._extract_text_from_txt(file_path)
+            elif file_type in ('jpg', 'png', 'tiff') and self._ocr_engine():
+                return self._ocr_engine().image_text(file_path)
             else:
                 return f"Content from {file_type} file"
         except Exception as e:
             print(f"Error extracting text: {e}")
             return ""
     
+    def _ocr_engine(self):
+        """OCR engine, or None when OCR is disabled or tesseract is missing"""
+        from app.config import OCR_ENABLED
+        from app.utils.ocr import get_ocr_engine
+        
+        return get_ocr_engine() if OCR_ENABLED else None
+    
     def _extract_text_from_pdf(self, file_path: str) -> str:
-        """Simple PDF text extraction placeholder"""
+        """Extract the PDF text layer, OCRing scanned pages that have none"""
+        try:
+            import fitz
+        except ImportError:
+            fitz = None
+        if fitz is not None:
+            engine = self._ocr_engine()
+            if engine:
+                return engine.pdf_text(file_path)
+            from app.utils.ocr import OcrEngine
+            return OcrEngine().pdf_text(file_path, ocr=False)
+        
         try:
             with open(file_path, 'rb') as f:
                 content = f.read(1000)
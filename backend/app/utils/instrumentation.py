@@ -0,0 +1,98 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+
+# Stages of the ingest pipeline, in the order they run. "receive" times
+# streaming a chunked-upload part off the network; "spool_copy" times copying
+# a /upload/ body that Starlette has already spooled, not the network receive.
+INGEST_STAGES = [
+    "receive", "spool_copy", "hash", "dedup_lookup", "perceptual_hash", "extract", "optimize", "embed", "db_commit",
+]
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+REGISTRY = CollectorRegistry()
+
+INGEST_STAGE_SECONDS = Histogram(
+    "docslim_ingest_stage_seconds",
+    "Time spent in each ingest pipeline stage",
+    ["stage", "file_type"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+QUERY_SECONDS = Histogram(
+    "docslim_query_seconds",
+    "Time spent answering search and metrics queries",
+    ["query"],
+    buckets=LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+INGEST_BYTES_IN = Counter(
+    "docslim_ingest_bytes_in",
+    "Bytes received for ingest",
+    ["file_type"],
+    registry=REGISTRY,
+)
+INGEST_BYTES_OUT = Counter(
+    "docslim_ingest_bytes_out",
+    "Bytes written to storage after optimization",
+    ["file_type"],
+    registry=REGISTRY,
+)
+OCR_PAGES = Counter(
+    "docslim_ocr_pages",
+    "Pages without a text layer, by outcome: ocr, cached or skipped (over budget)",
+    ["result"],
+    registry=REGISTRY,
+)
+
+
+@contextmanager
+def stage_timer(stage: str, file_type: str = "unknown"):
+    """Record the duration of an ingest stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        INGEST_STAGE_SECONDS.labels(stage, file_type or "unknown").observe(time.perf_counter() - start)
+
+
+@contextmanager
+def query_timer(query: str):
+    """Record the duration of a search or metrics query"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        QUERY_SECONDS.labels(query).observe(time.perf_counter() - start)
+
+
+def record_bytes(file_type: str, bytes_in: int, bytes_out: int):
+    INGEST_BYTES_IN.labels(file_type or "unknown").inc(bytes_in)
+    INGEST_BYTES_OUT.labels(file_type or "unknown").inc(bytes_out)
+
+
+def render_metrics():
+    """Prometheus text exposition of all metrics, plus its content type.
+
+    With PROMETHEUS_MULTIPROC_DIR set (multiple uvicorn workers), samples
+    from every worker are aggregated instead of just this process.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
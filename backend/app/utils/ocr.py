@@ -0,0 +1,211 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from app.config import (
+    OCR_CACHE_DIR,
+    OCR_DPI,
+    OCR_LANG,
+    OCR_MAX_PAGES,
+    OCR_MIN_TEXT_CHARS,
+    OCR_TIME_BUDGET_SECONDS,
+    OCR_WORKERS,
+)
+from app.utils.instrumentation import OCR_PAGES
+
+# Scans are usually stored at their scan resolution; anything above the OCR
+# DPI is downsampled before recognition
+DEFAULT_IMAGE_DPI = 300
+
+
+@lru_cache(maxsize=1)
+def ocr_available() -> bool:
+    """Whether pytesseract and the tesseract binary are both installed"""
+    try:
+        import pytesseract
+    except ImportError:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+def render_page(path: str, kind: str, page_index: int, dpi: int):
+    """Grayscale PIL image of one PDF page or image frame at `dpi`"""
+    from PIL import Image
+
+    if kind == "pdf":
+        import fitz
+
+        with fitz.open(path) as pdf:
+            pixmap = pdf[page_index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            return Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+    with Image.open(path) as image:
+        image.seek(page_index)
+        source_dpi = image.info.get("dpi", (DEFAULT_IMAGE_DPI,))[0] or DEFAULT_IMAGE_DPI
+        page = image.convert("L")
+    if source_dpi > dpi:
+        scale = dpi / source_dpi
+        page = page.resize((max(1, round(page.width * scale)), max(1, round(page.height * scale))), Image.LANCZOS)
+    return page
+
+
+def run_tesseract(image, lang: str) -> str:
+    import pytesseract
+
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], key + ".txt")
+
+
+def ocr_page(path: str, kind: str, page_index: int, dpi: int, lang: str,
+             cache_dir: str) -> Tuple[int, str, bool]:
+    """Render and OCR one page in a worker process: (page_index, text, cache_hit).
+
+    Results are cached on disk by a hash of the rendered pixels, so a page
+    that appears in many documents (cover sheets, repeated scans) is only
+    recognized once, by whichever worker gets to it first.
+    """
+    image = render_page(path, kind, page_index, dpi)
+    digest = hashlib.sha256(f"{lang}:{image.width}x{image.height}:".encode())
+    digest.update(image.tobytes())
+    cache_path = _cache_path(cache_dir, digest.hexdigest())
+
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            return page_index, f.read(), True
+
+    text = run_tesseract(image, lang)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, cache_path)
+    return page_index, text, False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_ocr_executor(workers: int = OCR_WORKERS) -> ProcessPoolExecutor:
+    """Process pool shared by all OCR in this process, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+class OcrEngine:
+    """OCR the pages of a document that have no text layer.
+
+    Pages are rendered and recognized in a process pool. A document gets at
+    most `max_pages` OCRed pages and `time_budget` seconds; pages beyond
+    either budget are left without text rather than holding up the worker.
+    With `workers=0` pages are processed inline, which is useful in tests.
+    """
+
+    def __init__(
+        self,
+        dpi: int = OCR_DPI,
+        lang: str = OCR_LANG,
+        workers: int = OCR_WORKERS,
+        max_pages: int = OCR_MAX_PAGES,
+        time_budget: float = OCR_TIME_BUDGET_SECONDS,
+        cache_dir: str = OCR_CACHE_DIR,
+    ):
+        self.dpi = dpi
+        self.lang = lang
+        self.workers = workers
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.cache_dir = cache_dir
+
+    def pdf_text(self, path: str, ocr: bool = True) -> str:
+        """Text of a PDF: its text layer, plus OCR for pages without one"""
+        import fitz
+
+        texts: List[str] = []
+        scanned: List[int] = []
+        with fitz.open(path) as pdf:
+            for page in pdf:
+                text = page.get_text()
+                texts.append(text)
+                if len(text.strip()) < OCR_MIN_TEXT_CHARS and page.get_images():
+                    scanned.append(page.number)
+
+        if ocr and scanned:
+            for page_index, text in self._ocr_pages(path, "pdf", scanned).items():
+                texts[page_index] = text
+        return "\n".join(text.strip() for text in texts if text.strip())
+
+    def image_text(self, path: str) -> str:
+        """OCR text of an image, one page per frame of a multi-page TIFF"""
+        from PIL import Image
+
+        with Image.open(path) as image:
+            frames = getattr(image, "n_frames", 1)
+        results = self._ocr_pages(path, "image", list(range(frames)))
+        return "\n".join(results[index].strip() for index in sorted(results) if results[index].strip())
+
+    def _ocr_pages(self, path: str, kind: str, pages: List[int]) -> Dict[int, str]:
+        if len(pages) > self.max_pages:
+            OCR_PAGES.labels("skipped").inc(len(pages) - self.max_pages)
+            print(f"⚠️ OCR budget: {len(pages) - self.max_pages} of {len(pages)} pages skipped in {path}")
+            pages = pages[:self.max_pages]
+
+        args = (self.dpi, self.lang, self.cache_dir)
+        deadline = time.monotonic() + self.time_budget
+        results: Dict[int, str] = {}
+
+        if self.workers == 0:
+            for done, page_index in enumerate(pages):
+                if time.monotonic() > deadline:
+                    self._over_time(path, len(pages) - done)
+                    break
+                try:
+                    self._collect(results, ocr_page(path, kind, page_index, *args))
+                except Exception as e:
+                    print(f"OCR failed for a page of {path}: {e}")
+            return results
+
+        executor = get_ocr_executor(self.workers)
+        pending = {executor.submit(ocr_page, path, kind, page_index, *args) for page_index in pages}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Queued pages are dropped; pages already running finish into the cache
+                for future in pending:
+                    future.cancel()
+                self._over_time(path, len(pending))
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    self._collect(results, future.result())
+                except Exception as e:
+                    print(f"OCR failed for a page of {path}: {e}")
+        return results
+
+    @staticmethod
+    def _collect(results: Dict[int, str], result: Tuple[int, str, bool]):
+        page_index, text, cache_hit = result
+        results[page_index] = text
+        OCR_PAGES.labels("cached" if cache_hit else "ocr").inc()
+
+    @staticmethod
+    def _over_time(path: str, skipped: int):
+        OCR_PAGES.labels("skipped").inc(skipped)
+        print(f"⚠️ OCR budget: time ran out with {skipped} pages left in {path}")
+
+
+def get_ocr_engine() -> Optional[OcrEngine]:
+    """The configured OCR engine, or None when tesseract is not installed"""
+    return OcrEngine() if ocr_available() else None
@@ -0,0 +1,285 @@
+"""Repack Office Open XML containers (docx, xlsx, pptx) smaller.
+
+An OOXML file is a zip of XML parts and media. Office writes the XML at a
+low deflate level and embeds pictures at whatever size they were inserted,
+so most of the savings come from recompressing the XML at maximum deflate
+and from re-encoding or downscaling pictures under */media/. Pictures keep
+their format and part name, so relationships and content types stay valid,
+and they are laid out by the size recorded in the XML, not their pixels.
+"""
+import io
+import os
+import posixpath
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Set
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from app.config import (
+    OOXML_JPEG_QUALITY,
+    OOXML_MAX_IMAGE_DIMENSION,
+    OOXML_STRIP_THUMBNAILS,
+    OOXML_STRIP_UNUSED_PARTS,
+    OOXML_WORKERS,
+)
+
+CONTENT_TYPES = "[Content_Types].xml"
+ROOT_RELS = "_rels/.rels"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+THUMBNAIL_REL_TYPE = "http://schemas.openxmlformats.org/package/2006/relationships/metadata/thumbnail"
+
+# A lossy re-encode that saves less than this is not worth the generation loss
+MIN_LOSSY_SAVING = 0.10
+
+
+def is_ooxml(path: str) -> bool:
+    """True for a zip package with a content types part (not legacy .doc/.xls/.ppt)"""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as package:
+        return CONTENT_TYPES in package.NameToInfo
+
+
+def _key(name: str) -> str:
+    """Part names compare case-insensitively, and targets may be percent-encoded"""
+    return unquote(name).lower()
+
+
+def _rels_path(part: str) -> str:
+    """Relationships part of `part` ('' is the package itself)"""
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def _source_part(rels: str) -> str:
+    directory, name = posixpath.split(rels)
+    return posixpath.join(posixpath.dirname(directory), name[:-len(".rels")])
+
+
+def _relationships(data: bytes, source: str):
+    """(id, type, resolved target part) of each internal relationship"""
+    base = posixpath.dirname(source)
+    for rel in ElementTree.fromstring(data).iter(f"{{{RELS_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "").split("#")[0]
+        if not target:
+            continue
+        if target.startswith("/"):
+            target = target.lstrip("/")
+        else:
+            target = posixpath.normpath(posixpath.join(base, target))
+        yield rel.get("Id"), rel.get("Type"), target
+
+
+def category(name: str, thumbnails: Set[str] = frozenset()) -> str:
+    """Report category of a part"""
+    lower = _key(name)
+    if lower in thumbnails:
+        return "thumbnail"
+    if "/media/" in f"/{lower}":
+        return "media"
+    if "/embeddings/" in f"/{lower}":
+        return "embedded"
+    if "/fonts/" in f"/{lower}":
+        return "fonts"
+    if lower.endswith((".xml", ".rels", ".vml")):
+        return "xml"
+    return "other"
+
+
+def recompress_image(data: bytes, max_dimension: int = OOXML_MAX_IMAGE_DIMENSION,
+                     jpeg_quality: int = OOXML_JPEG_QUALITY) -> bytes:
+    """Smaller JPEG or PNG of the same format, or `data` unchanged"""
+    from PIL import Image
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        image_format = img.format
+        if image_format not in ("JPEG", "PNG") or getattr(img, "n_frames", 1) > 1:
+            return data
+        img.load()
+        info = img.info
+
+        downscaled = max(img.size) > max_dimension
+        if downscaled:
+            if img.mode == "P":
+                img = img.convert("RGBA")
+            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        output = io.BytesIO()
+        extra = {key: info[key] for key in ("icc_profile", "exif", "dpi") if key in info}
+        if image_format == "JPEG":
+            if img.mode not in ("RGB", "L", "CMYK"):
+                img = img.convert("RGB")
+            img.save(output, "JPEG", quality=jpeg_quality, optimize=True, **extra)
+            limit = len(data) if downscaled else len(data) * (1 - MIN_LOSSY_SAVING)
+        else:
+            img.save(output, "PNG", optimize=True, **extra)
+            limit = len(data)
+    except Exception as e:
+        print(f"Image recompression failed, keeping original: {e}")
+        return data
+
+    return output.getvalue() if output.tell() < limit else data
+
+
+class OOXMLRepacker:
+    """Rewrite an OOXML package at maximum deflate, recompressing media.
+
+    Members are read and transformed in a thread pool (Pillow and zlib
+    release the GIL) and written back in their original order, with at most
+    a few members per worker held in memory. `report` maps each part
+    category to its part count and compressed bytes before and after.
+    """
+
+    def __init__(
+        self,
+        strip_thumbnails: bool = OOXML_STRIP_THUMBNAILS,
+        strip_unused_parts: bool = OOXML_STRIP_UNUSED_PARTS,
+        max_image_dimension: int = OOXML_MAX_IMAGE_DIMENSION,
+        jpeg_quality: int = OOXML_JPEG_QUALITY,
+        workers: int = OOXML_WORKERS,
+    ):
+        self.strip_thumbnails = strip_thumbnails
+        self.strip_unused_parts = strip_unused_parts
+        self.max_image_dimension = max_image_dimension
+        self.jpeg_quality = jpeg_quality
+        self.workers = max(1, workers)
+        self.report: Dict[str, Dict[str, int]] = {}
+
+    def _plan(self, package: zipfile.ZipFile):
+        """Parts to drop, thumbnail parts, and rewritten XML for the parts that
+        referenced dropped ones"""
+        names = {_key(name): name for name in package.namelist()}
+        thumbnails: Set[str] = set()
+        drop: Set[str] = set()
+        rewritten: Dict[str, bytes] = {}
+        if ROOT_RELS not in names:
+            return drop, thumbnails, rewritten
+
+        try:
+            root_rels = package.read(names[ROOT_RELS])
+            thumbnail_ids = set()
+            for rel_id, rel_type, target in _relationships(root_rels, ""):
+                if rel_type == THUMBNAIL_REL_TYPE:
+                    thumbnails.add(_key(target))
+                    thumbnail_ids.add(rel_id)
+            if self.strip_thumbnails and thumbnails:
+                drop |= thumbnails & names.keys()
+                rewritten[names[ROOT_RELS]] = self._without_relationships(root_rels, thumbnail_ids)
+
+            if self.strip_unused_parts:
+                # Every part must be reachable through relationships from the package
+                reachable, pending = set(), [""]
+                while pending:
+                    rels = _rels_path(pending.pop())
+                    if rels not in names:
+                        continue
+                    data = rewritten.get(names[rels]) or package.read(names[rels])
+                    for _, _, target in _relationships(data, _source_part(rels)):
+                        target = _key(target)
+                        if target not in reachable:
+                            reachable.add(target)
+                            pending.append(target)
+                for key in names:
+                    if key == _key(CONTENT_TYPES) or key.endswith("/"):
+                        continue
+                    part = _source_part(key) if key.endswith(".rels") else key
+                    if key.endswith(".rels") and (part == "" or part in reachable):
+                        continue
+                    if part not in reachable:
+                        drop.add(key)
+        except ElementTree.ParseError as e:
+            print(f"OOXML relationships unreadable, keeping all parts: {e}")
+            return set(), thumbnails, {}
+
+        if drop:
+            rewritten[names[_key(CONTENT_TYPES)]] = self._without_overrides(
+                package.read(names[_key(CONTENT_TYPES)]), drop
+            )
+        return drop, thumbnails, rewritten
+
+    @staticmethod
+    def _without_relationships(data: bytes, rel_ids: Set[str]) -> bytes:
+        ElementTree.register_namespace("", RELS_NS)
+        root = ElementTree.fromstring(data)
+        for rel in list(root):
+            if rel.get("Id") in rel_ids:
+                root.remove(rel)
+        return ElementTree.tostring(root, encoding="UTF-8", xml_declaration=True)
+
+    @staticmethod
+    def _without_overrides(data: bytes, parts: Set[str]) -> bytes:
+        ElementTree.register_namespace("", CONTENT_TYPES_NS)
+        root = ElementTree.fromstring(data)
+        for override in root.findall(f"{{{CONTENT_TYPES_NS}}}Override"):
+            if _key(override.get("PartName", "").lstrip("/")) in parts:
+                root.remove(override)
+        return ElementTree.tostring(root, encoding="UTF-8", xml_declaration=True)
+
+    def _transform(self, package: zipfile.ZipFile, info: zipfile.ZipInfo,
+                   rewritten: Optional[bytes], part_category: str) -> bytes:
+        data = rewritten if rewritten is not None else package.read(info)
+        # Thumbnails are kept byte for byte: they are small and only stripped on request
+        if part_category == "media" and info.filename.lower().endswith((".jpg", ".jpeg", ".png")):
+            data = recompress_image(data, self.max_image_dimension, self.jpeg_quality)
+        return data
+
+    def _count(self, part_category: str, original: int, optimized: int):
+        entry = self.report.setdefault(part_category, {"parts": 0, "original_bytes": 0, "optimized_bytes": 0})
+        entry["parts"] += 1
+        entry["original_bytes"] += original
+        entry["optimized_bytes"] += optimized
+
+    def repack(self, input_path: str, output_path: str) -> int:
+        """Write the repacked package and return its size"""
+        self.report = {}
+        with zipfile.ZipFile(input_path) as package:
+            drop, thumbnails, rewritten = self._plan(package)
+            # [Content_Types].xml first, as Office writes it
+            members = sorted(package.infolist(), key=lambda info: info.filename != CONTENT_TYPES)
+
+            with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as output, \
+                    ThreadPoolExecutor(max_workers=self.workers) as pool:
+                def write(info, part_category, future):
+                    output.writestr(self._output_info(info), future.result(), compresslevel=9)
+                    self._count(part_category, info.compress_size, output.getinfo(info.filename).compress_size)
+
+                pending = deque()
+                for info in members:
+                    part_category = category(info.filename, thumbnails)
+                    if _key(info.filename) in drop:
+                        self._count(part_category, info.compress_size, 0)
+                        continue
+                    if info.is_dir():
+                        continue
+                    future = pool.submit(self._transform, package, info,
+                                         rewritten.get(info.filename), part_category)
+                    pending.append((info, part_category, future))
+                    if len(pending) >= self.workers * 2:
+                        write(*pending.popleft())
+                while pending:
+                    write(*pending.popleft())
+
+        return os.path.getsize(output_path)
+
+    @staticmethod
+    def _output_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+        output_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        output_info.compress_type = zipfile.ZIP_DEFLATED
+        output_info.external_attr = info.external_attr
+        return output_info
+
+
+def format_report(report: Dict[str, Dict[str, int]]) -> str:
+    lines = []
+    for part_category, entry in sorted(report.items()):
+        saved = entry["original_bytes"] - entry["optimized_bytes"]
+        percent = saved / entry["original_bytes"] * 100 if entry["original_bytes"] else 0.0
+        lines.append(f"   {part_category}: {entry['parts']} parts, "
+                     f"{entry['original_bytes']/1024:.1f}KB → {entry['optimized_bytes']/1024:.1f}KB ({percent:.1f}%)")
+    return "\n".join(lines)
@@ -1,12 +1,17 @@
 import os
 from abc import ABC, abstractmethod
-import fitz  # PyMuPDF
-from PIL import Image
 import shutil
 
+# fitz (PyMuPDF) and PIL are imported inside the optimizers that use them so
+# that importing this module stays cheap.
+
 class BaseOptimizer(ABC):
     """Base class for all document optimizers"""
     
+    # Recorded as Document.reduction_strategy; optimizers that pick their
+    # method per file update it in optimize()
+    strategy = None
+    
     @abstractmethod
     def optimize(self, input_path: str, output_path: str) -> int:
         """Optimize document and return new size in bytes"""
@@ -36,6 +41,8 @@ class PDFOptimizer(BaseOptimizer):
     def _compress_pdf_images(self, input_path: str, output_path: str):
         """Compress images within PDF"""
         try:
+            import fitz  # PyMuPDF
+            
             doc = fitz.open(input_path)
             
             for page_num in range(len(doc)):
@@ -57,6 +64,8 @@ class ImageOptimizer(BaseOptimizer):
     def optimize(self, input_path: str, output_path: str) -> int:
         """Optimize image by reducing quality and dimensions"""
         try:
+            from PIL import Image
+            
             img = Image.open(input_path)
             
             original_size = os.path.getsize(input_path)
@@ -86,21 +95,64 @@ class ImageOptimizer(BaseOptimizer):
         else:
             return 90
 
-class DocxOptimizer(BaseOptimizer):
-    """Optimize Word documents"""
+class CodecOptimizer(BaseOptimizer):
+    """Compress files with the best general-purpose codec for their type"""
+    
+    def __init__(self, file_type: str = 'other'):
+        self.file_type = file_type
+        self.strategy = 'safe_copy'
     
     def optimize(self, input_path: str, output_path: str) -> int:
-        """Optimize DOCX by removing unused styles and metadata"""
+        """Try candidate codecs on a sample and store the file with the smallest one"""
+        from app.utils import codecs
+        
+        original_size = os.path.getsize(input_path)
+        sample = codecs.read_sample(input_path)
+        codecs.dictionary_store.add_sample(self.file_type, sample)
+        
+        codec = codecs.choose_codec(sample, self.file_type, original_size)
+        if codec is not None:
+            optimized_size = codecs.compress_file(input_path, output_path, codec)
+            if optimized_size < original_size:
+                self.strategy = f"codec:{codec.name}"
+                return optimized_size
+        
         shutil.copy2(input_path, output_path)
+        self.strategy = 'safe_copy'
         return os.path.getsize(output_path)
 
-class DefaultOptimizer(BaseOptimizer):
-    """Default optimizer for unknown file types"""
+class OOXMLOptimizer(CodecOptimizer):
+    """Repack docx/xlsx/pptx containers; legacy binary Office files get a codec"""
+    
+    def __init__(self, file_type: str = 'docx'):
+        super().__init__(file_type)
+        self.report = {}  # bytes before/after per part category, from the last optimize()
     
     def optimize(self, input_path: str, output_path: str) -> int:
-        """Simply copy the file without optimization"""
-        shutil.copy2(input_path, output_path)
-        return os.path.getsize(output_path)
+        from app.utils import ooxml
+        
+        if not ooxml.is_ooxml(input_path):
+            return super().optimize(input_path, output_path)
+        try:
+            repacker = ooxml.OOXMLRepacker()
+            optimized_size = repacker.repack(input_path, output_path)
+            self.report = repacker.report
+        except Exception as e:
+            print(f"OOXML repack failed: {e}")
+            return super().optimize(input_path, output_path)
+        
+        self.strategy = 'ooxml_repack'
+        print(f"📦 {os.path.basename(input_path)} repacked:\n{ooxml.format_report(self.report)}")
+        return optimized_size
+
+class DocxOptimizer(OOXMLOptimizer):
+    """Optimize Word documents"""
+    
+    def __init__(self):
+        super().__init__('docx')
+
+class DefaultOptimizer(CodecOptimizer):
+    """Default optimizer for unknown file types"""
 
 def get_optimizer(file_type: str) -> BaseOptimizer:
     """Factory function to get appropriate optimizer"""
@@ -109,6 +161,8 @@ def get_optimizer(file_type: str) -> BaseOptimizer:
         'jpg': ImageOptimizer(),
         'png': ImageOptimizer(),
         'docx': DocxOptimizer(),
+        'xlsx': OOXMLOptimizer('xlsx'),
+        'pptx': OOXMLOptimizer('pptx'),
     }
     
-    return optimizers.get(file_type, DefaultOptimizer())
\ No newline at end of file
+    return optimizers.get(file_type, DefaultOptimizer(file_type))
\ No newline at end of file
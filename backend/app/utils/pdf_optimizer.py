@@ -1,10 +1,11 @@
-import fitz
 import os
 
 class PDFOptimizer:
     def optimize(self, input_path: str, output_path: str) -> int:
         """Optimize PDF by compressing images and cleaning up"""
         try:
+            import fitz
+            
             doc = fitz.open(input_path)
             
             doc.save(output_path, 
@@ -0,0 +1,130 @@
+from collections import defaultdict
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Hashable, List, Tuple
+
+import numpy as np
+
+HASH_BITS = 64
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so dct(x) = D @ x @ D.T for a square block"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8)).tobytes(), "big")
+
+
+def _grayscale(image, size: Tuple[int, int]) -> np.ndarray:
+    from PIL import Image
+
+    return np.asarray(image.convert("L").resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def phash(image) -> int:
+    """64-bit DCT perceptual hash: low frequencies above or below their median.
+
+    Survives resizing, recompression and small colour changes because only the
+    coarse structure of the image contributes.
+    """
+    dct = _dct_matrix(32)
+    coefficients = (dct @ _grayscale(image, (32, 32)) @ dct.T)[:8, :8].flatten()
+    # The DC term is just mean brightness; leave it out of the median
+    return _bits_to_int(coefficients > np.median(coefficients[1:]))
+
+
+def dhash(image) -> int:
+    """64-bit difference hash: whether each pixel is brighter than its right neighbour"""
+    pixels = _grayscale(image, (9, 8))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def image_hashes(path: str) -> Tuple[int, int]:
+    """(pHash, dHash) of an image file"""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft("L", (64, 64))  # let JPEG decode at reduced size
+        return phash(image), dhash(image)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_signed(value: int) -> int:
+    """Store an unsigned 64-bit hash in a signed BIGINT column"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+class MultiIndexHashTable:
+    """Hamming-distance search over 64-bit hashes by multi-index hashing.
+
+    Each hash is split into `chunks` substrings, each with its own exact-match
+    table. If two hashes differ in at most `radius` bits, by the pigeonhole
+    principle at least one substring differs in at most radius // chunks bits.
+    A query therefore only probes those nearby substring values and verifies
+    the few candidates it finds, instead of comparing against every hash.
+    """
+
+    def __init__(self, radius: int, chunks: int = 3, bits: int = HASH_BITS):
+        self.radius = radius
+        self.chunks = chunks
+        self.chunk_radius = radius // chunks
+        # (shift, mask, bit flips to probe) per substring; widths differ by at most one bit
+        self._layout = []
+        shift = 0
+        for chunk in range(chunks):
+            width = bits // chunks + (1 if chunk < bits % chunks else 0)
+            flips = [
+                sum(1 << bit for bit in flipped)
+                for distance in range(self.chunk_radius + 1)
+                for flipped in combinations(range(width), distance)
+            ]
+            self._layout.append((shift, (1 << width) - 1, flips))
+            shift += width
+        self._tables: List[Dict[int, List[Tuple[Hashable, int]]]] = [defaultdict(list) for _ in range(chunks)]
+        self._hashes: Dict[Hashable, int] = {}
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, key):
+        return key in self._hashes
+
+    def _substrings(self, value: int):
+        for chunk, (shift, mask, _) in enumerate(self._layout):
+            yield chunk, (value >> shift) & mask
+
+    def add(self, key: Hashable, value: int):
+        if key in self._hashes:
+            return
+        self._hashes[key] = value
+        # Buckets hold (key, hash) so candidates verify without another lookup
+        entry = (key, value)
+        for chunk, substring in self._substrings(value):
+            self._tables[chunk][substring].append(entry)
+
+    def query(self, value: int, radius: int = None) -> List[Tuple[Hashable, int]]:
+        """Keys within `radius` bits of `value`, nearest first"""
+        radius = self.radius if radius is None else min(radius, self.radius)
+        matches = {}
+        for table, (shift, mask, flips) in zip(self._tables, self._layout):
+            substring = (value >> shift) & mask
+            for flip in flips:
+                for key, candidate in table.get(substring ^ flip, ()):
+                    distance = (value ^ candidate).bit_count()
+                    if distance <= radius:
+                        matches[key] = distance
+        return sorted(matches.items(), key=lambda match: match[1])
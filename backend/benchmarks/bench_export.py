@@ -0,0 +1,116 @@
+"""Catalog export throughput and memory at scale.
+
+Usage (from backend/):
+    python -m benchmarks.bench_export --documents 1000000
+
+Peak memory is sampled from /proc/self/statm (Linux) while each export
+runs, relative to the resident size just before it started. It should stay
+flat as --documents grows.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base
+from app.services.export_service import ExportService, parquet_available
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+class PeakMemory:
+    """Sample resident memory in a thread and keep the peak"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.baseline = self.peak = _rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss())
+
+    @property
+    def growth_mb(self) -> float:
+        return (self.peak - self.baseline) / 1024 / 1024
+
+
+def build_catalog(path: str, n_documents: int, seed: int = 0):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    start_date = datetime(2024, 1, 1)
+    file_types = ["pdf", "docx", "jpg", "png", "txt", "xlsx"]
+    tiers = ["hot", "warm", "cold", "archive"]
+    insert = text(
+        "INSERT INTO documents (original_filename, file_type, original_size, optimized_size, "
+        "reduction_strategy, reduction_percentage, is_duplicate, tier, storage_path, upload_date, "
+        "access_count, text_hash) VALUES (:name, :type, :size, :optimized, 'codec:zstd', :reduction, "
+        ":duplicate, :tier, :path, :date, 0, :hash)"
+    )
+    with engine.begin() as connection:
+        for batch_start in range(0, n_documents, 10_000):
+            rows = []
+            for i in range(batch_start, min(batch_start + 10_000, n_documents)):
+                size = rng.randint(1_000, 10_000_000)
+                optimized = int(size * rng.uniform(0.3, 1.0))
+                file_type = rng.choice(file_types)
+                rows.append({
+                    "name": f"document-{i}.{file_type}", "type": file_type, "size": size,
+                    "optimized": optimized, "reduction": (size - optimized) / size * 100,
+                    "duplicate": rng.random() < 0.1, "tier": rng.choice(tiers),
+                    "path": f"uploads/optimized/document-{i}.{file_type}",
+                    "date": start_date + timedelta(seconds=i * 30), "hash": f"{rng.getrandbits(128):032x}",
+                })
+            connection.execute(insert, rows)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    formats = ["ndjson"] + (["parquet"] if parquet_available() else [])
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        engine = build_catalog(os.path.join(workdir, "catalog.db"), args.documents)
+        print(f"built catalog of {args.documents:,} documents in {time.perf_counter() - start:.1f}s")
+        Session = sessionmaker(bind=engine)
+
+        for export_format in formats:
+            with Session() as db, open(os.path.join(workdir, f"out.{export_format}"), "wb") as output:
+                exporter = ExportService(db, batch_size=args.batch_size)
+                start = time.perf_counter()
+                with PeakMemory() as memory:
+                    written = sum(output.write(chunk) for chunk in exporter.iter_format(export_format))
+                elapsed = time.perf_counter() - start
+            print(f"{export_format}: {args.documents / elapsed:,.0f} rows/s, "
+                  f"{written / 1024 / 1024:.1f} MB, peak memory +{memory.growth_mb:.1f} MB")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Perceptual-hash index build time and lookup latency.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_hash --images 1000000 --queries 2000
+
+Hashes are uniformly random, which is the best case for the substring
+tables; real pHashes are less uniform, so expect somewhat larger buckets.
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.services.image_dedup_service import ImageHashIndex
+
+
+def _percentile(latencies, fraction):
+    return latencies[max(0, int(len(latencies) * fraction) - 1)]
+
+
+def _flip(value: int, bits: int, rng: random.Random) -> int:
+    return value ^ sum(1 << bit for bit in rng.sample(range(64), bits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    phashes = [rng.getrandbits(64) for _ in range(args.images)]
+    dhashes = [rng.getrandbits(64) for _ in range(args.images)]
+
+    index = ImageHashIndex()
+    start = time.perf_counter()
+    for document_id, (phash, dhash) in enumerate(zip(phashes, dhashes), start=1):
+        index.add(document_id, phash, dhash)
+    print(f"built index of {args.images:,} images in {time.perf_counter() - start:.1f}s")
+
+    # Half the queries are re-encodes of stored images, half are new images
+    queries = []
+    for i in range(args.queries):
+        target = rng.randrange(args.images)
+        if i % 2 == 0:
+            queries.append((_flip(phashes[target], rng.randint(0, index.phash_radius), rng),
+                            _flip(dhashes[target], rng.randint(0, index.dhash_radius), rng), target + 1))
+        else:
+            queries.append((rng.getrandbits(64), rng.getrandbits(64), None))
+
+    latencies, found = [], 0
+    for phash, dhash, expected in queries:
+        start = time.perf_counter()
+        matches = index.find(phash, dhash)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if expected is not None and expected in {document_id for document_id, _ in matches}:
+            found += 1
+
+    latencies.sort()
+    print(f"queries: {args.queries}")
+    print(f"p50: {statistics.median(latencies):.3f} ms")
+    print(f"p95: {_percentile(latencies, 0.95):.3f} ms")
+    print(f"p99: {_percentile(latencies, 0.99):.3f} ms")
+    print(f"near-duplicate recall: {found / ((args.queries + 1) // 2):.2f}")
+
+    # Reference point: one vectorized linear scan over all pHashes
+    matrix = np.array(phashes, dtype=np.uint64)
+    start = time.perf_counter()
+    for phash, _, _ in queries[:50]:
+        np.flatnonzero(np.bitwise_count(matrix ^ np.uint64(phash)) <= index.phash_radius)
+    print(f"linear scan: {(time.perf_counter() - start) * 1000 / 50:.3f} ms per query")
+
+
+if __name__ == "__main__":
+    main()
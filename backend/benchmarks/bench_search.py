@@ -0,0 +1,148 @@
+"""Hybrid search latency on a synthetic corpus, through SearchService.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search --documents 1000000 --queries 200
+
+Documents, compressed text and JSON embeddings are written to a SQLite
+database, and each query runs `SearchService.hybrid_search` as the endpoint
+does: refresh (version check and new-row scan), query embedding, index
+search and the fetch of the matching rows. The one-off index build is timed
+separately; it runs at startup or after a reprocess, not per search.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Document, DocumentText
+from app.services import search_service
+from app.services.search_service import HybridSearchIndex, SearchService
+from app.utils.codecs import compress_text
+
+VOCABULARY_SIZE = 50_000
+WORDS_PER_DOCUMENT = 60
+
+
+def synthetic_topics(dim: int, n_topics: int = 2000, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n_topics, dim), dtype=np.float32)
+
+
+def synthetic_vectors(n: int, topics: np.ndarray, rng) -> np.ndarray:
+    """Embeddings clustered around topics, like real document embeddings"""
+    vectors = topics[rng.integers(0, len(topics), size=n)]
+    vectors += 0.5 * rng.standard_normal((n, topics.shape[1]), dtype=np.float32)
+    return vectors
+
+
+def build_database(path: str, n_documents: int, dim: int, seed: int = 0):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(seed)
+    topics = synthetic_topics(dim)
+    vocabulary = [f"term{i}" for i in range(VOCABULARY_SIZE)]
+
+    with engine.begin() as connection:
+        for start in range(0, n_documents, 10_000):
+            count = min(10_000, n_documents - start)
+            vectors = synthetic_vectors(count, topics, rng)
+            # Zipf-distributed words so common terms have long posting lists
+            word_ids = rng.zipf(1.2, size=(count, WORDS_PER_DOCUMENT)) % VOCABULARY_SIZE
+            documents, texts = [], []
+            for offset in range(count):
+                doc_id = start + offset + 1
+                # Every tenth document is a duplicate of the one before it
+                original = doc_id - 1 if doc_id % 10 == 0 else None
+                documents.append({
+                    "id": doc_id, "original_filename": f"doc{doc_id}.txt", "file_type": "txt",
+                    "original_size": 4096, "optimized_size": 2048, "reduction_percentage": 50.0,
+                    "is_duplicate": original is not None, "original_document_id": original,
+                    "embedding": json.dumps(vectors[offset].tolist()),
+                })
+                codec, content = compress_text(" ".join(vocabulary[w] for w in word_ids[offset]))
+                texts.append({"document_id": doc_id, "codec": codec, "content": content})
+            connection.execute(insert(Document), documents)
+            connection.execute(insert(DocumentText), texts)
+    return engine
+
+
+def vector_recall(index: HybridSearchIndex, queries: np.ndarray, k: int = 10) -> float:
+    """Fraction of the exact top-k neighbours the IVF search returns"""
+    vectors = index.vector
+    found = 0
+    for query in queries:
+        exact = np.argsort(-(vectors._matrix[:len(vectors)] @ query))[:k]
+        expected = {int(vectors._doc_idx[row]) for row in exact}
+        found += len(expected & {doc_idx for doc_idx, _ in vectors.search(query, k)})
+    return found / (k * len(queries))
+
+
+def percentiles(label: str, latencies):
+    latencies = sorted(latencies)
+    print(f"{label}: p50 {statistics.median(latencies):.1f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms, max {latencies[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        engine = build_database(os.path.join(workdir, "bench.db"), args.documents, args.dim)
+        Session = sessionmaker(bind=engine)
+        print(f"wrote {args.documents:,} documents in {time.perf_counter() - start:.1f}s")
+
+        index = HybridSearchIndex(dim=args.dim)
+        start = time.perf_counter()
+        with Session() as db:
+            index.refresh(db)
+        print(f"built index in {time.perf_counter() - start:.1f}s")
+        if index.vector.needs_training():
+            start = time.perf_counter()
+            index.vector.train()
+            print(f"trained IVF ({len(index.vector._lists)} lists) in {time.perf_counter() - start:.1f}s")
+
+        # Without a model, queries are embedded around the corpus topics; a
+        # real model adds its encode time to every new query string
+        query_vectors = synthetic_vectors(args.queries, synthetic_topics(args.dim), np.random.default_rng(2))
+        query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+        rng = np.random.default_rng(1)
+        queries = [" ".join(f"term{w % VOCABULARY_SIZE}" for w in rng.zipf(1.2, size=3)) + f" q{i}"
+                   for i in range(args.queries)]
+        embedding = "model"
+        if search_service.embed_query("load the model") is None:
+            search_service.embed_query = dict(zip(queries, query_vectors)).get
+            embedding = "synthetic (no embedding model installed)"
+
+        latencies, index_latencies = [], []
+        with Session() as db:
+            service = SearchService(db, index)
+            for query in queries:
+                start = time.perf_counter()
+                service.hybrid_search(query, args.limit)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                vector = search_service.embed_query(query)
+                start = time.perf_counter()
+                index.search(query, vector, args.limit)
+                index_latencies.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+
+        print(f"queries: {args.queries}, query embedding: {embedding}")
+        percentiles("hybrid_search", latencies)
+        percentiles("  of which index.search", index_latencies)
+        print(f"vector recall@10: {vector_recall(index, query_vectors[:20]):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Database size and list latency before and after moving text to document_texts.
+
+Usage (from backend/):
+    python -m benchmarks.bench_text_storage --documents 20000 --text-kb 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.jobs.migrate_text import TextMigration, measure_list_latency
+from app.models import Base
+
+
+def build_legacy_database(path: str, n_documents: int, text_kb: int, seed: int = 0):
+    """A documents table shaped like before the migration, with text inline"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20_000)]
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE documents ADD COLUMN extracted_text TEXT"))
+        insert = text(
+            "INSERT INTO documents (original_filename, original_size, optimized_size, file_type, "
+            "tier, is_duplicate, reduction_percentage, extracted_text) "
+            "VALUES (:name, 100000, 50000, 'pdf', 'hot', 0, 50.0, :text)"
+        )
+        for start in range(0, n_documents, 1000):
+            connection.execute(insert, [
+                {"name": f"doc{i}.pdf",
+                 "text": " ".join(rng.choices(vocabulary, k=text_kb * 1024 // 9))}
+                for i in range(start, min(start + 1000, n_documents))
+            ])
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=20_000)
+    parser.add_argument("--text-kb", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.db")
+        engine = build_legacy_database(path, args.documents, args.text_kb)
+        Session = sessionmaker(bind=engine)
+
+        size_before = os.path.getsize(path)
+        with Session() as db:
+            before = measure_list_latency(db)
+
+        start = time.perf_counter()
+        with Session() as db:
+            summary = TextMigration(db, drop_column=True, vacuum=True).run()
+        elapsed = time.perf_counter() - start
+
+        size_after = os.path.getsize(path)
+        with Session() as db:
+            after = measure_list_latency(db)
+        engine.dispose()
+
+    print(f"documents: {args.documents:,} with ~{args.text_kb} KB of text each")
+    print(f"migration: {summary['rows_moved']:,} rows in {elapsed:.1f}s, "
+          f"text {summary['text_bytes'] / summary['compressed_bytes']:.1f}x smaller")
+    print(f"database size: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
+    print(f"list page (100 rows): {before['page_ms']:.2f} ms -> {after['page_ms']:.2f} ms")
+    print(f"full scan: {before['scan_ms']:.1f} ms -> {after['scan_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Mixed-load generator for the DocSlim API.
+
+Usage (from backend/):
+    # closed loop: 16 clients issuing requests back to back for 30s
+    python -m benchmarks.loadgen --start-server --concurrency 16 --duration 30 \\
+        --output results/baseline.json
+    # open loop: 50 req/s regardless of how fast the server answers
+    python -m benchmarks.loadgen --start-server --rate 50 --duration 30 \\
+        --output results/run.json --baseline results/baseline.json
+
+--start-server runs uvicorn in a scratch directory, so the load never
+touches ./docslim.db or ./uploads. Without it, --base-url must point at a
+running server.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("upload", "list", "search", "stats")
+DEFAULT_MIX = "list=4,search=3,stats=2,upload=1"
+VOCABULARY = [f"word{i}" for i in range(2000)] + [
+    "invoice", "contract", "report", "quarterly", "budget", "policy", "scan", "receipt",
+]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'list=4,upload=1' -> {'list': 4.0, 'upload': 1.0}"""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class Workload:
+    """Builds one request of each kind; uploads are small text documents.
+
+    A share of uploads repeats an earlier document so the dedup path is
+    exercised too.
+    """
+
+    def __init__(self, mix: Dict[str, float], upload_kb: int = 16, duplicate_fraction: float = 0.1, seed: int = 0):
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.upload_kb = upload_kb
+        self.duplicate_fraction = duplicate_fraction
+        self.rng = random.Random(seed)
+        self.run_id = f"{os.getpid()}-{int(time.time())}"
+        self.uploaded: List[tuple] = []
+        self.sequence = 0
+
+    def next(self) -> str:
+        return self.rng.choices(self.names, self.weights)[0]
+
+    def _document(self):
+        if self.uploaded and self.rng.random() < self.duplicate_fraction:
+            return self.rng.choice(self.uploaded)
+        self.sequence += 1
+        words = self.rng.choices(VOCABULARY, k=self.upload_kb * 1024 // 8)
+        document = (f"load-{self.run_id}-{self.sequence}.txt", " ".join(words).encode())
+        self.uploaded.append(document)
+        return document
+
+    async def send(self, client: httpx.AsyncClient, name: str) -> httpx.Response:
+        if name == "upload":
+            filename, content = self._document()
+            return await client.post("/upload/", files={"file": (filename, content, "text/plain")})
+        if name == "list":
+            return await client.get("/documents/", params={"skip": self.rng.randrange(0, 200), "limit": 50})
+        if name == "search":
+            return await client.get("/documents/search", params={"query": self.rng.choice(VOCABULARY)})
+        return await client.get("/stats/")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(fraction * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: Dict[str, List[tuple]], elapsed: float) -> Dict[str, dict]:
+    """Per-endpoint and overall throughput, latency percentiles (ms) and error rate.
+
+    `samples` maps endpoint -> [(latency_seconds, ok), ...].
+    """
+    summary = {}
+    everything = []
+    for name, entries in sorted(samples.items()):
+        everything.extend(entries)
+        summary[name] = _summarize(entries, elapsed)
+    summary["all"] = _summarize(everything, elapsed)
+    return summary
+
+
+def _summarize(entries: List[tuple], elapsed: float) -> dict:
+    latencies = sorted(latency * 1000 for latency, _ in entries)
+    errors = sum(1 for _, ok in entries if not ok)
+    return {
+        "requests": len(entries),
+        "errors": errors,
+        "error_rate": errors / len(entries) if entries else 0.0,
+        "throughput_rps": len(entries) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    duration: float,
+    concurrency: int = 8,
+    rate: Optional[float] = None,
+    warmup: float = 0.0,
+) -> Dict[str, dict]:
+    """Drive `client` for `duration` seconds after `warmup` and summarize the results.
+
+    Without `rate` this is a closed loop: `concurrency` clients each send
+    their next request as soon as the previous one returns. With `rate`,
+    requests are started on a fixed schedule (at most `concurrency` in
+    flight) and latency is measured from the scheduled start, so a stalled
+    server shows up as latency instead of silently lowering the load.
+    """
+    samples: Dict[str, List[tuple]] = defaultdict(list)
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    async def issue(name: str, scheduled: float):
+        try:
+            response = await workload.send(client, name)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if scheduled >= measure_from:
+            samples[name].append((time.perf_counter() - scheduled, ok))
+
+    if rate is None:
+        async def worker():
+            while time.perf_counter() < stop_at:
+                await issue(workload.next(), time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        in_flight = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def scheduled_request(name: str, scheduled: float):
+            async with in_flight:
+                await issue(name, scheduled)
+
+        interval = 1.0 / rate
+        scheduled = start
+        while scheduled < stop_at:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(scheduled_request(workload.next(), scheduled)))
+            scheduled += interval
+        await asyncio.gather(*tasks)
+
+    return summarize(samples, max(time.perf_counter() - measure_from, 1e-9))
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict]) -> Dict[str, dict]:
+    """Relative change (percent) of throughput and latency percentiles versus a baseline"""
+    changes = {}
+    for name, stats in current.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: (stats[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+        changes[name]["error_rate"] = stats["error_rate"] - before["error_rate"]
+    return changes
+
+
+def print_report(summary: Dict[str, dict], changes: Optional[Dict[str, dict]] = None):
+    print(f"{'endpoint':<8} {'reqs':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for name, stats in summary.items():
+        print(f"{name:<8} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['error_rate'] * 100:>7.2f}%")
+    if changes:
+        print("\nvs baseline (positive latency = slower):")
+        for name, delta in changes.items():
+            print(f"{name:<8} rps {delta['throughput_rps']:+.1f}%  p50 {delta['p50_ms']:+.1f}%  "
+                  f"p95 {delta['p95_ms']:+.1f}%  p99 {delta['p99_ms']:+.1f}%  "
+                  f"errors {delta['error_rate'] * 100:+.2f}pp")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int = 1, timeout: float = 60.0):
+    """Run the app under uvicorn in a scratch directory; returns (process, base_url, workdir)"""
+    workdir = tempfile.mkdtemp(prefix="docslim_load_")
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(base_url + "/", timeout=1.0).status_code == 200:
+                return process, base_url, workdir
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start in time")
+
+
+async def _main_async(args) -> Dict[str, dict]:
+    workload = Workload(parse_mix(args.mix), upload_kb=args.upload_kb, seed=args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        # Seed some documents so list and search have something to return
+        for _ in range(args.seed_documents):
+            await workload.send(client, "upload")
+        return await run_load(client, workload, args.duration, args.concurrency, args.rate, args.warmup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-server", action="store_true", help="start uvicorn in a scratch directory")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights, default {DEFAULT_MIX}")
+    parser.add_argument("--concurrency", type=int, default=8, help="clients, or max in flight with --rate")
+    parser.add_argument("--rate", type=float, help="target requests per second (open loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--upload-kb", type=int, default=16)
+    parser.add_argument("--seed-documents", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit non-zero if any endpoint's p95 is this many percent slower than the baseline")
+    args = parser.parse_args()
+
+    process = workdir = None
+    if args.start_server:
+        process, args.base_url, workdir = start_server(args.server_workers)
+    try:
+        summary = asyncio.run(_main_async(args))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    changes = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            changes = compare(summary, json.load(f)["results"])
+    print_report(summary, changes)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+        with open(args.output, "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config, "results": summary}, f, indent=2)
+        print(f"\nsaved {args.output}")
+
+    if changes and args.max_regression is not None:
+        regressed = [name for name, delta in changes.items() if delta["p95_ms"] > args.max_regression]
+        if regressed:
+            print(f"p95 regressed more than {args.max_regression}% on: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.database import get_db
+from app.main import app
+from app.models import Base, Document, UploadSession
+from app.services import upload_service
+from app.services.upload_service import ChunkedUploadService, IncompleteUploadError
+
+PART_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def upload_root(tmp_path, monkeypatch):
+    root = str(tmp_path / "chunked")
+    monkeypatch.setattr(upload_service, "CHUNKED_UPLOAD_DIR", root)
+    return root
+
+
+@pytest.fixture
+def payload():
+    # Three full parts and a short last one
+    return os.urandom(3 * PART_SIZE + 1234)
+
+
+@pytest.fixture
+def cleanup_optimized():
+    names = []
+    yield names
+    for name in names:
+        path = os.path.join("uploads", "optimized", name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.fixture
+def parallel_client(tmp_path):
+    """A client whose requests each get their own session, as in production,
+    so parts can really be sent concurrently"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'uploads.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_request_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_request_db
+    try:
+        yield TestClient(app), SessionLocal
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        engine.dispose()
+
+
+def _parts(data):
+    return {number + 1: data[offset:offset + PART_SIZE]
+            for number, offset in enumerate(range(0, len(data), PART_SIZE))}
+
+
+def test_parts_in_parallel_out_of_order(parallel_client, upload_root, payload, cleanup_optimized):
+    client, SessionLocal = parallel_client
+    cleanup_optimized.append("chunked-scan.txt")
+    response = client.post("/uploads/", json={
+        "filename": "chunked-scan.txt", "size": len(payload), "part_size": PART_SIZE,
+        "md5": hashlib.md5(payload).hexdigest(),
+    })
+    assert response.status_code == 201
+    session = response.json()
+    assert session["part_count"] == 4
+    upload_id = session["upload_id"]
+
+    def put(item):
+        number, data = item
+        return client.put(f"/uploads/{upload_id}/parts/{number}", content=data)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(put, reversed(list(_parts(payload).items()))))
+    assert all(r.status_code == 200 for r in responses)
+    assert responses[0].json()["md5"] == hashlib.md5(payload[3 * PART_SIZE:]).hexdigest()
+
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 200
+    with SessionLocal() as db:
+        document = db.get(Document, response.json()["id"])
+        assert document.original_size == len(payload)
+        assert document.text_hash == hashlib.md5(payload).hexdigest()
+    assert not os.path.exists(os.path.join(upload_root, upload_id))
+
+    # Completing again (a retried request) returns the same document
+    assert client.post(f"/uploads/{upload_id}/complete").json()["id"] == document.id
+
+
+def test_resume_lists_received_parts_and_rejects_early_completion(client, upload_root, payload):
+    upload_id = client.post("/uploads/", json={
+        "filename": "resume.txt", "size": len(payload), "part_size": PART_SIZE,
+    }).json()["upload_id"]
+    parts = _parts(payload)
+    client.put(f"/uploads/{upload_id}/parts/1", content=parts[1])
+    client.put(f"/uploads/{upload_id}/parts/3", content=parts[3])
+
+    assert client.get(f"/uploads/{upload_id}").json()["received_parts"] == [1, 3]
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 409
+    assert "2, 4" in response.json()["detail"]
+
+
+def test_part_with_wrong_size_is_rejected(client, upload_root, payload):
+    upload_id = client.post("/uploads/", json={
+        "filename": "short.txt", "size": len(payload), "part_size": PART_SIZE,
+    }).json()["upload_id"]
+
+    assert client.put(f"/uploads/{upload_id}/parts/1", content=payload[:100]).status_code == 400
+    assert client.put(f"/uploads/{upload_id}/parts/9", content=b"x").status_code == 400
+    assert client.get(f"/uploads/{upload_id}").json()["received_parts"] == []
+
+
+def test_hash_falls_back_to_reading_the_file(db_session, upload_root, payload):
+    service = ChunkedUploadService(db_session)
+    upload = service.create("other-worker.txt", len(payload), part_size=PART_SIZE)
+    for number, data in _parts(payload).items():
+        writer = service.open_part(upload, number)
+        writer.write(data)
+        service.complete_part(upload, writer)
+
+    assert service._file_hash(upload) == hashlib.md5(payload).hexdigest()
+    # As if the parts had been received by another worker process
+    upload_service._drop_running_hash(upload.id)
+    assert service._file_hash(upload) == hashlib.md5(payload).hexdigest()
+
+    with pytest.raises(IncompleteUploadError):
+        service.complete(service.create("empty.txt", PART_SIZE * 2, part_size=PART_SIZE).id)
+
+
+def test_stale_sessions_expire(db_session, upload_root):
+    service = ChunkedUploadService(db_session)
+    stale = service.create("stale.txt", 10, part_size=PART_SIZE)
+    stale.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+
+    with pytest.raises(LookupError):
+        service.get(stale.id)
+    fresh = service.create("fresh.txt", 10, part_size=PART_SIZE)
+
+    assert [upload.id for upload in db_session.query(UploadSession)] == [fresh.id]
+    assert os.listdir(upload_root) == [fresh.id]
+
+
+def test_parts_in_flight_block_completion(db_session, upload_root, payload):
+    service = ChunkedUploadService(db_session)
+    upload = service.create("racing.txt", len(payload), part_size=PART_SIZE)
+    parts = _parts(payload)
+    for number in (1, 2, 3):
+        writer = service.open_part(upload, number)
+        writer.write(parts[number])
+        service.complete_part(upload, writer)
+
+    # The last part was opened but is still streaming
+    writer = service.open_part(upload, 4)
+    with pytest.raises(IncompleteUploadError, match="still being written"):
+        service.complete(upload.id)
+    writer.write(parts[4])
+    service.complete_part(upload, writer)
+
+    # Once completion claims the session, a late retry of a part is refused
+    # even if this request loaded the session while it was still open
+    late = service.get(upload.id)
+    db_session.execute(update(UploadSession).where(UploadSession.id == upload.id).values(status="completing"))
+    db_session.commit()
+    set_committed_value(late, "status", "open")
+    with pytest.raises(ValueError, match="completing"):
+        service.open_part(late, 1)
+
+
+def test_abandoned_running_hashes_are_dropped():
+    upload_service._running_hash("abandoned").touched -= upload_service.UPLOAD_SESSION_TTL_SECONDS + 1
+    upload_service._running_hash("active")
+
+    assert "abandoned" not in upload_service._running_hashes
+    upload_service._drop_running_hash("active")
@@ -0,0 +1,115 @@
+import os
+import random
+import zlib
+
+import pytest
+
+from app.models import Document
+from app.utils import codecs
+from app.utils.optimizers import get_optimizer
+
+
+@pytest.fixture(autouse=True)
+def dictionary_store(tmp_path, monkeypatch):
+    store = codecs.ZstdDictionaryStore(str(tmp_path / "dictionaries"))
+    monkeypatch.setattr(codecs, "dictionary_store", store)
+    return store
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("name", ["gzip", "lzma", "zstd", "brotli"])
+def test_codec_roundtrip(tmp_path, name):
+    data = b"invoice,customer,amount\n" + b"1001,ACME Corp,250.00\n" * 5000
+    src = _write(tmp_path / "data.csv", data)
+    dst = str(tmp_path / "data.csv.blob")
+
+    size = codecs.compress_file(src, dst, codecs.get_codec(name))
+
+    assert size < len(data)
+    assert codecs.read_stored_file(dst) == data
+
+
+def test_optimizer_records_codec_and_keeps_incompressible_files(tmp_path):
+    text = _write(tmp_path / "notes.txt", b"lorem ipsum dolor sit amet " * 4000)
+    optimizer = get_optimizer("txt")
+    optimizer.optimize(text, str(tmp_path / "notes.out"))
+    assert optimizer.strategy.startswith("codec:")
+
+    noise = _write(tmp_path / "noise.bin", os.urandom(64 * 1024))
+    optimizer = get_optimizer("other")
+    size = optimizer.optimize(noise, str(tmp_path / "noise.out"))
+    assert optimizer.strategy == "safe_copy"
+    assert size == 64 * 1024
+    assert codecs.read_stored_file(str(tmp_path / "noise.out")) == open(noise, "rb").read()
+
+
+def test_zstd_dictionary_trained_per_file_type(tmp_path, dictionary_store):
+    rng = random.Random(0)
+    samples = [
+        (f"id,name,city\n{i},{rng.choice(['Ada', 'Linus', 'Grace'])},"
+         f"{rng.choice(['Berlin', 'Paris', 'Oslo'])}\n").encode() * 3
+        for i in range(200)
+    ]
+    dictionary = dictionary_store.train("csv", samples)
+    assert dictionary_store.latest("csv").dict_id() == dictionary.dict_id()
+
+    codec = codecs.ZstdCodec(dictionary=dictionary)
+    src = _write(tmp_path / "small.csv", samples[0])
+    dst = str(tmp_path / "small.csv.blob")
+    codecs.compress_file(src, dst, codec)
+
+    assert codecs.read_stored_file(dst) == samples[0]
+
+
+def test_download_returns_original_content(client, db_session, tmp_path):
+    data = b"quarterly report\n" * 2000
+    src = _write(tmp_path / "report.txt", data)
+    stored = str(tmp_path / "report.txt.blob")
+    codecs.compress_file(src, stored, codecs.get_codec("gzip"))
+
+    document = Document(original_filename="report.txt", file_type="txt",
+                        original_size=len(data), optimized_size=os.path.getsize(stored),
+                        storage_path=stored, reduction_strategy="codec:gzip")
+    db_session.add(document)
+    db_session.commit()
+
+    response = client.get(f"/documents/{document.id}/download")
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_read_only_dictionary_store_never_trains(tmp_path, monkeypatch):
+    monkeypatch.setattr(codecs, "ZSTD_DICT_MIN_SAMPLES", 1)
+    store = codecs.ZstdDictionaryStore(str(tmp_path / "read-only"), read_only=True)
+    store.add_sample("csv", b"id,name\n1,Ada\n" * 10)
+    assert not os.path.exists(store.directory)
+
+
+def test_dictionary_store_trains_once_per_file_type(tmp_path, monkeypatch):
+    monkeypatch.setattr(codecs, "ZSTD_DICT_MIN_SAMPLES", 20)
+    rng = random.Random(0)
+    store = codecs.ZstdDictionaryStore(str(tmp_path / "dictionaries"))
+    for i in range(100):
+        store.add_sample("csv", f"id,name\n{i},{rng.choice(['Ada', 'Linus'])}\n".encode() * 20)
+
+    assert len(os.listdir(store.directory)) == 1
+    assert store._samples == {}
+    # A new process finds the saved dictionary and doesn't collect samples either
+    restarted = codecs.ZstdDictionaryStore(store.directory)
+    restarted.add_sample("csv", b"id,name\n1,Ada\n")
+    assert restarted._samples == {}
+
+
+def test_text_fallback_uses_gzip_framing(monkeypatch):
+    monkeypatch.setattr(codecs, "zstandard", None)
+    codec, payload = codecs.compress_text("quarterly report " * 100)
+
+    assert codec == "gzip" and payload[:2] == b"\x1f\x8b"
+    assert codecs.decompress_text(codec, payload) == "quarterly report " * 100
+    # Rows written before the fix hold zlib framing under the same tag
+    assert codecs.decompress_text("gzip", zlib.compress(b"legacy", 6)) == "legacy"
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.services.embedding_server import EmbeddingServer, RemoteEmbeddingService, _Request
+from app.services.embedding_service import EmbeddingService
+
+
+class FakeModelService(EmbeddingService):
+    """Encodes each text as [len(text), 1, 2, ...] after a short pause, like a model would"""
+
+    def __init__(self, error: Exception = None, delay: float = 0.02):
+        super().__init__()
+        self.embedding_dim = 4
+        self.error = error
+        self.delay = delay
+
+    def encode(self, texts, batch_size=32):
+        if self.error:
+            raise self.error
+        time.sleep(self.delay)
+        vectors = np.tile(np.arange(self.embedding_dim, dtype=np.float32), (len(texts), 1))
+        vectors[:, 0] = [len(text) for text in texts]
+        return vectors
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(service, **kwargs):
+        # Unix socket paths are limited to ~100 characters, so keep it short
+        path = os.path.join(tempfile.mkdtemp(prefix="emb", dir="/tmp"), "s.sock")
+        server = EmbeddingServer(path, service, **kwargs)
+        ready = threading.Event()
+        thread = threading.Thread(target=server.run, args=(ready,), daemon=True)
+        thread.start()
+        assert ready.wait(5)
+        servers.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.shutdown()
+        thread.join(5)
+        shutil.rmtree(os.path.dirname(server.socket_path), ignore_errors=True)
+
+
+def test_remote_vectors_match_the_served_model(serve):
+    server = serve(FakeModelService())
+    client = RemoteEmbeddingService(server.socket_path)
+
+    assert client.generate_embedding("hello") == [5.0, 1.0, 2.0, 3.0]
+    vectors = client.encode(["a", "", "abc"])
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [1.0, 0.0, 3.0]
+
+
+def test_requests_from_many_clients_are_batched(serve):
+    server = serve(FakeModelService(), window_ms=50, max_batch=64)
+    client = RemoteEmbeddingService(server.socket_path)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda n: client.generate_embedding("x" * n), range(1, 17)))
+
+    assert [vector[0] for vector in results] == list(range(1, 17))
+    assert sum(server.batch_sizes) == 16
+    assert len(server.batch_sizes) < 16
+
+
+def test_missing_model_on_server_surfaces_as_import_error(serve):
+    server = serve(FakeModelService(error=ImportError("No module named 'sentence_transformers'")))
+    with pytest.raises(ImportError, match="sentence_transformers"):
+        RemoteEmbeddingService(server.socket_path).generate_embedding("hello")
+
+
+def test_server_not_running_is_a_connection_error(tmp_path):
+    client = RemoteEmbeddingService(str(tmp_path / "missing.sock"))
+    with pytest.raises(OSError):
+        client.generate_embedding("hello")
+
+
+def test_timed_out_request_is_not_sent_again(serve):
+    server = serve(FakeModelService(delay=0.5))
+    client = RemoteEmbeddingService(server.socket_path, timeout=0.1)
+
+    with pytest.raises(TimeoutError):
+        client.generate_embedding("hello")
+    time.sleep(0.6)
+    assert server.batch_sizes == [1]
+
+
+def test_cancelled_request_does_not_stop_the_batcher(serve):
+    server = serve(FakeModelService(), window_ms=50)
+
+    async def enqueue_cancelled():
+        # As left behind by a connection handler cancelled on shutdown
+        future = server._loop.create_future()
+        future.cancel()
+        await server._queue.put(_Request(["gone"], future))
+
+    asyncio.run_coroutine_threadsafe(enqueue_cancelled(), server._loop).result(5)
+    client = RemoteEmbeddingService(server.socket_path, timeout=5)
+    assert client.generate_embedding("hello")[0] == 5.0
@@ -0,0 +1,72 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models import Document
+from app.services.export_service import ExportService
+
+
+@pytest.fixture
+def catalog(db_session):
+    documents = [
+        Document(original_filename=f"doc{i}.{file_type}", file_type=file_type, tier=tier,
+                 original_size=1000 * (i + 1), optimized_size=500 * (i + 1), reduction_percentage=50.0,
+                 upload_date=datetime(2024, 1, i + 1))
+        for i, (file_type, tier) in enumerate([
+            ("pdf", "hot"), ("pdf", "cold"), ("docx", "hot"), ("jpg", "warm"), ("pdf", "hot"),
+        ])
+    ]
+    db_session.add_all(documents)
+    db_session.commit()
+    return documents
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_export_projects_columns_and_filters(client, catalog):
+    response = client.get("/documents/export", params={
+        "columns": "id,original_filename,upload_date", "file_types": "pdf", "tiers": "hot",
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = _ndjson(response)
+    assert [row["original_filename"] for row in rows] == ["doc0.pdf", "doc4.pdf"]
+    assert set(rows[0]) == {"id", "original_filename", "upload_date"}
+    assert rows[0]["upload_date"] == "2024-01-01T00:00:00"
+
+
+def test_export_date_range(client, catalog):
+    response = client.get("/documents/export", params={
+        "columns": "original_filename", "since": "2024-01-02", "until": "2024-01-04",
+    })
+    assert [row["original_filename"] for row in _ndjson(response)] == ["doc1.pdf", "doc2.docx"]
+
+
+def test_export_rejects_unknown_columns(client, catalog):
+    response = client.get("/documents/export", params={"columns": "id,embedding"})
+    assert response.status_code == 400
+    assert "embedding" in response.json()["detail"]
+
+
+def test_export_streams_one_chunk_per_batch(db_session, catalog):
+    chunks = list(ExportService(db_session, columns=["id"], batch_size=2).iter_ndjson())
+    assert len(chunks) == 3
+    assert b"".join(chunks).count(b"\n") == 5
+
+
+def test_parquet_export_writes_a_row_group_per_batch(db_session, catalog):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    exporter = ExportService(db_session, columns=["id", "file_type", "optimized_size", "upload_date"],
+                             batch_size=2)
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(exporter.iter_parquet())))
+
+    assert parquet.metadata.num_rows == 5
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.column("file_type").to_pylist() == ["pdf", "pdf", "docx", "jpg", "pdf"]
+    assert str(table.schema.field("upload_date").type) == "timestamp[us]"
@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.models import ImageHash
+from app.services.document_service import DocumentService
+from app.services.image_dedup_service import image_hash_index
+from app.utils.perceptual_hash import MultiIndexHashTable, hamming, image_hashes, to_signed, to_unsigned
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch, tmp_path):
+    image_hash_index.reset()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads" / "optimized").mkdir(parents=True)
+    yield
+    image_hash_index.reset()
+
+
+def _photo(seed: int, size=(320, 240)) -> Image.Image:
+    """A smooth synthetic photo: a few random blobs on a gradient"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size[1], 0:size[0]] / max(size)
+    pixels = np.stack([x * 255, y * 255, (1 - x) * 128], axis=-1)
+    for _ in range(6):
+        cx, cy, radius = rng.random(3) * [1.0, 0.75, 0.2] + [0, 0, 0.05]
+        blob = np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / radius ** 2)[..., None]
+        pixels = pixels * (1 - blob) + rng.random(3) * 255 * blob
+    return Image.fromarray(pixels.clip(0, 255).astype(np.uint8))
+
+
+def test_multi_index_table_matches_brute_force():
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    # Plant near neighbours of the first few hashes
+    for i in range(50):
+        flips = sum(1 << bit for bit in rng.sample(range(64), rng.randint(0, 8)))
+        hashes.append(hashes[i] ^ flips)
+
+    table = MultiIndexHashTable(radius=6)
+    for key, value in enumerate(hashes):
+        table.add(key, value)
+
+    for query in hashes[:60]:
+        expected = sorted(k for k, v in enumerate(hashes) if hamming(query, v) <= 6)
+        assert sorted(key for key, _ in table.query(query)) == expected
+
+
+def test_signed_round_trip():
+    for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        signed = to_signed(value)
+        assert -(1 << 63) <= signed < (1 << 63)
+        assert to_unsigned(signed) == value
+
+
+def test_hashes_survive_resize_and_recompression(tmp_path):
+    _photo(1).save(tmp_path / "a.png")
+    _photo(1).resize((160, 120)).save(tmp_path / "b.jpg", quality=60)
+    _photo(2).save(tmp_path / "c.png")
+
+    a, b, c = (image_hashes(str(tmp_path / name)) for name in ("a.png", "b.jpg", "c.png"))
+    assert hamming(a[0], b[0]) <= 6 and hamming(a[1], b[1]) <= 10
+    assert hamming(a[0], c[0]) > 6
+
+
+def test_near_identical_upload_is_marked_duplicate(db_session, tmp_path):
+    _photo(3).save(tmp_path / "holiday.png")
+    _photo(3).resize((240, 180)).save(tmp_path / "holiday-small.jpg", quality=70)
+    _photo(4).save(tmp_path / "other.png")
+
+    service = DocumentService(db_session)
+    original = service.process_document(str(tmp_path / "holiday.png"), "holiday.png")
+    resized = service.process_document(str(tmp_path / "holiday-small.jpg"), "holiday-small.jpg")
+    other = service.process_document(str(tmp_path / "other.png"), "other.png")
+
+    assert not original.is_duplicate
+    assert resized.is_duplicate and resized.original_document_id == original.id
+    assert not other.is_duplicate
+    # Only originals are indexed
+    assert {row.document_id for row in db_session.query(ImageHash)} == {original.id, other.id}
+
+
+def test_index_catches_up_from_database(db_session, tmp_path):
+    _photo(5).save(tmp_path / "scan.png")
+    _photo(5).save(tmp_path / "scan-copy.jpg", quality=80)
+
+    service = DocumentService(db_session)
+    original = service.process_document(str(tmp_path / "scan.png"), "scan.png")
+
+    # Another worker's index starts empty and loads the stored hashes
+    image_hash_index.reset()
+    duplicate = service.process_document(str(tmp_path / "scan-copy.jpg"), "scan-copy.jpg")
+    assert duplicate.original_document_id == original.id
@@ -0,0 +1,37 @@
+import os
+
+import app.main
+from app.utils.instrumentation import INGEST_STAGES
+
+
+def test_upload_records_stage_timings_and_bytes(client, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads/optimized")
+
+    response = client.post("/upload/", files={"file": ("notes.txt", b"meeting notes\n" * 500)})
+    assert response.status_code == 200
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    body = metrics.text
+    for stage in ["spool_copy", "hash", "dedup_lookup", "extract", "optimize", "db_commit"]:
+        assert stage in INGEST_STAGES
+        assert f'docslim_ingest_stage_seconds_count{{file_type="txt",stage="{stage}"}}' in body
+    assert 'docslim_ingest_bytes_in_total{file_type="txt"}' in body
+
+
+def test_query_timings_recorded(client):
+    client.get("/stats/", params={"nocache": "timing-test"})
+    assert 'docslim_query_seconds_count{query="stats"}' in client.get("/metrics").text
+
+
+def test_profiler_enabled_per_request(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(app.main, "PROFILER_ENABLED", True)
+    monkeypatch.setattr("app.utils.profiler.PROFILE_DIR", str(tmp_path))
+
+    assert "x-profile-file" not in client.get("/documents/").headers
+
+    response = client.get("/documents/", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert os.path.exists(response.headers["x-profile-file"])
@@ -0,0 +1,54 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.database import get_db
+from app.main import app
+from benchmarks.loadgen import Workload, compare, parse_mix, percentile, run_load
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.99) == 7.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_parse_mix_rejects_unknown_endpoints():
+    assert parse_mix("list=4, upload=1") == {"list": 4.0, "upload": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("list=1,delete=1")
+
+
+def test_compare_reports_relative_change():
+    baseline = {"list": {"throughput_rps": 100.0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 40.0, "error_rate": 0.0}}
+    current = {"list": {"throughput_rps": 80.0, "p50_ms": 10.0, "p95_ms": 30.0, "p99_ms": 40.0, "error_rate": 0.01}}
+    delta = compare(current, baseline)["list"]
+    assert delta["throughput_rps"] == pytest.approx(-20.0)
+    assert delta["p95_ms"] == pytest.approx(50.0)
+    assert delta["error_rate"] == pytest.approx(0.01)
+
+
+def test_mixed_load_against_app(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads" / "optimized").mkdir(parents=True)
+    app.dependency_overrides[get_db] = lambda: db_session
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            workload = Workload(parse_mix("upload=1,list=1,search=1,stats=1"), upload_kb=1)
+            return await run_load(client, workload, duration=0.5, concurrency=1)
+
+    try:
+        summary = asyncio.run(drive())
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    assert set(summary) <= {"upload", "list", "search", "stats", "all"}
+    assert summary["all"]["requests"] > 0
+    assert summary["all"]["error_rate"] == 0.0
+    assert summary["all"]["p50_ms"] <= summary["all"]["p99_ms"]
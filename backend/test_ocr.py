@@ -0,0 +1,99 @@
+import io
+
+import fitz
+import pytest
+from PIL import Image, ImageDraw
+
+from app.utils import ocr
+from app.utils.ocr import OcrEngine
+
+
+@pytest.fixture
+def fake_tesseract(monkeypatch):
+    """Stand-in for the tesseract binary that records each page it recognizes"""
+    calls = []
+
+    def run_tesseract(image, lang):
+        calls.append(image.size)
+        return f"scanned page {len(calls)}"
+
+    monkeypatch.setattr(ocr, "run_tesseract", run_tesseract)
+    return calls
+
+
+def _scan(label: str) -> bytes:
+    image = Image.new("L", (400, 200), 255)
+    ImageDraw.Draw(image).text((20, 80), label, fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _pdf(path, pages):
+    """pages: ("text", str) for a text-layer page, ("scan", png bytes) for an image-only page"""
+    pdf = fitz.open()
+    for kind, content in pages:
+        page = pdf.new_page(width=300, height=150)
+        if kind == "text":
+            page.insert_text((20, 50), content)
+        else:
+            page.insert_image(page.rect, stream=content)
+    pdf.save(str(path))
+    pdf.close()
+
+
+def _engine(tmp_path, **kwargs):
+    return OcrEngine(workers=0, dpi=72, cache_dir=str(tmp_path / "ocr_cache"), **kwargs)
+
+
+def test_only_pages_without_text_layer_are_ocred(tmp_path, fake_tesseract):
+    path = tmp_path / "mixed.pdf"
+    _pdf(path, [("text", "Quarterly report with a real text layer"), ("scan", _scan("invoice"))])
+
+    text = _engine(tmp_path).pdf_text(str(path))
+
+    assert len(fake_tesseract) == 1
+    assert "Quarterly report" in text
+    assert "scanned page 1" in text
+
+
+def test_duplicate_pages_hit_the_cache(tmp_path, fake_tesseract):
+    cover = _scan("cover sheet")
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    _pdf(first, [("scan", cover), ("scan", _scan("body"))])
+    _pdf(second, [("scan", cover)])
+
+    engine = _engine(tmp_path)
+    engine.pdf_text(str(first))
+    text = engine.pdf_text(str(second))
+
+    assert len(fake_tesseract) == 2  # the repeated cover sheet was not recognized again
+    assert text == "scanned page 1"
+
+
+def test_page_budget_limits_ocr(tmp_path, fake_tesseract):
+    path = tmp_path / "long.pdf"
+    _pdf(path, [("scan", _scan(f"page {i}")) for i in range(5)])
+
+    _engine(tmp_path, max_pages=2).pdf_text(str(path))
+    assert len(fake_tesseract) == 2
+
+
+def test_time_budget_stops_ocr(tmp_path, fake_tesseract):
+    path = tmp_path / "slow.pdf"
+    _pdf(path, [("scan", _scan(f"page {i}")) for i in range(3)])
+
+    _engine(tmp_path, time_budget=0).pdf_text(str(path))
+    assert fake_tesseract == []
+
+
+def test_multi_frame_tiff_is_ocred_per_frame(tmp_path, fake_tesseract):
+    frames = [Image.open(io.BytesIO(_scan(f"frame {i}"))) for i in range(3)]
+    path = tmp_path / "fax.tiff"
+    frames[0].save(path, save_all=True, append_images=frames[1:], dpi=(600, 600))
+
+    text = _engine(tmp_path).image_text(str(path))
+
+    assert text.splitlines() == ["scanned page 1", "scanned page 2", "scanned page 3"]
+    # 600 DPI frames are downsampled to the OCR DPI before recognition
+    assert fake_tesseract[0] == (48, 24)
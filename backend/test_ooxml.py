@@ -0,0 +1,118 @@
+import io
+import os
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from app.utils import codecs, ooxml
+from app.utils.optimizers import OOXMLOptimizer, get_optimizer
+
+THUMBNAIL_REL = (
+    '<Relationship Id="rIdThumb" Type="http://schemas.openxmlformats.org/package/2006/'
+    'relationships/metadata/thumbnail" Target="docProps/thumbnail.jpeg"/>'
+)
+
+
+@pytest.fixture(autouse=True)
+def dictionary_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(codecs, "dictionary_store", codecs.ZstdDictionaryStore(str(tmp_path / "dictionaries")))
+
+
+def _jpeg(size, quality=95):
+    from PIL import Image
+
+    image = Image.linear_gradient("L").resize(size).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality)
+    return output.getvalue()
+
+
+@pytest.fixture
+def docx_path(tmp_path):
+    """A Word document with an oversized picture, a thumbnail and an unreferenced part"""
+    from docx import Document as DocxDocument
+
+    document = DocxDocument()
+    for i in range(200):
+        document.add_paragraph(f"Paragraph {i} of the quarterly report.")
+    document.add_picture(io.BytesIO(_jpeg((4000, 3000))))
+    saved = io.BytesIO()
+    document.save(saved)
+
+    path = str(tmp_path / "report.docx")
+    with zipfile.ZipFile(saved) as source, zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as target:
+        has_thumbnail = "docProps/thumbnail.jpeg" in source.namelist()
+        for info in source.infolist():
+            data = source.read(info)
+            if info.filename == "_rels/.rels" and not has_thumbnail:
+                data = data.replace(b"</Relationships>", THUMBNAIL_REL.encode() + b"</Relationships>")
+            target.writestr(info.filename, data)
+        if not has_thumbnail:
+            target.writestr("docProps/thumbnail.jpeg", _jpeg((256, 192)))
+        target.writestr("word/media/orphan.png", b"\x89PNG not referenced anywhere" * 100)
+    return path
+
+
+def _assert_package_consistent(path):
+    with zipfile.ZipFile(path) as package:
+        assert package.testzip() is None
+        names = set(package.namelist())
+        assert package.namelist()[0] == "[Content_Types].xml"
+        types = ElementTree.fromstring(package.read("[Content_Types].xml"))
+        for override in types.findall(f"{{{ooxml.CONTENT_TYPES_NS}}}Override"):
+            assert override.get("PartName").lstrip("/") in names
+        for rels in (name for name in names if name.endswith(".rels")):
+            for _, _, target in ooxml._relationships(package.read(rels), ooxml._source_part(rels)):
+                assert target in names
+
+
+def test_docx_repacked_with_downscaled_media(docx_path, tmp_path):
+    from docx import Document as DocxDocument
+    from PIL import Image
+
+    optimizer = get_optimizer("docx")
+    output = str(tmp_path / "out.docx")
+    size = optimizer.optimize(docx_path, output)
+
+    assert optimizer.strategy == "ooxml_repack"
+    assert size < os.path.getsize(docx_path)
+    _assert_package_consistent(output)
+    assert [p.text for p in DocxDocument(output).paragraphs][:2] == [
+        "Paragraph 0 of the quarterly report.", "Paragraph 1 of the quarterly report.",
+    ]
+    with zipfile.ZipFile(output) as package:
+        names = package.namelist()
+        media = [name for name in names if name.startswith("word/media/")]
+        assert media and "word/media/orphan.png" not in names
+        assert max(Image.open(io.BytesIO(package.read(media[0]))).size) == ooxml.OOXML_MAX_IMAGE_DIMENSION
+        with zipfile.ZipFile(docx_path) as source:
+            assert package.read("docProps/thumbnail.jpeg") == source.read("docProps/thumbnail.jpeg")
+
+    report = optimizer.report
+    assert report["media"]["parts"] == 2  # the picture and the dropped orphan
+    assert report["media"]["optimized_bytes"] < report["media"]["original_bytes"]
+    assert report["xml"]["optimized_bytes"] < report["xml"]["original_bytes"]
+    assert report["thumbnail"]["parts"] == 1
+
+
+def test_thumbnail_stripped_when_asked(docx_path, tmp_path):
+    output = str(tmp_path / "out.docx")
+    repacker = ooxml.OOXMLRepacker(strip_thumbnails=True, workers=2)
+    repacker.repack(docx_path, output)
+
+    _assert_package_consistent(output)
+    with zipfile.ZipFile(output) as package:
+        assert "docProps/thumbnail.jpeg" not in package.namelist()
+        assert b"thumbnail" not in package.read("_rels/.rels")
+    assert repacker.report["thumbnail"]["optimized_bytes"] == 0
+
+
+def test_legacy_office_files_fall_back_to_codec(tmp_path):
+    path = tmp_path / "old.xls"
+    path.write_bytes(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"legacy binary workbook " * 2000)
+
+    optimizer = get_optimizer("xlsx")
+    assert isinstance(optimizer, OOXMLOptimizer)
+    optimizer.optimize(str(path), str(tmp_path / "old.out"))
+    assert optimizer.strategy.startswith("codec:")
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from app.jobs.reprocess import ReprocessJob, Throttle
+from app.models import Document, SearchIndexState
+from app.utils.codecs import read_stored_file
+
+CONTENT = b"reprocessing makes old uploads smaller\n" * 2000
+
+
+@pytest.fixture
+def stored_documents(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads/optimized")
+    documents = []
+    for i in range(3):
+        path = f"uploads/optimized/notes{i}.txt"
+        with open(path, "wb") as f:
+            f.write(CONTENT)
+        documents.append(Document(
+            original_filename=f"notes{i}.txt", file_type="txt", storage_path=path,
+            original_size=len(CONTENT), optimized_size=len(CONTENT),
+            reduction_strategy="safe_copy", reduction_percentage=0.0,
+        ))
+    db_session.add_all(documents)
+    db_session.commit()
+    return documents
+
+
+def test_dry_run_reports_savings_without_writing(db_session, stored_documents, tmp_path, monkeypatch):
+    # Every sample would train a dictionary, were the store writable
+    monkeypatch.setattr("app.utils.codecs.ZSTD_DICT_MIN_SAMPLES", 1)
+    monkeypatch.setattr("app.utils.codecs.ZSTD_DICT_MAX_FILE_SIZE", len(CONTENT))
+    monkeypatch.setattr("app.utils.codecs.ZstdDictionaryStore.train",
+                        lambda self, file_type, samples: open("trained", "w").close())
+
+    totals = ReprocessJob(db_session, stages=["optimize"], workers=1, dry_run=True,
+                          checkpoint_path=str(tmp_path / "checkpoint.json")).run()
+
+    assert totals["processed"] == 3
+    assert totals["projected_savings"] > 0
+    assert not os.path.exists(tmp_path / "checkpoint.json")
+    assert not os.path.exists("trained")
+    for document in stored_documents:
+        db_session.refresh(document)
+        assert document.optimized_size == len(CONTENT)
+        assert os.path.getsize(document.storage_path) == len(CONTENT)
+
+
+def test_reprocess_commits_and_resumes_from_checkpoint(db_session, stored_documents, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    old_paths = [document.storage_path for document in stored_documents]
+    totals = ReprocessJob(db_session, stages=["optimize", "extract"], workers=1,
+                          chunk_size=2, checkpoint_path=checkpoint).run()
+
+    assert totals["changed"] == 3
+    # Re-optimized files get new paths and the replaced ones are removed after the commit
+    assert not any(os.path.exists(path) for path in old_paths)
+    for document in stored_documents:
+        db_session.refresh(document)
+        assert document.reduction_strategy.startswith("codec:")
+        assert document.optimized_size == os.path.getsize(document.storage_path) < len(CONTENT)
+        assert document.extracted_text == CONTENT.decode()
+        assert read_stored_file(document.storage_path) == CONTENT
+    with open(checkpoint) as f:
+        assert json.load(f)["last_id"] == stored_documents[-1].id
+
+    resumed = ReprocessJob(db_session, stages=["optimize"], workers=1, checkpoint_path=checkpoint).run()
+    assert resumed["processed"] == 3  # carried over from the checkpoint, nothing new
+
+
+def test_throttle_sleeps_to_stay_within_cpu_budget(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("app.jobs.reprocess.time.sleep", sleeps.append)
+
+    throttle = Throttle(cpu_fraction=0.5, io_bytes_per_second=None, workers=2)
+    throttle.account(cpu_seconds=4.0, io_bytes=0)
+
+    assert sleeps and sleeps[0] == pytest.approx(4.0, abs=0.5)
+
+
+def test_embedding_failure_skips_the_batch(db_session, stored_documents, tmp_path, monkeypatch):
+    class Unavailable:
+        def generate_embeddings(self, texts):
+            raise OSError("embedding server down")
+
+    monkeypatch.setattr("app.services.document_service.get_embedding_service", Unavailable)
+    totals = ReprocessJob(db_session, stages=["extract", "embed"], workers=1,
+                          checkpoint_path=str(tmp_path / "checkpoint.json")).run()
+
+    assert totals["processed"] == 3 and totals["embed_errors"] == 3
+    for document in stored_documents:
+        db_session.refresh(document)
+        assert document.extracted_text == CONTENT.decode()
+        assert document.embedding is None
+    # Text was rewritten in place, so search indexes must be rebuilt
+    assert db_session.get(SearchIndexState, 1).version == 1
@@ -0,0 +1,42 @@
+from app.models import Document
+from app.services.cache_service import InMemoryCacheBackend, response_cache
+
+
+def _add_document(db, size):
+    db.add(Document(original_filename=f"doc_{size}.pdf", original_size=size,
+                    optimized_size=size // 2, file_type="pdf"))
+    db.commit()
+
+
+def test_stats_served_from_cache_until_documents_change(client, db_session):
+    response_cache.backend = InMemoryCacheBackend()
+
+    _add_document(db_session, 1000)
+    first = client.get("/stats/")
+    assert first.status_code == 200
+    assert first.json()["total_documents"] == 1
+
+    # Bypass the ORM so no invalidation fires: the cached body must be served
+    db_session.execute(Document.__table__.delete())
+    assert client.get("/stats/").json()["total_documents"] == 1
+
+    # A committed document change invalidates the cached stats
+    _add_document(db_session, 4000)
+    assert client.get("/stats/").json()["total_original_size"] == 4000
+
+
+def test_etag_returns_not_modified(client, db_session):
+    response_cache.backend = InMemoryCacheBackend()
+    _add_document(db_session, 1000)
+
+    first = client.get("/metrics/breakdown")
+    etag = first.headers["etag"]
+
+    second = client.get("/metrics/breakdown", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+
+    _add_document(db_session, 2000)
+    third = client.get("/metrics/breakdown", headers={"If-None-Match": etag})
+    assert third.status_code == 200
+    assert third.headers["etag"] != etag
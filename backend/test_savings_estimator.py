@@ -0,0 +1,101 @@
+import os
+import random
+
+import pytest
+
+from app import config
+from app.services.savings_estimator import SavingsEstimator
+
+
+@pytest.fixture(scope="module")
+def share(tmp_path_factory):
+    """Compressible text, incompressible noise and exact duplicates in nested folders"""
+    rng = random.Random(0)
+    root = tmp_path_factory.mktemp("estimate") / "share"
+    for folder in ("finance", "finance/2023", "scans"):
+        (root / folder).mkdir(parents=True)
+    for i in range(30):
+        lines = "".join(f"{i},{rng.choice(['ACME', 'Globex', 'Initech'])},{rng.randint(1, 999)}.00\n"
+                        for _ in range(rng.randint(20, 300)))
+        (root / "finance" / f"ledger-{i}.txt").write_text("invoice,customer,amount\n" + lines)
+    for i in range(10):
+        (root / "scans" / f"blob-{i}.bin").write_bytes(rng.randbytes(rng.randint(2_000, 8_000)))
+    for i in range(5):
+        (root / "finance" / "2023" / f"ledger-{i}-copy.txt").write_bytes(
+            (root / "finance" / f"ledger-{i}.txt").read_bytes()
+        )
+    return str(root)
+
+
+@pytest.fixture(scope="module")
+def census(share):
+    return SavingsEstimator(share, sample_size=1000, workers=2, seed=1).run()
+
+
+def test_census_is_exact(census):
+    report = census
+
+    assert report["files"] == 45
+    assert report["sampled_files"] == 45
+    assert report["errors"] == 0
+    # Every file measured: no sampling error
+    savings = report["savings_percentage"]
+    assert savings["low"] == pytest.approx(savings["estimate"]) == pytest.approx(savings["high"])
+    assert report["duplicate_ratio"]["estimate"] == pytest.approx(5 / 45)
+    assert report["duplicate_checks_truncated"] == 0
+    assert report["by_type"]["txt"]["savings_percentage"]["estimate"] > 50
+    assert report["by_type"]["other"]["savings_percentage"]["estimate"] == pytest.approx(0)
+    assert report["processing_cpu_seconds"]["estimate"] > 0
+
+
+def test_sample_extrapolates_to_the_census(share, census):
+    sampled = SavingsEstimator(share, sample_size=20, workers=2, seed=3).run()
+
+    assert sampled["sampled_files"] < census["sampled_files"]
+    # The walk counts every file; only the measurements are sampled
+    assert sampled["files"] == census["files"] and sampled["bytes"] == census["bytes"]
+    interval = sampled["savings_bytes"]
+    assert interval["low"] < interval["estimate"] < interval["high"]
+    assert sampled["savings_bytes"]["estimate"] == pytest.approx(census["savings_bytes"]["estimate"], rel=0.15)
+
+
+def test_truncated_duplicate_checks_are_reported(share, monkeypatch):
+    monkeypatch.setattr("app.services.savings_estimator.MAX_DUPLICATE_CANDIDATES", 0)
+
+    report = SavingsEstimator(share, sample_size=1000, workers=2, seed=1).run()
+
+    # No earlier file was compared, so the copies were missed and counted
+    assert report["duplicate_ratio"]["estimate"] == 0
+    assert report["duplicate_checks_truncated"] >= 5
+
+
+def test_endpoint_only_scans_configured_roots(client, share, monkeypatch):
+    monkeypatch.setattr(config, "ESTIMATE_ROOTS", [])
+    assert client.get("/estimate/savings", params={"path": share}).status_code == 403
+
+    monkeypatch.setattr(config, "ESTIMATE_ROOTS", [os.path.dirname(share)])
+    response = client.get("/estimate/savings", params={"path": share, "sample_size": 10, "seed": 0})
+    assert response.status_code == 200
+    assert response.json()["files"] == 45
+    assert client.get("/estimate/savings", params={"path": "/etc"}).status_code == 403
+
+
+def test_endpoint_bounds_the_work_it_starts(client, share, monkeypatch):
+    import app.main
+
+    monkeypatch.setattr(config, "ESTIMATE_ROOTS", [os.path.dirname(share)])
+    monkeypatch.setattr(config, "ESTIMATE_MAX_SAMPLE_SIZE", 50)
+    response = client.get("/estimate/savings", params={"path": share, "sample_size": 51})
+    assert response.status_code == 400
+
+    monkeypatch.setattr(config, "ESTIMATE_ENDPOINT_MAX_FILES", 44)
+    response = client.get("/estimate/savings", params={"path": share, "sample_size": 10})
+    assert response.status_code == 400 and "estimate_savings" in response.json()["detail"]
+    monkeypatch.setattr(config, "ESTIMATE_ENDPOINT_MAX_FILES", 45)
+    assert client.get("/estimate/savings", params={"path": share, "sample_size": 10}).status_code == 200
+
+    assert app.main._estimate_slots.acquire(blocking=False)  # as if an estimate were running
+    try:
+        assert client.get("/estimate/savings", params={"path": share, "sample_size": 10}).status_code == 429
+    finally:
+        app.main._estimate_slots.release()
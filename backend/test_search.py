@@ -0,0 +1,192 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import app.main
+from app.models import Document
+from app.services import search_service
+from app.services.document_service import DocumentService
+from app.services.search_service import (
+    HybridSearchIndex, KeywordIndex, invalidate_search_index, reciprocal_rank_fusion,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    search_service.search_index.reset()
+    # No sentence-transformers in tests: keyword results only
+    monkeypatch.setattr(search_service, "embed_query", lambda query: None)
+
+
+def test_keyword_index_ranks_by_bm25():
+    index = KeywordIndex()
+    index.add(0, "invoice from acme corp")
+    index.add(1, "acme acme acme quarterly report")
+    index.add(2, "holiday photos")
+
+    hits = index.search("acme report", top_k=10)
+    assert [doc_idx for doc_idx, _ in hits] == [1, 0]
+
+
+def test_reciprocal_rank_fusion_prefers_items_in_both_lists():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], k=60)
+    assert max(fused, key=fused.get) in (1, 3)
+    assert fused[1] > fused[2]
+    assert fused[3] > fused[4]
+
+
+def test_hybrid_index_fuses_and_collapses_duplicates():
+    index = HybridSearchIndex(dim=3)
+    index.add(1, None, "contract renewal terms", [1.0, 0.0, 0.0])
+    index.add(2, None, "team offsite agenda", [0.0, 1.0, 0.0])
+    index.add(3, 1, "contract renewal terms", [1.0, 0.0, 0.0])  # duplicate of 1
+
+    hits = index.search("contract", np.array([0.0, 1.0, 0.0], dtype=np.float32), limit=10)
+
+    ids = [hit["document_id"] for hit in hits]
+    assert sorted(ids) == [1, 2]
+    by_id = {hit["document_id"]: hit for hit in hits}
+    assert by_id[1]["keyword_rank"] == 1
+    assert by_id[2]["semantic_rank"] == 1
+
+
+def test_hybrid_search_endpoint(client, db_session):
+    original = Document(original_filename="lease.txt", original_size=10, optimized_size=5, reduction_percentage=50.0,
+                        file_type="txt", extracted_text="office lease agreement")
+    db_session.add(original)
+    db_session.commit()
+    db_session.add_all([
+        Document(original_filename="lease copy.txt", original_size=10, optimized_size=5, reduction_percentage=50.0,
+                 file_type="txt", extracted_text="office lease agreement",
+                 is_duplicate=True, original_document_id=original.id),
+        Document(original_filename="menu.txt", original_size=10, optimized_size=5, reduction_percentage=50.0,
+                 file_type="txt", extracted_text="lunch menu"),
+    ])
+    db_session.commit()
+
+    response = client.get("/documents/search/hybrid", params={"query": "lease"})
+
+    assert response.status_code == 200
+    results = response.json()
+    assert len(results) == 1
+    assert results[0]["document"]["id"] == original.id
+    assert results[0]["duplicate_ids"] == [original.id + 1]
+    assert client.get("/documents/search/hybrid", params={"query": "lease", "limit": 10 ** 6}).status_code == 400
+
+
+def test_index_picks_up_rows_committed_out_of_id_order(db_session):
+    def document(doc_id, text):
+        return Document(id=doc_id, original_filename=f"{text}.txt", original_size=10, optimized_size=5,
+                        reduction_percentage=50.0, file_type="txt", extracted_text=text)
+
+    db_session.add(document(2, "later"))
+    db_session.commit()
+    index = HybridSearchIndex(dim=3)
+    index.refresh(db_session)
+    # Id 1 was allocated first but its transaction commits after id 2's
+    db_session.add(document(1, "earlier"))
+    db_session.commit()
+    index.refresh(db_session)
+
+    assert [hit["document_id"] for hit in index.search("earlier", None, limit=10)] == [1]
+    assert not index.skipped_ids
+
+
+def test_vector_index_ivf_matches_exact_search():
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((20, 16)).astype(np.float32)
+    vectors = topics[rng.integers(0, 20, size=2000)] + 0.1 * rng.standard_normal((2000, 16)).astype(np.float32)
+
+    exact = search_service.VectorIndex(dim=16, ivf_min_vectors=10 ** 9)
+    ivf = search_service.VectorIndex(dim=16, ivf_min_vectors=500, nprobe=8)
+    for doc_idx, vector in enumerate(vectors):
+        exact.add(doc_idx, vector)
+        ivf.add(doc_idx, vector)
+    assert ivf.needs_training()
+    ivf.train()
+    ivf.add(2000, vectors[0])  # rows added after training land in a list
+
+    query = vectors[0] / np.linalg.norm(vectors[0])
+    expected = {doc_idx for doc_idx, _ in exact.search(query, 10)}
+    found = {doc_idx for doc_idx, _ in ivf.search(query, 11)}
+    assert 2000 in found
+    assert len(expected & found) >= 9
+
+
+def test_index_rebuilt_after_invalidation(db_session):
+    document = Document(original_filename="memo.txt", original_size=10, optimized_size=5, reduction_percentage=50.0,
+                        file_type="txt", extracted_text="draft budget")
+    db_session.add(document)
+    db_session.commit()
+    index = HybridSearchIndex(dim=3)
+    index.refresh(db_session)
+    assert index.search("budget", None, limit=10)
+
+    # Rewritten in place, as the reprocess job does: the id is not new
+    document.extracted_text = "final forecast"
+    invalidate_search_index(db_session)
+    db_session.commit()
+    with index._build_lock:  # another search is rebuilding: this one isn't held up
+        index.refresh(db_session)
+        assert index.search("budget", None, limit=10)
+    previous = index.keyword
+    index.refresh(db_session)
+
+    # Built aside and swapped in: searches already running keep the old copy
+    assert index.keyword is not previous and previous.search("budget", top_k=10)
+    assert not index.search("budget", None, limit=10)
+    assert [hit["document_id"] for hit in index.search("forecast", None, limit=10)] == [document.id]
+
+
+def test_background_embedding_reaches_the_index(client, db_session, tmp_path, monkeypatch):
+    class FakeEmbeddings:
+        def generate_embedding(self, text):
+            return [0.0, 1.0, 0.0]
+
+        def embeddings_to_json(self, vector):
+            return json.dumps(vector)
+
+    scheduled = []
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads/optimized")
+    monkeypatch.setattr(app.main, "EMBED_ON_INGEST", True)
+    monkeypatch.setattr("app.services.document_service.embed_document_task", scheduled.append)
+    response = client.post("/upload/", files={"file": ("agenda.txt", b"offsite agenda\n" * 50)})
+    assert response.status_code == 200
+    assert scheduled == [response.json()["id"]]
+
+    index = HybridSearchIndex(dim=3, await_embeddings=True)
+    index.refresh(db_session)
+    assert len(index.vector) == 0
+
+    monkeypatch.setattr("app.services.document_service.get_embedding_service", FakeEmbeddings)
+    DocumentService(db_session).embed_document(scheduled[0])
+    index.refresh(db_session)
+
+    assert len(index.vector) == 1 and not index.awaiting_embedding
+    hits = index.search("unrelated", np.array([0.0, 1.0, 0.0], dtype=np.float32), limit=10)
+    assert [hit["document_id"] for hit in hits] == scheduled
+
+
+def test_query_embedding_failures_are_not_cached(monkeypatch):
+    monkeypatch.undo()  # the autouse fixture stubs embed_query out
+    calls = []
+
+    class FlakyEmbeddings:
+        def generate_embedding(self, text):
+            calls.append(text)
+            if len(calls) == 1:
+                raise OSError("embedding server down")
+            return [3.0, 4.0]
+
+    monkeypatch.setattr("app.services.document_service.get_embedding_service", FlakyEmbeddings)
+    search_service._cached_query_vector.cache_clear()
+    try:
+        assert search_service.embed_query("quarterly budget") is None
+        assert search_service.embed_query("quarterly budget").tolist() == pytest.approx([0.6, 0.8])
+        search_service.embed_query("quarterly budget")
+        assert calls == ["quarterly budget"] * 2
+    finally:
+        search_service._cached_query_vector.cache_clear()
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Generous enough for a cold CI box; a regression that pulls torch or
+# PyMuPDF back into the import path costs several seconds.
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "3.0"))
+HEAVY_MODULES = ["sentence_transformers", "torch", "fitz", "PIL", "magic", "pandas", "zstandard", "brotli"]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _measure_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_app_import_does_not_load_heavy_dependencies():
+    assert _measure_import()["loaded"] == []
+
+
+def test_app_import_time_within_budget():
+    # Best of three to smooth out a noisy first run
+    seconds = min(_measure_import()["seconds"] for _ in range(3))
+    print(f"import app.main: {seconds * 1000:.0f} ms (budget {IMPORT_TIME_BUDGET_SECONDS * 1000:.0f} ms)")
+    assert seconds < IMPORT_TIME_BUDGET_SECONDS
+
+
+def test_routes_registered_once():
+    from app.main import app
+
+    routes = [(tuple(sorted(route.methods)), route.path) for route in app.routes if hasattr(route, "methods")]
+    assert len(routes) == len(set(routes))
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from app.jobs.storage_gc import StorageReconciler
+from app.models import Document, DocumentText, ImageHash, SearchIndexState, UploadPart, UploadSession
+
+
+def _write(path, data, age_seconds=0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if age_seconds:
+        old = time.time() - age_seconds
+        os.utime(path, (old, old))
+    return path
+
+
+def test_reconciler_finds_orphans_dangling_rows_and_bad_hashes(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    kept = _write("uploads/optimized/kept.txt", b"kept", age_seconds=7200)
+    corrupted = _write("uploads/optimized/corrupted.txt", b"bit rot", age_seconds=7200)
+    orphan = _write("uploads/optimized/nested/orphan.txt", b"nobody owns me", age_seconds=7200)
+    fresh_temp = _write("uploads/temp_inflight.txt", b"still uploading")
+    dictionary = _write("uploads/dictionaries/txt-1.zdict", b"dict", age_seconds=7200)
+
+    db_session.add_all([
+        Document(original_filename="kept.txt", storage_path=kept, reduction_strategy="safe_copy",
+                 text_hash=hashlib.md5(b"kept").hexdigest()),
+        Document(original_filename="corrupted.txt", storage_path=corrupted, reduction_strategy="safe_copy",
+                 text_hash=hashlib.md5(b"original").hexdigest()),
+        Document(original_filename="gone.txt", storage_path="uploads/optimized/gone.txt"),
+    ])
+    db_session.commit()
+
+    findings = []
+    summary = StorageReconciler(
+        db_session, root="uploads", delete_orphans=True, delete_dangling=True, force=True,
+        verify_fraction=1.0, workers=2, report=lambda kind, subject, detail="": findings.append((kind, subject)),
+    ).run()
+
+    assert ("orphan", os.path.realpath(orphan)) in findings
+    assert not os.path.exists(orphan)
+    assert os.path.exists(fresh_temp) and os.path.exists(dictionary)
+    assert summary["orphans"] == summary["orphans_deleted"] == 1
+
+    assert summary["dangling"] == summary["rows_deleted"] == 1
+    assert db_session.query(Document).filter(Document.original_filename == "gone.txt").count() == 0
+
+    assert summary["verified"] == 2
+    assert summary["hash_mismatches"] == 1
+
+
+def test_reconciler_reports_overwritten_originals(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = _write("uploads/optimized/report.pdf", b"%PDF second upload")
+    first = Document(original_filename="report.pdf", storage_path=path)
+    second = Document(original_filename="report.pdf", storage_path=path)
+    db_session.add_all([first, second])
+    db_session.commit()
+
+    findings = []
+    summary = StorageReconciler(db_session, root="uploads", verify_fraction=0,
+                                report=lambda kind, subject, detail="": findings.append((kind, subject))).run()
+
+    assert summary["overwritten"] == 1
+    assert ("overwritten", f"document {first.id}") in findings
+
+
+def test_paths_resolved_against_base_dir_from_anywhere(db_session, tmp_path, monkeypatch):
+    app_dir = tmp_path / "app"
+    monkeypatch.chdir(tmp_path)
+    kept = _write(str(app_dir / "uploads/optimized/kept.txt"), b"kept", age_seconds=7200)
+    db_session.add(Document(original_filename="kept.txt", storage_path="uploads/optimized/kept.txt"))
+    db_session.commit()
+
+    # Run from elsewhere with an absolute root: the relative row still matches its file
+    summary = StorageReconciler(
+        db_session, root=str(app_dir / "uploads"), base_dir=str(app_dir), delete_orphans=True,
+        delete_dangling=True, verify_fraction=0, report=lambda *args: None,
+    ).run()
+
+    assert summary["orphans"] == summary["dangling"] == 0
+    assert summary["refused"] is None
+    assert os.path.exists(kept)
+
+
+def test_deletion_refused_when_most_of_storage_would_go(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    paths = [_write(f"uploads/optimized/file{i}.txt", b"data", age_seconds=7200) for i in range(5)]
+    db_session.add_all([Document(original_filename=f"row{i}.txt", storage_path=f"elsewhere/file{i}.txt")
+                        for i in range(5)])
+    db_session.commit()
+
+    findings = []
+    summary = StorageReconciler(
+        db_session, root="uploads", delete_orphans=True, delete_dangling=True, verify_fraction=0,
+        report=lambda kind, subject, detail="": findings.append(kind),
+    ).run()
+
+    assert summary["orphans"] == summary["dangling"] == 5
+    assert "refused" in findings and "--force" in summary["refused"]
+    assert summary["orphans_deleted"] == summary["rows_deleted"] == 0
+    assert all(os.path.exists(path) for path in paths)
+    assert db_session.query(Document).count() == 5
+
+
+def test_dangling_rows_deleted_with_dependents(db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    healthy = [_write(f"uploads/optimized/ok{i}.txt", b"ok", age_seconds=7200) for i in range(20)]
+    db_session.add_all([Document(original_filename=f"ok{i}.txt", storage_path=path)
+                        for i, path in enumerate(healthy)])
+    original = Document(original_filename="scan.png", storage_path="uploads/optimized/scan.png",
+                        extracted_text="lost scan")
+    db_session.add(original)
+    db_session.flush()
+    db_session.add_all([
+        ImageHash(document_id=original.id, phash=1, dhash=2),
+        UploadSession(id="a" * 32, filename="scan.png", total_size=2, part_size=65536, status="completed",
+                      document_id=original.id, expires_at=datetime.utcnow(),
+                      parts=[UploadPart(part_number=1, size=2, md5="0" * 32)]),
+        Document(original_filename="scan copy.png", storage_path="uploads/optimized/scan.png",
+                 is_duplicate=True, original_document_id=original.id),
+    ])
+    db_session.commit()
+
+    summary = StorageReconciler(db_session, root="uploads", delete_dangling=True, verify_fraction=0,
+                                report=lambda *args: None).run()
+
+    assert summary["dangling"] == summary["rows_deleted"] == 2
+    assert db_session.query(Document).count() == 20
+    assert db_session.query(DocumentText).count() == db_session.query(ImageHash).count() == 0
+    assert db_session.query(UploadSession).count() == db_session.query(UploadPart).count() == 0
+    assert db_session.get(SearchIndexState, 1).version == 1
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from app.jobs.migrate_text import TextMigration
+from app.models import Document, DocumentText
+from app.services import search_service
+
+TEXT = "the quarterly budget report covers office lease costs " * 200
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    search_service.search_index.reset()
+    monkeypatch.setattr(search_service, "embed_query", lambda query: None)
+
+
+def _document(name, **kwargs):
+    return Document(original_filename=name, original_size=1000, optimized_size=500, file_type="txt",
+                    reduction_percentage=50.0, **kwargs)
+
+
+def test_text_is_stored_compressed_and_loaded_lazily(db_session):
+    db_session.add(_document("report.txt", extracted_text=TEXT))
+    db_session.commit()
+    db_session.expunge_all()
+
+    stored = db_session.query(DocumentText).one()
+    assert stored.codec == "zstd"
+    assert len(stored.content) < len(TEXT) / 10
+    assert stored.length == len(TEXT)
+    db_session.expunge_all()
+
+    document = db_session.query(Document).one()
+    assert "text_blob" not in inspect(document).dict  # listing never touched the text
+    assert document.extracted_text == TEXT
+
+
+def test_clearing_text_deletes_the_side_row(db_session):
+    document = _document("report.txt", extracted_text=TEXT)
+    db_session.add(document)
+    db_session.commit()
+
+    document.extracted_text = None
+    db_session.commit()
+    assert db_session.query(DocumentText).count() == 0
+
+
+def test_search_reads_text_from_side_table(client, db_session):
+    db_session.add_all([
+        _document("lease.txt", extracted_text="office lease agreement"),
+        _document("menu.txt", extracted_text="lunch menu"),
+    ])
+    db_session.commit()
+
+    response = client.get("/documents/search", params={"query": "lease"})
+    assert response.status_code == 200
+    assert [doc["original_filename"] for doc in response.json()] == ["lease.txt"]
+
+
+def test_migration_moves_legacy_text_in_batches(db_session):
+    db_session.execute(text("ALTER TABLE documents ADD COLUMN extracted_text TEXT"))
+    for i in range(5):
+        db_session.execute(text(
+            "INSERT INTO documents (original_filename, extracted_text) VALUES (:name, :text)"
+        ), {"name": f"legacy{i}.txt", "text": f"legacy text {i} " * 50})
+    db_session.execute(text("INSERT INTO documents (original_filename) VALUES ('empty.txt')"))
+    db_session.commit()
+
+    batches = []
+    summary = TextMigration(db_session, batch_size=2, drop_column=True, progress=batches.append).run()
+
+    assert summary["rows_moved"] == 5
+    assert len(batches) == 3
+    assert not TextMigration(db_session).has_legacy_column()
+    documents = {doc.original_filename: doc for doc in db_session.query(Document)}
+    assert documents["legacy3.txt"].extracted_text == "legacy text 3 " * 50
+    assert documents["empty.txt"].extracted_text is None
+
+    # Rerunning after completion is a no-op
+    assert TextMigration(db_session).run()["rows_moved"] == 0